@@ -1,4 +1,5 @@
 from .api_client import OrthancApiClient, EducationPluginHeaderProvider
+from .cluster_client import ClusterOrthancApiClient, ClusterNode
 from .exceptions import *
 from .helpers import *
 from .capabilities import Capabilities
@@ -14,3 +15,11 @@ from .labels_constraint import LabelsConstraint
 from .logging import LogLevel
 from .retrieve_method import RetrieveMethod
 from .transfers import RemoteJob
+from .upload_journal import UploadJournal
+from .content_cache import ContentCache
+from .response_cache import ResponseCache
+from .instrumentation import HttpMetricsCollector, RequestRecord, EndpointStats, get_endpoint_template
+from .request_profiler import RequestProfiler
+from .json_codec import JsonCodec, OrjsonCodec, MsgspecCodec, get_json_codec
+from .concurrency_limiter import AdaptiveConcurrencyLimiter
+from .circuit_breaker import CircuitBreaker, CircuitState
@@ -0,0 +1,4 @@
+# asyncio flavour of the client, requires the optional 'httpx' dependency: pip install orthanc-api-client[async]
+from .http_client import AsyncHttpClient
+from .api_client import AsyncOrthancApiClient
+from .job import AsyncJob
@@ -0,0 +1,258 @@
+import asyncio
+import datetime
+import logging
+import os
+import time
+import typing
+from typing import List, Optional, Dict
+from urllib.parse import urlencode
+
+from ..api_client import SystemStatistics, EducationPluginHeaderProvider
+from ..change import Change
+from ..exceptions import *
+from .http_client import AsyncHttpClient
+from .resources import AsyncInstances, AsyncSeriesList, AsyncStudies, AsyncPatients, AsyncJobs
+from .modalities import AsyncDicomModalities
+from .peers import AsyncPeers
+from .transfers import AsyncTransfers
+from .dicomweb_servers import AsyncDicomWebServers
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOrthancApiClient(AsyncHttpClient):
+
+    def __init__(self,
+                 orthanc_root_url: str,
+                 user: Optional[str] = None,
+                 pwd: Optional[str] = None,
+                 api_token: Optional[str] = None,
+                 headers: Optional[Dict[str, str]] = None,
+                 token_provider: Optional[EducationPluginHeaderProvider] = None,
+                 max_connections: int = 100,
+                 max_keepalive_connections: int = 20,
+                 timeout: Optional[float] = None) -> None:
+        """Creates an asyncio client.  It must be used from a running event loop and closed with `await client.close()`
+        (or used as an `async with` context manager).
+
+        Parameters
+        ----------
+        orthanc_root_url: base orthanc url: ex= 'http://localhost:8042'
+        user: an orthanc user name (for basic Auth)
+        pwd: the password for the orthanc user (for basic Auth)
+        api_token: a token obtained from inside an Orthanc python plugin through orthanc.GenerateRestApiAuthorizationToken
+                   format: 'Bearer 3d03892c-fe...' or '3d03892c-fe...'
+        headers: HTTP headers that will be included in each requests
+        token_provider: if the education plugin is in the game, this will allow to get the token (actually, the headers)
+        max_connections: The maximum number of HTTP connections in the pool (default=100).  This is also the maximum
+                         number of requests that are in-flight at the same time; the other ones wait for a free connection.
+        max_keepalive_connections: The number of idle connections that are kept open in the pool.
+        timeout: timeout (in seconds) of each request, None to wait forever (like OrthancApiClient)
+        """
+
+        if api_token:
+            if headers is None:
+                headers = {}
+            if api_token.startswith('Bearer '):
+                header_value = api_token
+            else:
+                header_value = f'Bearer {api_token}'
+            headers['authorization'] = header_value
+
+        if token_provider:
+            headers = token_provider.get_headers()
+
+        super().__init__(root_url=orthanc_root_url,
+                         user=user,
+                         pwd=pwd,
+                         headers=headers,
+                         on_403_error=token_provider.renew_headers if token_provider is not None else None,
+                         max_connections=max_connections,
+                         max_keepalive_connections=max_keepalive_connections,
+                         timeout=timeout)
+
+        self.patients = AsyncPatients(api_client=self)
+        self.studies = AsyncStudies(api_client=self)
+        self.series = AsyncSeriesList(api_client=self)
+        self.instances = AsyncInstances(api_client=self)
+        self.dicomweb_servers = AsyncDicomWebServers(api_client=self)
+        self.modalities = AsyncDicomModalities(api_client=self)
+        self.jobs = AsyncJobs(api_client=self)
+        self.transfers = AsyncTransfers(api_client=self)
+        self.peers = AsyncPeers(api_client=self)
+
+    def __repr__(self) -> str:
+        return f"{self._root_url}"
+
+    async def wait_started(self, timeout: float = None) -> bool:
+        end_time = time.time() + timeout if timeout is not None else None
+
+        while end_time is None or time.time() < end_time:
+            if await self.is_alive():
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
+    async def is_alive(self, timeout = 1) -> bool:
+        """Checks if the orthanc server can be reached.
+
+        Returns
+        -------
+            True if orthanc can be reached, False otherwise
+        """
+        try:
+            # if we get an answer to a basic request, it means the server is alive
+            await self.get('system', timeout=timeout)
+            return True
+        except Exception as e:
+            return False
+
+    async def get_system(self) -> object:
+        return await self.get_json('system')
+
+    async def get_statistics(self) -> SystemStatistics:
+        return SystemStatistics(json_stats=await self.get_json('statistics'))
+
+    async def delete_all_content(self):
+        """Deletes all content from Orthanc"""
+        await self.patients.delete_all()
+
+    async def upload(self, buffer: bytes, ignore_errors: bool = False) -> List[str]:
+        """Uploads the content of a binary buffer to Orthanc (can be a DICOM file or a zip file)
+
+        Parameters
+        ----------
+        ignore_errors: if True: does not raise exceptions
+
+        Returns
+        -------
+        the instance id of the uploaded file or None when uploading a zip file
+        """
+        try:
+            response = await self.post('instances', content=buffer)
+            answer = response.json()
+            if isinstance(answer, list):
+                return [x['ID'] for x in answer]
+            else:
+                return [answer['ID']]
+        except HttpError as ex:
+            if ex.http_status_code == 409 and ignore_errors:  # same instance being uploaded twice at the same time
+                return []
+            if ex.http_status_code == 400 and ex.request_response.json()['OrthancStatus'] == 15:
+                if ignore_errors:
+                    return []
+                else:
+                    raise BadFileFormat(ex)
+            else:
+                raise ex
+
+    async def upload_file(self, path, ignore_errors: bool = False) -> List[str]:
+        """Uploads a file to Orthanc (can be a DICOM file or a zip file)
+
+        Returns
+        -------
+        the list of instances ids (one if a single file, can be multiple if the uploaded file is a zip)
+        """
+        logger.info(f"uploading {path}")
+        with open(path, 'rb') as f:
+            content = f.read()
+        return await self.upload(content, ignore_errors)
+
+    async def upload_folder(self,
+                            folder_path: str,
+                            skip_extensions: List[str] = None,
+                            ignore_dots: bool = True,
+                            ignore_errors: bool = False,
+                            max_concurrent_uploads: int = 10
+                            ) -> List[str]:
+        """Uploads all files from a folder (and its sub-folders).  Up to `max_concurrent_uploads` files are uploaded at the same time.
+
+        Parameters
+        ----------
+        folder_path: the folder to upload
+        skip_extensions: a list of extensions to skip e.g: ['.ini', '.bmp']
+        ignore_dots: to ignore files/folders starting with a dot
+        ignore_errors: if True: does not raise exceptions
+        max_concurrent_uploads: the maximum number of files being uploaded at the same time
+
+        Returns
+        -------
+        A list of instances id (one for each uploaded file)
+        """
+        paths = []
+        for root, dirs, files in os.walk(folder_path):
+            if ignore_dots:
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for file in files:
+                if ignore_dots and file.startswith('.'):
+                    continue
+                if skip_extensions and any([file.endswith(ext) for ext in skip_extensions]):
+                    continue
+                paths.append(os.path.join(root, file))
+
+        semaphore = asyncio.Semaphore(max_concurrent_uploads)
+
+        async def upload_one(path):
+            async with semaphore:
+                return await self.upload_file(path, ignore_errors=ignore_errors)
+
+        results = await asyncio.gather(*[upload_one(path) for path in paths])
+        return [instance_id for instances_ids in results for instance_id in instances_ids]
+
+    async def lookup(self, needle: str, filter: str = None) -> List[str]:
+        """searches the Orthanc DB for the 'needle'
+
+        Parameters:
+        ----------
+        needle: the value to look for (may be a StudyInstanceUid, a PatientID, ...)
+        filter: the only type returned, 'None' will return all types (Study, Patient, Series, Instance)
+
+        Returns:
+        -------
+        the list of resources ids
+        """
+        response = await self.post(
+            endpoint="tools/lookup",
+            content=needle
+        )
+
+        return [r['ID'] for r in response.json() if filter is None or r['Type'] == filter]
+
+    async def get_changes(self, since: int = None, limit: int = None) -> typing.Tuple[List[Change], int, bool]:
+        """ get the changes
+
+        Returns:
+        -------
+        - the list of changes
+        - the last sequence id returned
+        - a boolean indicating if there are more changes to load
+        """
+
+        args = {}
+
+        if since:
+            args['since'] = since
+        if limit:
+            args['limit'] = limit
+
+        response = await self.get_json(
+            endpoint="changes?" + urlencode(args)
+        )
+
+        changes = []
+        for c in response['Changes']:
+            changes.append(Change(
+                change_type=c.get('ChangeType'),
+                timestamp=datetime.datetime.strptime(c.get('Date'), "%Y%m%dT%H%M%S"),
+                sequence_id=c.get('Seq'),
+                resource_type=c.get('ResourceType'),
+                resource_id=c.get('ID')
+            ))
+
+        return changes, response['Last'], response['Done']
+
+    async def get_all_labels(self):
+        """
+        List all the labels that are associated with any resource of the Orthanc database
+        """
+        return await self.get_json(endpoint="tools/labels")
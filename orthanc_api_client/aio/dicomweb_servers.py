@@ -0,0 +1,58 @@
+from typing import List, Union
+
+from .job import AsyncJob
+
+
+class AsyncDicomWebServers:
+
+    def __init__(self, api_client: 'AsyncOrthancApiClient'):
+        self._api_client = api_client
+        self._url_segment = 'dicom-web/servers'
+
+    async def send_async(self, target_server: str, resources_ids: Union[List[str], str]) -> AsyncJob:
+        """sends a list of resources to a remote DicomWeb server
+
+        Returns
+        -------
+        The job that has been created
+        """
+
+        if isinstance(resources_ids, str):
+            resources_ids = [resources_ids]
+
+        r = await self._api_client.post(
+            endpoint=f"{self._url_segment}/{target_server}/stow",
+            json={
+                "Resources": resources_ids,
+                "Synchronous": False
+            })
+
+        return AsyncJob(api_client=self._api_client, orthanc_id=r.json()['ID'])
+
+    async def send(self, target_server: str, resources_ids: Union[List[str], str]):
+        """sends a list of resources to a remote DicomWeb server
+        """
+
+        if isinstance(resources_ids, str):
+            resources_ids = [resources_ids]
+
+        await self._api_client.post(
+            endpoint=f"{self._url_segment}/{target_server}/stow",
+            json={
+                "Resources": resources_ids,
+                "Synchronous": True
+            })
+
+    async def retrieve_resources(self, remote_server: str, resources: List[object]) -> int:
+        """Retrieves a list of resources from a remote DicomWeb server.
+        Returns the number of instances received.
+        """
+
+        r = await self._api_client.post(
+            endpoint=f"{self._url_segment}/{remote_server}/retrieve",
+            json={
+                "Resources": resources,
+                "Synchronous": True
+            })
+
+        return int(r.json()['ReceivedInstancesCount'])
@@ -0,0 +1,130 @@
+import asyncio
+import urllib.parse
+from typing import Any
+
+import httpx
+
+from orthanc_api_client import exceptions as api_exceptions
+from ..helpers_internal import raise_on_http_error
+
+
+class AsyncHttpClient:
+
+    def __init__(self, root_url: str, user: str = None, pwd: str = None, headers: any = None, on_403_error = None, max_connections: int = 100, max_keepalive_connections: int = 20, timeout: float = None) -> None:
+        """
+        asyncio counterpart of HttpClient.  All the requests share the same connection pool that can serve
+        up to `max_connections` in-flight requests; the other requests wait for a connection to become available.
+        """
+        self._root_url = root_url
+
+        # only retries on connection errors (the request has not reached Orthanc); 502/503 are retried in _request
+        transport = httpx.AsyncHTTPTransport(
+            retries=3,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        )
+        self._http_session = httpx.AsyncClient(
+            auth=httpx.BasicAuth(user, pwd) if user and pwd else None,
+            headers=headers,
+            transport=transport,
+            timeout=httpx.Timeout(timeout)
+        )
+
+        self._user = user
+        self._pwd = pwd
+
+        self._status_retries = 3
+        self._backoff_factor = 0.2
+
+        self._on_403_error = on_403_error
+        self._token_lock = None  # created in the event loop by the first token renewal
+
+    def get_abs_url(self, endpoint: str) -> str:
+        # remove the leading '/' because _root_url might be something like 'http://my.domain/orthanc/' and urljoin would then remove the '/orthanc'
+        normalised_endpoint = endpoint[1:] if endpoint.startswith("/") else endpoint
+
+        return urllib.parse.urljoin(self._root_url, normalised_endpoint)
+
+    async def get(self, endpoint: str, **kwargs) -> httpx.Response:
+        return await self._request("GET", endpoint, **kwargs)
+
+    async def get_json(self, endpoint: str, **kwargs) -> Any:
+        return (await self.get(endpoint, **kwargs)).json()
+
+    async def get_binary(self, endpoint: str, **kwargs) -> Any:
+        return (await self.get(endpoint, **kwargs)).content
+
+    async def post(self, endpoint: str, **kwargs) -> httpx.Response:
+        return await self._request("POST", endpoint, **kwargs)
+
+    async def put(self, endpoint: str, **kwargs) -> httpx.Response:
+        return await self._request("PUT", endpoint, **kwargs)
+
+    async def delete(self, endpoint: str, **kwargs) -> httpx.Response:
+        return await self._request("DELETE", endpoint, **kwargs)
+
+    async def close(self):
+        await self._http_session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        url = self.get_abs_url(endpoint)
+        # accept the `requests` naming of the arguments to ease porting code from HttpClient
+        if 'allow_redirects' in kwargs:
+            kwargs['follow_redirects'] = kwargs.pop('allow_redirects')
+        if isinstance(kwargs.get('data'), (bytes, str)):
+            kwargs['content'] = kwargs.pop('data')
+
+        try:
+            response = await self._send_with_status_retries(method, url, **kwargs)
+
+            if await self._raise_or_retry_on_errors(response, url=url):
+                response = await self._send_with_status_retries(method, url, **kwargs)
+                await self._raise_or_retry_on_errors(response, url=url, can_renew_token=False)
+            return response
+        except httpx.HTTPError as request_exception:
+            self._translate_exception(request_exception, url=url)
+
+    async def _send_with_status_retries(self, method: str, url: str, **kwargs) -> httpx.Response:
+        # same policy as the urllib3 Retry of HttpClient: only retry "Bad Gateway" and "Service Unavailable"
+        for attempt in range(self._status_retries + 1):
+            response = await self._http_session.request(method, url, **kwargs)
+            if response.status_code not in (502, 503) or attempt == self._status_retries:
+                return response
+            await asyncio.sleep(self._backoff_factor * (2 ** attempt))
+
+    async def _raise_or_retry_on_errors(self, response, url, can_renew_token: bool = True) -> bool:
+        '''
+        Will fire the ad hoc exception based on the error code;
+        Will return True if a retry has to be performed;
+        Will return False if everything was ok (HTTP 200 code).
+        '''
+        if response.status_code >= 200 and response.status_code < 300:
+            return False
+
+        if response.status_code == 403:
+            # with the education plugin, the token may have expired, so let's try to renew it before raising an exception
+            if self._on_403_error is not None and can_renew_token:
+                if self._token_lock is None:
+                    self._token_lock = asyncio.Lock()
+                async with self._token_lock:
+                    # if another coroutine has renewed the token since this request has been sent, just retry with the new one
+                    if response.request.headers.get('Authorization') == self._http_session.headers.get('Authorization'):
+                        # the login is a blocking request: keep it out of the event loop
+                        headers = await asyncio.get_running_loop().run_in_executor(None, self._on_403_error)
+                        self._http_session.headers.update(headers)
+                return True
+            raise api_exceptions.NotAuthorized(response.status_code, url=url)
+
+        raise_on_http_error(response, url=url)
+
+    def _translate_exception(self, request_exception, url):
+        if isinstance(request_exception, httpx.TimeoutException):
+            raise api_exceptions.TimeoutError(url=url)
+        elif isinstance(request_exception, httpx.TransportError):
+            raise api_exceptions.ConnectionError(url=url)
+        raise request_exception
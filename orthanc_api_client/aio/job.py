@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from ..job import JobInfo, JobStatus
+
+
+class AsyncJob:
+
+    def __init__(self, api_client, orthanc_id):
+        self._api_client = api_client
+        self.orthanc_id = orthanc_id
+        self._info = None
+
+    @staticmethod
+    def from_json(api_client, json_job: object):
+        job = AsyncJob(api_client, json_job.get('ID'))
+        job._info = JobInfo(json_job)
+        return job
+
+    @property
+    def info(self) -> JobInfo:  # last info that has been loaded, call refresh() to update it
+        return self._info
+
+    @property
+    def content(self):
+        return self._info.content if self._info is not None else None
+
+    async def refresh(self) -> "AsyncJob":
+        json_job = await self._api_client.jobs.get_json(self.orthanc_id)
+        self._info = JobInfo(json_job)
+        return self
+
+    async def is_complete(self) -> bool:
+        await self.refresh()
+
+        return self._info.status in [JobStatus.SUCCESS, JobStatus.FAILURE]
+
+    async def wait_completed(self, timeout: float = None, polling_interval: float = 1) -> bool:
+        end_time = time.time() + timeout if timeout is not None else None
+
+        while end_time is None or time.time() < end_time:
+            if await self.is_complete():
+                return True
+            await asyncio.sleep(polling_interval)
+        return False
@@ -0,0 +1,147 @@
+import asyncio
+import typing
+from typing import List, Union, Optional
+
+from ..tags import SimplifiedTags
+from ..modalities import QueryResult, RemoteModalityStudy
+from .job import AsyncJob
+
+
+class AsyncDicomModalities:
+
+    def __init__(self, api_client: 'AsyncOrthancApiClient'):
+        self._api_client = api_client
+        self._url_segment = 'modalities'
+
+    async def find_worklist(self, modality: str, query = {}):
+        r = await self._api_client.post(
+            endpoint=f"{self._url_segment}/{modality}/find-worklist",
+            json=query
+        )
+        return r.json()
+
+    async def store(self, target_modality: str, resources_ids: Union[List[str], str], timeout: Optional[float] = None):
+        """alias for send"""
+        return await self.send(target_modality=target_modality, resources_ids=resources_ids, timeout=timeout)
+
+    async def send_async(self, target_modality: str, resources_ids: Union[List[str], str], local_aet: str = None) -> AsyncJob:
+        """sends a list of resources to a remote DICOM modality
+
+        Returns
+        -------
+        the created job
+        """
+
+        if isinstance(resources_ids, str):
+            resources_ids = [resources_ids]
+
+        payload = {
+            "Resources": resources_ids,
+            "Synchronous": False
+        }
+        if local_aet is not None:
+            payload.update({"LocalAet": local_aet})
+
+        r = await self._api_client.post(
+            endpoint=f"{self._url_segment}/{target_modality}/store",
+            json=payload
+        )
+
+        return AsyncJob(api_client=self._api_client, orthanc_id=r.json()['ID'])
+
+    async def send(self, target_modality: str, resources_ids: Union[List[str], str], timeout: Optional[float] = None, local_aet: str = None):
+        """sends a list of resources to a remote DICOM modality
+        The transfer is synchronous
+
+        Returns
+        -------
+        Nothing, will raise if failing
+        """
+
+        if isinstance(resources_ids, str):
+            resources_ids = [resources_ids]
+
+        payload = {
+            "Synchronous": True,
+            "Resources": resources_ids
+        }
+
+        if timeout is not None:
+            payload["Timeout"] = int(timeout+0.5)
+
+        if local_aet is not None:
+            payload.update({"LocalAet": local_aet})
+
+        await self._api_client.post(
+            endpoint=f"{self._url_segment}/{target_modality}/store",
+            json=payload)
+
+    async def move_study(self, from_modality: str, dicom_id: str, to_modality_aet: str = None):
+        """
+        moves a study from a remote modality (C-Move) to a target modality (AET)
+
+        this call is synchronous.  It completes once the C-Move is complete.
+        """
+        payload = {
+            'Level': 'Study',
+            'Resources': [{'StudyInstanceUID': dicom_id}],
+            'Asynchronous': False
+        }
+
+        if to_modality_aet:
+            payload['TargetAet'] = to_modality_aet
+
+        r = await self._api_client.post(
+            endpoint=f"{self._url_segment}/{from_modality}/move",
+            json=payload)
+        return r.json()
+
+    async def query_studies(self, from_modality: str, query: object) -> typing.List[RemoteModalityStudy]:
+        """
+        queries a remote modality for studies
+
+        :param from_modality: the modality alias configured in orthanc
+        :param query: DICOM queries; i.e: {PatientName:'TOTO*', StudyDate:'20150503-'}
+        """
+        results = await self._query(from_modality, {
+            'Level': 'Studies',
+            'Query': query
+        })
+
+        remote_studies = []
+        for result in results:
+            remote_study = RemoteModalityStudy()
+            remote_study.dicom_id = result.tags.get('StudyInstanceUID')
+            remote_study.tags = result.tags
+            remote_study.remote_modality_id = from_modality
+
+            remote_studies.append(remote_study)
+
+        return remote_studies
+
+    async def _query(self, from_modality, payload) -> typing.List[QueryResult]:
+
+        query = await self._api_client.post(
+            endpoint=f"{self._url_segment}/{from_modality}/query",
+            json=payload)
+
+        query_id = query.json()['ID']
+        answers_ids = await self._api_client.get_json(f"queries/{query_id}/answers")
+
+        # fetch all the answers concurrently
+        answers_contents = await asyncio.gather(*[self._api_client.get_json(f"queries/{query_id}/answers/{answer_id}/content?simplify")
+                                                  for answer_id in answers_ids])
+
+        results = []
+        for answer_id, answer_content in zip(answers_ids, answers_contents):
+            result = QueryResult()
+            result.tags = SimplifiedTags(answer_content)
+            result.retrieve_url = f"queries/{query_id}/answers/{answer_id}/retrieve"
+            results.append(result)
+
+        return results
+
+    async def get_all_ids(self) -> List[str]:
+        return await self._api_client.get_json(
+            endpoint=f"{self._url_segment}"
+        )
@@ -0,0 +1,37 @@
+from typing import List, Union
+
+from .job import AsyncJob
+
+
+class AsyncPeers:
+
+    def __init__(self, api_client: 'AsyncOrthancApiClient'):
+        self._api_client = api_client
+        self._url_segment = 'peers'
+
+    async def send_async(self, target_peer: str, resources_ids: Union[List[str], str]) -> AsyncJob:
+
+        if isinstance(resources_ids, str):
+            resources_ids = [resources_ids]
+
+        r = await self._api_client.post(
+            endpoint=f"{self._url_segment}/{target_peer}/store",
+            json= {
+                "Resources": list(resources_ids),
+                "Synchronous": False
+            })
+
+        return AsyncJob(api_client=self._api_client, orthanc_id=r.json()['ID'])
+
+    # sends a resource synchronously
+    async def send(self, target_peer: str, resources_ids: Union[List[str], str]):
+
+        if isinstance(resources_ids, str):
+            resources_ids = [resources_ids]
+
+        await self._api_client.post(
+            endpoint=f"{self._url_segment}/{target_peer}/store",
+            json= {
+                "Resources": list(resources_ids),
+                "Synchronous": True
+            })
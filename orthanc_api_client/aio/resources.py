@@ -0,0 +1,438 @@
+import asyncio
+import logging
+import os
+from typing import List, Tuple, Optional, Any, Set
+
+from ..exceptions import *
+from ..tags import Tags
+from ..study import StudyInfo
+from ..series import SeriesInfo
+from ..instance import InstanceInfo
+from ..patient import PatientInfo
+from ..downloaded_instance import DownloadedInstance
+from ..labels_constraint import LabelsConstraint
+from .job import AsyncJob
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncResources:
+
+    def __init__(self, api_client: 'AsyncOrthancApiClient', url_segment: str):
+        self._url_segment = url_segment
+        self._api_client = api_client
+
+    def _get_level(self):
+        if self._url_segment == "studies":
+            return "Study"
+        elif self._url_segment == "series":
+            return "Series"
+        elif self._url_segment == "instances":
+            return "Instance"
+        elif self._url_segment == "patients":
+            return "Patient"
+
+    async def get_json(self, orthanc_id: str):
+        return await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}")
+
+    async def get_json_statistics(self, orthanc_id: str):
+        return await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/statistics")
+
+    async def get_all_ids(self) -> List[str]:
+        return await self._api_client.get_json(f"{self._url_segment}/")
+
+    async def delete(self, orthanc_id: Optional[str] = None, orthanc_ids: Optional[List[str]] = None, ignore_errors: bool = False):
+
+        if orthanc_ids:
+            await asyncio.gather(*[self.delete(orthanc_id=oi, ignore_errors=ignore_errors) for oi in orthanc_ids])
+
+        if orthanc_id:
+            logger.debug(f"deleting {self._url_segment} {orthanc_id}")
+            try:
+                await self._api_client.delete(f"{self._url_segment}/{orthanc_id}")
+            except ResourceNotFound as ex:
+                if not ignore_errors:
+                    raise ex
+
+    async def delete_all(self, ignore_errors: bool = False) -> List[str]:
+        all_ids = await self.get_all_ids()
+        await self.delete(orthanc_ids=all_ids, ignore_errors=ignore_errors)
+        return all_ids
+
+    async def exists(self, orthanc_id: str) -> bool:
+        try:
+            await self._api_client.get(
+                endpoint=f"{self._url_segment}/{orthanc_id}"
+            )
+            return True
+        except ResourceNotFound:
+            return False
+
+    async def set_attachment(self, orthanc_id: str, attachment_name: str, content: Optional[bytes] = None, path: Optional[str] = None, content_type: Optional[str] = None, match_revision: Optional[str] = None):
+
+        if content is None and path is not None:
+            with open(path, 'rb') as f:
+                content = f.read()
+
+        headers = {}
+
+        if content_type:
+            headers['Content-Type'] = content_type
+
+        if match_revision is not None:
+            headers['If-Match'] = match_revision
+
+        await self._api_client.put(
+            endpoint=f"{self._url_segment}/{orthanc_id}/attachments/{attachment_name}",
+            content=content,
+            headers=headers
+        )
+
+    async def get_attachment(self, orthanc_id: str, attachment_name: str) -> bytes:
+        content, revision = await self.get_attachment_with_revision(orthanc_id=orthanc_id, attachment_name=attachment_name)
+        return content
+
+    async def get_attachment_with_revision(self, orthanc_id: str, attachment_name: str) -> Tuple[bytes, str]:
+        response = await self._api_client.get(
+            endpoint=f"{self._url_segment}/{orthanc_id}/attachments/{attachment_name}/data"
+        )
+        return response.content, response.headers.get('etag')
+
+    async def set_binary_metadata(self, orthanc_id: str, metadata_name: str, content: Optional[bytes] = None, path: Optional[str] = None, match_revision: Optional[str] = None):
+
+        if content is None and path is not None:
+            with open(path, 'rb') as f:
+                content = f.read()
+
+        headers = {}
+
+        if match_revision is not None:
+            headers['If-Match'] = match_revision
+
+        await self._api_client.put(
+            endpoint=f"{self._url_segment}/{orthanc_id}/metadata/{metadata_name}",
+            content=content,
+            headers=headers
+        )
+
+    async def set_string_metadata(self, orthanc_id: str, metadata_name: str, content: str, match_revision: Optional[str] = None):
+        await self.set_binary_metadata(
+            orthanc_id=orthanc_id,
+            metadata_name=metadata_name,
+            content=content.encode('utf-8'),
+            match_revision=match_revision
+        )
+
+    async def get_binary_metadata_with_revision(self, orthanc_id: str, metadata_name: str, default_value: Optional[bytes] = None) -> Tuple[bytes, str]:
+        try:
+            response = await self._api_client.get(
+                endpoint=f"{self._url_segment}/{orthanc_id}/metadata/{metadata_name}"
+            )
+        except ResourceNotFound:
+            return default_value, None
+
+        return response.content, response.headers.get('etag')
+
+    async def get_binary_metadata(self, orthanc_id: str, metadata_name: str, default_value: Optional[bytes] = None) -> bytes:
+        content, revision = await self.get_binary_metadata_with_revision(orthanc_id=orthanc_id, metadata_name=metadata_name, default_value=default_value)
+        return content
+
+    async def get_string_metadata(self, orthanc_id: str, metadata_name: str, default_value: Optional[str] = None) -> str:
+        content = await self.get_binary_metadata(
+            orthanc_id=orthanc_id,
+            metadata_name=metadata_name,
+            default_value=default_value.encode('utf-8') if default_value is not None else None
+        )
+        return content.decode('utf-8') if content is not None else None
+
+    async def has_metadata(self, orthanc_id: str, metadata_name: str) -> bool:
+        return await self.get_binary_metadata(orthanc_id=orthanc_id, metadata_name=metadata_name, default_value=None) is not None
+
+    async def get_labels(self, orthanc_id: str) -> List[str]:
+        return await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/labels")
+
+    async def add_label(self, orthanc_id: str, label: str):
+        await self._api_client.put(f"{self._url_segment}/{orthanc_id}/labels/{label}")
+
+    async def add_labels(self, orthanc_id: str, labels: List[str]):
+        await asyncio.gather(*[self.add_label(orthanc_id, label) for label in labels])
+
+    async def delete_label(self, orthanc_id: str, label: str):
+        await self._api_client.delete(f"{self._url_segment}/{orthanc_id}/labels/{label}")
+
+    async def delete_labels(self, orthanc_id: str, labels: List[str]):
+        await asyncio.gather(*[self.delete_label(orthanc_id, label) for label in labels])
+
+    async def _lookup(self, filter: str, dicom_id: str) -> Optional[str]:
+        resource_ids = await self._api_client.lookup(needle=dicom_id, filter=filter)
+        if len(resource_ids) == 1:
+            return resource_ids[0]
+
+        if len(resource_ids) > 1:
+            raise TooManyResourcesFound()
+        return None
+
+    async def _find(self, query: object, case_sensitive: bool = True, labels: List[str] = [], labels_constraint: LabelsConstraint = LabelsConstraint.ANY, limit: int = 0, since: int = 0, order_by: List[dict] = [], requested_tags: List[str] = []) -> List[Any]:
+        payload = {
+            "Level": self._get_level(),
+            "Query": query,
+            "Expand": True,
+            "CaseSensitive": case_sensitive,
+            "Labels": labels,
+            "LabelsConstraint": labels_constraint,
+            "Limit": limit,
+            "Since": since,
+            "OrderBy": order_by,
+            "RequestedTags": requested_tags
+        }
+
+        r = await self._api_client.post(
+            endpoint="tools/find",
+            json=payload)
+        return r.json()
+
+    async def _anonymize_or_modify(self, operation: str, orthanc_id: str, query: Any, delete_original: bool) -> str:
+        r = await self._api_client.post(
+            endpoint=f"{self._url_segment}/{orthanc_id}/{operation}",
+            json=query)
+
+        new_id = r.json()['ID']
+        if delete_original and new_id != orthanc_id:
+            await self.delete(orthanc_id)
+
+        return new_id
+
+    async def anonymize(self, orthanc_id: str, replace_tags={}, keep_tags=[], delete_original=True, force=False) -> str:
+        query = {
+            "Force": force
+        }
+        if replace_tags is not None and len(replace_tags) > 0:
+            query['Replace'] = replace_tags
+        if keep_tags is not None and len(keep_tags) > 0:
+            query['Keep'] = keep_tags
+
+        return await self._anonymize_or_modify("anonymize", orthanc_id, query, delete_original)
+
+    async def modify(self, orthanc_id: str, replace_tags: Any = {}, remove_tags: List[str] = [], keep_tags: List[str] = [], delete_original=True, force=False) -> str:
+        query = {
+            "Force": force
+        }
+        if replace_tags is not None and len(replace_tags) > 0:
+            query['Replace'] = replace_tags
+        if remove_tags is not None and len(remove_tags) > 0:
+            query['Remove'] = remove_tags
+        if keep_tags is not None and len(keep_tags) > 0:
+            query['Keep'] = keep_tags
+
+        return await self._anonymize_or_modify("modify", orthanc_id, query, delete_original)
+
+    async def modify_bulk_async(self, orthanc_ids: List[str] = [], replace_tags: Any = {}, remove_tags: List[str] = [], keep_tags: List[str] = [], delete_original: bool = True, force: bool = False, transcode: Optional[str] = None, permissive: bool = False) -> AsyncJob:
+        query = {
+            "Force": force,
+            "Level": self._get_level(),
+            "Resources": orthanc_ids,
+            "Asynchronous": True,
+            "Permissive": permissive
+        }
+
+        if replace_tags is not None and len(replace_tags) > 0:
+            query['Replace'] = replace_tags
+        if remove_tags is not None and len(remove_tags) > 0:
+            query['Remove'] = remove_tags
+        if keep_tags is not None and len(keep_tags) > 0:
+            query['Keep'] = keep_tags
+        if transcode:
+            query['Transcode'] = transcode
+        if delete_original:
+            query['KeepSource'] = False
+
+        r = await self._api_client.post(
+            endpoint="tools/bulk-modify",
+            json=query)
+
+        return AsyncJob(api_client=self._api_client, orthanc_id=r.json()['ID'])
+
+    async def download_archive(self, orthanc_id: str, path: str):
+        file_content = await self._api_client.get_binary(f"{self._url_segment}/{orthanc_id}/archive")
+        with open(path, 'wb') as f:
+            f.write(file_content)
+
+    async def download_media(self, orthanc_id: str, path: str):
+        file_content = await self._api_client.get_binary(f"{self._url_segment}/{orthanc_id}/media")
+        with open(path, 'wb') as f:
+            f.write(file_content)
+
+
+class AsyncInstances(AsyncResources):
+
+    def __init__(self, api_client: 'AsyncOrthancApiClient'):
+        super().__init__(api_client=api_client, url_segment='instances')
+
+    async def get_info(self, orthanc_id: str) -> InstanceInfo:
+        return InstanceInfo(await self.get_json(orthanc_id))
+
+    async def get_file(self, orthanc_id: str) -> bytes:
+        return await self._api_client.get_binary(f"{self._url_segment}/{orthanc_id}/file")
+
+    async def get_parent_series_id(self, orthanc_id: str) -> str:
+        return (await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/series"))['ID']
+
+    async def get_parent_study_id(self, orthanc_id: str) -> str:
+        return (await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/study"))['ID']
+
+    async def get_parent_patient_id(self, orthanc_id: str) -> str:
+        return (await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/patient"))['ID']
+
+    async def get_tags(self, orthanc_id: str) -> Tags:
+        json_tags = await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/tags")
+        return Tags(json_tags)
+
+    async def get_metadata(self, orthanc_id: str) -> dict:
+        return await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/metadata?expand")
+
+    async def lookup(self, dicom_id: str) -> Optional[str]:
+        return await self._lookup(filter='Instance', dicom_id=dicom_id)
+
+    async def find(self, query: object, case_sensitive: bool = True, labels: List[str] = [], labels_constraint: LabelsConstraint = LabelsConstraint.ANY, limit: int = 0, since: int = 0) -> List[InstanceInfo]:
+        return [InstanceInfo(j) for j in await self._find(query=query, case_sensitive=case_sensitive, labels=labels, labels_constraint=labels_constraint, limit=limit, since=since)]
+
+    async def download_instance(self, instance_id: str, path: str) -> DownloadedInstance:
+        file_content = await self.get_file(instance_id)
+        with open(path, 'wb') as f:
+            f.write(file_content)
+
+        return DownloadedInstance(instance_id, path)
+
+    async def download_instances(self, instances_ids: List[str], path: str) -> List[DownloadedInstance]:
+        """
+        downloads the instances DICOM files to disk; all the downloads are run concurrently (the number of
+        in-flight requests is bounded by the client `max_connections`)
+        """
+        return list(await asyncio.gather(*[self.download_instance(instance_id=instance_id, path=os.path.join(path, instance_id + ".dcm"))
+                                           for instance_id in instances_ids]))
+
+
+class AsyncSeriesList(AsyncResources):
+
+    def __init__(self, api_client: 'AsyncOrthancApiClient'):
+        super().__init__(api_client=api_client, url_segment='series')
+
+    async def get_info(self, orthanc_id: str) -> SeriesInfo:
+        return SeriesInfo(await self.get_json(orthanc_id))
+
+    async def get_instances_ids(self, orthanc_id: str) -> List[str]:
+        return (await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}"))["Instances"]
+
+    async def get_parent_study_id(self, orthanc_id: str) -> str:
+        return (await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/study"))['ID']
+
+    async def get_parent_patient_id(self, orthanc_id: str) -> str:
+        return (await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/patient"))['ID']
+
+    async def get_tags(self, orthanc_id: str) -> Tags:
+        instances_ids = await self.get_instances_ids(orthanc_id)
+        return await self._api_client.instances.get_tags(instances_ids[0])
+
+    async def lookup(self, dicom_id: str) -> Optional[str]:
+        return await self._lookup(filter='Series', dicom_id=dicom_id)
+
+    async def find(self, query: object, case_sensitive: bool = True, labels: List[str] = [], labels_constraint: LabelsConstraint = LabelsConstraint.ANY, limit: int = 0, since: int = 0) -> List[SeriesInfo]:
+        return [SeriesInfo(j) for j in await self._find(query=query, case_sensitive=case_sensitive, labels=labels, labels_constraint=labels_constraint, limit=limit, since=since)]
+
+    async def download_instances(self, series_id: str, path: str) -> List[DownloadedInstance]:
+        return await self._api_client.instances.download_instances(await self.get_instances_ids(series_id), path)
+
+
+class AsyncStudies(AsyncResources):
+
+    def __init__(self, api_client: 'AsyncOrthancApiClient'):
+        super().__init__(api_client=api_client, url_segment='studies')
+
+    async def get_info(self, orthanc_id: str) -> StudyInfo:
+        return StudyInfo(await self.get_json(orthanc_id))
+
+    async def get_series_ids(self, orthanc_id: str) -> List[str]:
+        return (await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}"))["Series"]
+
+    async def get_instances_ids(self, orthanc_id: str) -> List[str]:
+        series_ids = await self.get_series_ids(orthanc_id)
+        instances_ids_per_series = await asyncio.gather(*[self._api_client.series.get_instances_ids(series_id) for series_id in series_ids])
+        return [instance_id for instances_ids in instances_ids_per_series for instance_id in instances_ids]
+
+    async def get_parent_patient_id(self, orthanc_id: str) -> str:
+        return (await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/patient"))['ID']
+
+    async def get_tags(self, orthanc_id: str) -> Tags:
+        instances_ids = await self.get_instances_ids(orthanc_id)
+        return await self._api_client.instances.get_tags(instances_ids[0])
+
+    async def get_modalities(self, orthanc_id: str) -> Set[str]:
+        series_ids = await self.get_series_ids(orthanc_id)
+        series_infos = await asyncio.gather(*[self._api_client.series.get_info(series_id) for series_id in series_ids])
+        return set([s.main_dicom_tags.get('Modality') for s in series_infos])
+
+    async def lookup(self, dicom_id: str) -> Optional[str]:
+        return await self._lookup(filter='Study', dicom_id=dicom_id)
+
+    async def find(self, query: object, case_sensitive: bool = True, labels: List[str] = [], labels_constraint: LabelsConstraint = LabelsConstraint.ANY, limit: int = 0, since: int = 0, order_by: List[dict] = [], requested_tags: List[str] = []) -> List[StudyInfo]:
+        return [StudyInfo(j) for j in await self._find(query=query, case_sensitive=case_sensitive, labels=labels, labels_constraint=labels_constraint, limit=limit, since=since, order_by=order_by, requested_tags=requested_tags)]
+
+    async def download_instances(self, study_id: str, path: str) -> List[DownloadedInstance]:
+        return await self._api_client.instances.download_instances(await self.get_instances_ids(study_id), path)
+
+
+class AsyncPatients(AsyncResources):
+
+    def __init__(self, api_client: 'AsyncOrthancApiClient'):
+        super().__init__(api_client=api_client, url_segment='patients')
+
+    async def get_info(self, orthanc_id: str) -> PatientInfo:
+        return PatientInfo(await self.get_json(orthanc_id))
+
+    async def get_studies_ids(self, orthanc_id: str) -> List[str]:
+        return (await self._api_client.get_json(f"{self._url_segment}/{orthanc_id}"))["Studies"]
+
+    async def get_instances_ids(self, orthanc_id: str) -> List[str]:
+        studies_ids = await self.get_studies_ids(orthanc_id)
+        instances_ids_per_study = await asyncio.gather(*[self._api_client.studies.get_instances_ids(study_id) for study_id in studies_ids])
+        return [instance_id for instances_ids in instances_ids_per_study for instance_id in instances_ids]
+
+    async def get_tags(self, orthanc_id: str) -> Tags:
+        instances_ids = await self.get_instances_ids(orthanc_id)
+        return await self._api_client.instances.get_tags(instances_ids[0])
+
+    async def lookup(self, dicom_id: str) -> Optional[str]:
+        return await self._lookup(filter='Patient', dicom_id=dicom_id)
+
+    async def find(self, query: object, case_sensitive: bool = True, labels: List[str] = [], labels_constraint: LabelsConstraint = LabelsConstraint.ANY, limit: int = 0, since: int = 0) -> List[PatientInfo]:
+        return [PatientInfo(j) for j in await self._find(query=query, case_sensitive=case_sensitive, labels=labels, labels_constraint=labels_constraint, limit=limit, since=since)]
+
+    async def download_instances(self, patient_id: str, path: str) -> List[DownloadedInstance]:
+        return await self._api_client.instances.download_instances(await self.get_instances_ids(patient_id), path)
+
+
+class AsyncJobs(AsyncResources):
+
+    def __init__(self, api_client: 'AsyncOrthancApiClient'):
+        super().__init__(api_client=api_client, url_segment='jobs')
+
+    def get(self, orthanc_id: str) -> AsyncJob:
+        return AsyncJob(api_client=self._api_client, orthanc_id=orthanc_id)
+
+    async def _post_job_action(self, orthanc_id: str, action: str):
+        await self._api_client.post(
+            endpoint=f"{self._url_segment}/{orthanc_id}/{action}",
+            content="")
+
+    async def resubmit(self, orthanc_id: str):
+        await self._post_job_action(orthanc_id=orthanc_id, action='resubmit')
+
+    async def cancel(self, orthanc_id: str):
+        await self._post_job_action(orthanc_id=orthanc_id, action='cancel')
+
+    async def pause(self, orthanc_id: str):
+        await self._post_job_action(orthanc_id=orthanc_id, action='pause')
+
+    async def resume(self, orthanc_id: str):
+        await self._post_job_action(orthanc_id=orthanc_id, action='resume')
@@ -0,0 +1,47 @@
+from typing import List, Union
+
+from ..exceptions import *
+from ..change import ResourceType
+from ..transfers import RemoteJob
+from .job import AsyncJob
+
+
+class AsyncTransfers:
+
+    def __init__(self, api_client: 'AsyncOrthancApiClient'):
+        self._api_client = api_client
+        self._url_segment = 'transfers'
+
+    async def send_async(self, target_peer: str, resources_ids: Union[List[str], str], resource_type: ResourceType, compress: bool = True) -> Union[AsyncJob, RemoteJob]:
+
+        if isinstance(resources_ids, str):
+            resources_ids = [resources_ids]
+
+        r = await self._api_client.post(
+            endpoint=f"{self._url_segment}/send",
+            json={
+                "Resources": [{"Level": resource_type, "ID": resource_id} for resource_id in resources_ids],
+                "Compression": "gzip" if compress else "none",
+                "Peer": target_peer
+            })
+        answer = r.json()
+        if "RemoteJob" in answer:
+            return RemoteJob(remote_job_id=answer["RemoteJob"], remote_url=answer["URL"])
+        elif "ID" in answer:
+            return AsyncJob(api_client=self._api_client, orthanc_id=answer['ID'])
+        else:
+            raise HttpError(http_status_code=r.status_code, msg="Error while sending through transfers plugin", url=str(r.url), request_response=r)
+
+    async def send(self, target_peer: str, resources_ids: Union[List[str], str], resource_type: ResourceType, compress: bool = True, polling_interval: float = 0.2):
+
+        job = await self.send_async(
+            target_peer=target_peer,
+            resources_ids=resources_ids,
+            resource_type=resource_type,
+            compress=compress
+        )
+
+        if isinstance(job, RemoteJob):
+            raise OrthancApiException(msg="Pull jobs are not supported in send(), use send_async()")
+
+        await job.wait_completed(polling_interval=polling_interval)
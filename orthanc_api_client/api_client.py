@@ -1,17 +1,21 @@
 import base64
 import os
+import json
 import logging
+import threading
+import time
+import weakref
 import typing
 import datetime
 import zipfile
-import tempfile
-from typing import List, Optional, Dict
+import io
+from typing import List, Optional, Dict, Union, Callable
 from urllib.parse import urlunsplit, urlencode
 
 from .http_client import HttpClient
 from .resources import Instances, SeriesList, Studies, Jobs, Patients, Worklists
 
-from .helpers import wait_until, encode_multipart_related, is_version_at_least
+from .helpers import wait_until, is_version_at_least, read_dicom_header, compute_orthanc_id, compute_orthanc_id_from_file
 from .exceptions import *
 from .dicomweb_servers import DicomWebServers
 from .modalities import DicomModalities
@@ -22,6 +26,14 @@ from .transfers import Transfers
 from .peers import Peers
 from .logging import LogLevel
 from .capabilities import Capabilities
+from .parallel import run_in_parallel
+from .helpers_internal import MultipartRelatedStream
+from .upload_journal import UploadJournal
+from .content_cache import ContentCache
+from .response_cache import ResponseCache
+from .json_codec import JsonCodec
+from .concurrency_limiter import AdaptiveConcurrencyLimiter
+from .circuit_breaker import CircuitBreaker
 
 import requests
 
@@ -55,24 +67,95 @@ class Metrics:
 
 class EducationPluginHeaderProvider:
 
-    def __init__(self, orthanc_root_url, user, pwd):
+    def __init__(self, orthanc_root_url, user, pwd, refresh_margin: float = 60, auto_refresh: bool = True):
         """
         Helper to get a token from  Orthanc (when Education plugin is enabled).
+
+        The token is renewed `refresh_margin` seconds before it expires (if its expiry is known from the token or from
+        its cookie).  With `auto_refresh`, this is done in a background thread; otherwise, the token is renewed by
+        the next call to `get_headers`.  After each renewal, the clients using this provider receive the new headers.
         """
         self.orthanc_url = orthanc_root_url
         self.user = user
         self.pwd = pwd
+        self.refresh_margin = refresh_margin
+        self.auto_refresh = auto_refresh
         self._headers = None
+        self._expires_at: Optional[float] = None  # time.time() at which the token expires, None if unknown
+        self._lock = threading.RLock()
+        self._session = requests.Session()  # a single login session reused for all the renewals
+        self._listeners = []
+        self._refresh_timer: Optional[threading.Timer] = None
 
     def get_headers(self):
-        # Shouldn't we check that the token is expired?
+        """Returns the current headers, renews the token first if it has expired or is about to expire"""
+        with self._lock:
+            if self._headers is None or self._is_about_to_expire():
+                self._refresh()
+            return dict(self._headers)
+
+    def renew_headers(self):
+        """Renews the token (e.g. after a 403) and returns the new headers"""
+        with self._lock:
+            self._refresh()
+            return dict(self._headers)
+
+    def add_listener(self, callback: Callable[[Dict[str, str]], None]):
+        """Registers a callback (e.g. a client method) that receives the new headers after each renewal"""
+        with self._lock:
+            # weak references so that the provider does not keep the clients alive
+            self._listeners.append(weakref.WeakMethod(callback) if hasattr(callback, '__self__') else weakref.ref(callback))
+
+    def stop(self):
+        """Stops the background renewals"""
+        with self._lock:
+            self.auto_refresh = False
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+    def _is_about_to_expire(self) -> bool:
+        return self._expires_at is not None and time.time() >= self._expires_at - self.refresh_margin
+
+    def _refresh(self):
+        # called with the lock held: the background, expiry and 403 renewals all notify the clients sharing the provider
         self._headers = self._fetch_headers()
-
-        return self._headers
+        self._schedule_refresh()
+
+        headers = dict(self._headers)
+        callbacks = [listener() for listener in self._listeners]
+        self._listeners = [l for l, callback in zip(self._listeners, callbacks) if callback is not None]
+        for callback in callbacks:
+            if callback is not None:
+                callback(headers)
+
+    def _schedule_refresh(self, delay: Optional[float] = None):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+        if not self.auto_refresh or (delay is None and self._expires_at is None):
+            return
+
+        if delay is None:
+            delay = max(1.0, self._expires_at - self.refresh_margin - time.time())
+        self._refresh_timer = threading.Timer(delay, self._refresh_in_background)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if not self.auto_refresh:
+                return
+            try:
+                self._refresh()
+            except Exception as e:
+                logger.warning(f"Could not renew the education plugin token: {e}")
+                self._schedule_refresh(delay=max(1.0, self.refresh_margin / 4))  # the next 403 will also renew it
 
     def _fetch_headers(self):
-        session = requests.Session()
-        r = session.post(
+        self._session.cookies.clear()
+        r = self._session.post(
             f"{self.orthanc_url}/education/do-login",
             json={
                 "username": self.user,
@@ -81,11 +164,27 @@ class EducationPluginHeaderProvider:
         )
         r.raise_for_status()
 
-        token = session.cookies.get_dict()["orthanc-education-user"]
+        cookie = next(iter([c for c in self._session.cookies if c.name == "orthanc-education-user"]), None)
+        if cookie is None:
+            raise KeyError("orthanc-education-user")
+        token = cookie.value
+        self._expires_at = self._get_token_expiry(token) or cookie.expires
         return {
             "Authorization": f"Bearer {token}"
         }
 
+    @staticmethod
+    def _get_token_expiry(token: str) -> Optional[float]:
+        # the 'exp' claim of a JWT token, None if the token is not a JWT
+        parts = token.split('.')
+        if len(parts) != 3:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(parts[1] + '=' * (-len(parts[1]) % 4)))
+            return float(payload['exp'])
+        except Exception:
+            return None
+
 class OrthancApiClient(HttpClient):
 
     def __init__(self,
@@ -96,7 +195,14 @@ class OrthancApiClient(HttpClient):
                  headers: Optional[Dict[str, str]] = None,
                  token_provider: Optional[EducationPluginHeaderProvider] = None,
                  pool_maxsize: int = 10,
-                 pool_block: bool = False) -> None:
+                 pool_block: bool = False,
+                 content_cache: Optional[ContentCache] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 coalesce_requests: bool = False,
+                 json_codec: Optional[Union[str, JsonCodec]] = None,
+                 compress_requests_min_size: Optional[int] = None,
+                 concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None) -> None:
         """Creates an HttpClient
 
         Parameters
@@ -111,6 +217,23 @@ class OrthancApiClient(HttpClient):
         pool_maxsize: The number of HTTP connections in the pool (default=10).  If you are using the client from more than 10 threads,
                       you should increase this configuration.
         pool_block: if set to True, the pool_maxsize is a hard limit and the threads will wait for a new connection to become available.
+        content_cache: an optional local ContentCache where the instances files, the previews and the attachments are kept
+                       once downloaded (it can be shared by several clients/processes).
+        response_cache: an optional in-memory ResponseCache: the GET requests whose response has been received with an ETag
+                        are then revalidated with 'If-None-Match' and a '304 Not Modified' answer is served from memory.
+        coalesce_requests: if set to True, identical GET requests issued concurrently by several threads share a single
+                           HTTP request (e.g. many threads loading the same study at once).
+        json_codec: the codec used to encode the JSON bodies and decode the JSON responses: a JsonCodec or its name
+                    ('json' (default), 'orjson', 'msgspec' or 'auto' to use the fastest one that is installed).
+        compress_requests_min_size: if set, the request bodies larger than this size (e.g. large JSON payloads) are sent
+                                    gzipped ('Content-Encoding: gzip').  Orthanc, or the reverse proxy in front of it, must
+                                    accept compressed requests.  The responses are always negotiated compressed.
+        concurrency_limiter: an optional AdaptiveConcurrencyLimiter that limits the number of requests in flight and
+                             reduces it when Orthanc gets slow or answers '503 Service Unavailable'.  All the parallel
+                             operations of the client go through it and it can be shared by several clients.
+        circuit_breaker: an optional CircuitBreaker: once a remote modality, peer or DICOMweb server has failed several
+                         times in a row, the requests to this remote raise a CircuitOpen exception immediately instead of
+                         waiting for their timeout.  Its state is available through `circuit_breaker.get_stats()`.
         """
 
         if api_token:
@@ -129,9 +252,21 @@ class OrthancApiClient(HttpClient):
                          user=user,
                          pwd=pwd,
                          headers=headers,
-                         on_403_error=token_provider.get_headers if token_provider is not None else None,
+                         on_403_error=token_provider.renew_headers if token_provider is not None else None,
                          pool_maxsize=pool_maxsize,
-                         pool_block=pool_block)
+                         pool_block=pool_block,
+                         response_cache=response_cache,
+                         coalesce_requests=coalesce_requests,
+                         json_codec=json_codec,
+                         compress_requests_min_size=compress_requests_min_size,
+                         concurrency_limiter=concurrency_limiter,
+                         circuit_breaker=circuit_breaker)
+
+        if token_provider:
+            # the token renewed in the background is sent by the next requests
+            token_provider.add_listener(self._update_headers)
+
+        self.content_cache = content_cache
 
         self.patients = Patients(api_client=self)
         self.studies = Studies(api_client=self)
@@ -194,23 +329,37 @@ class OrthancApiClient(HttpClient):
         """Deletes all content from Orthanc"""
         self.patients.delete_all()
 
-    def upload(self, buffer: bytes, ignore_errors: bool = False) -> List[str]:
+    def upload(self, buffer: Union[bytes, typing.BinaryIO, typing.Iterable[bytes]], ignore_errors: bool = False) -> List[str]:
         """Uploads the content of a binary buffer to Orthanc (can be a DICOM file or a zip file)
 
         Parameters
         ----------
+        buffer: the content to upload.  It can be:
+                - a bytes buffer
+                - a binary file object (including a mmap.mmap), it is streamed without being read in memory
+                - an iterator of bytes chunks, it is sent with a chunked transfer-encoding
         ignore_errors: if True: does not raise exceptions
         
         Returns
         -------
         the instance id of the uploaded file or None when uploading a zip file
         """
+        return [x['ID'] for x in self._upload(buffer, ignore_errors)]
+
+    def _upload(self, buffer: Union[bytes, typing.BinaryIO, typing.Iterable[bytes]], ignore_errors: bool = False) -> List[dict]:
+        """Same as upload() but returns the full Orthanc answer for each instance
+        (the 'ID', 'ParentPatient', 'ParentStudy', 'ParentSeries', 'Status', ... fields)
+        """
+        if isinstance(buffer, (bytearray, memoryview)):
+            buffer = bytes(buffer)  # requests would consider them as iterators of ints
+
         try:
             response = self.post('instances', data=buffer)
-            if isinstance(response.json(), list):
-                return [x['ID'] for x in response.json()]
+            json_response = self.decode_json(response)
+            if isinstance(json_response, list):
+                return json_response
             else:
-                return [response.json()['ID']]
+                return [json_response]
         except HttpError as ex:
             if ex.http_status_code == 409 and ignore_errors:  # same instance being uploaded twice at the same time
                 return []
@@ -236,14 +385,21 @@ class OrthancApiClient(HttpClient):
         """
         logger.info(f"uploading {path}")
         with open(path, 'rb') as f:
-            return self.upload(f.read(), ignore_errors)
+            # the file object is streamed to Orthanc, it is never fully loaded in memory
+            return self.upload(f, ignore_errors)
 
 
     def upload_folder(self, 
                       folder_path: str, 
                       skip_extensions: List[str] = None,
                       ignore_dots: bool = True,
-                      ignore_errors: bool = False
+                      ignore_errors: bool = False,
+                      max_workers: int = 1,
+                      progress_callback: Optional[Callable[[str, List[str], Optional[Exception]], None]] = None,
+                      skip_existing: bool = False,
+                      journal_path: Optional[str] = None,
+                      batch_max_files: int = 1,
+                      batch_max_bytes: int = 16 * 1024 * 1024
                       ) -> List[str]:
         """Uploads all files from a folder.
 
@@ -252,15 +408,190 @@ class OrthancApiClient(HttpClient):
         folder_path: the folder to upload
         skip_extensions: a list of extensions to skip e.g: ['.ini', '.bmp']
         ignore_dots: to ignore files/folders starting with a dot
-        ignore_errors: if True: does not raise exceptions
+        ignore_errors: if True: the files that are rejected by Orthanc (bad file format or conflict) are skipped,
+                       like in upload().  The other errors (e.g. Orthanc can not be reached) are always raised:
+                       the first error is raised once the uploads in progress are complete.
+        max_workers: the number of files uploaded in parallel (1 = one file at a time).  The workers share the
+                     HTTP connections pool of this client: max_workers should not exceed its pool_maxsize.
+        progress_callback: called after each file with (path, instances_ids, error).  error is None if the upload succeeded.
+                           It is always called from the calling thread.
+        skip_existing: if True, the SOPInstanceUID of each file is read from its header (the pixel data is not read)
+                       and the files whose instance is already stored in Orthanc are not uploaded again.  Their
+                       instance id is still returned and reported to the progress_callback.  Files whose header can
+                       not be read (e.g. zip files) are always uploaded.
+        journal_path: the path of an UploadJournal file.  The files that have been uploaded are recorded in this file
+                      and the files already recorded in it are not uploaded again (their instances ids are still
+                      returned).  This allows resuming an interrupted import by calling upload_folder again.
+        batch_max_files: if > 1, the small DICOM files are packed in in-memory zip files of at most batch_max_files files
+                         and batch_max_bytes bytes that are uploaded in a single request each.  This saves the
+                         per-request overhead when uploading many small files.  The instances ids are still
+                         reported for each file.
+        batch_max_bytes: the maximum size of a zip batch; larger files are uploaded alone.
 
         Returns
         -------
         A list of instances id (one for each uploaded file)
         """
-
         instances_ids = []
-        
+        journal = UploadJournal(journal_path) if journal_path else None
+
+        def upload_one(batch) -> List[typing.Tuple[str, List[dict], bool, Optional[Exception]]]:
+            if batch[0][1] is not None:
+                path, known_answers = batch[0]
+                logger.info(f"skipping {path}: already stored in Orthanc")
+                return [(path, known_answers, False, None)]
+            return self._upload_files_batch([path for path, _ in batch], ignore_errors=ignore_errors)
+
+        def on_completed(batch, results, batch_error):
+            if batch_error is not None:
+                results = [(path, [], False, batch_error) for path, _ in batch]
+
+            for path, answers, uploaded, error in results:
+                uploaded_ids = [a['ID'] for a in answers]
+                if error is None and uploaded and journal is not None and len(uploaded_ids) > 0:
+                    journal.record(path, answers)
+                if progress_callback:
+                    progress_callback(path, uploaded_ids, error)
+                if error is not None:
+                    # the errors that can be ignored have already been filtered out by upload()
+                    raise error
+                instances_ids.extend(uploaded_ids)
+
+        try:
+            items = self._iter_folder_files_to_upload(folder_path, skip_extensions=skip_extensions, ignore_dots=ignore_dots,
+                                                      journal=journal, skip_existing=skip_existing)
+
+            self._warn_if_pool_too_small(max_workers)
+            run_in_parallel(
+                func=upload_one,
+                items=self._group_in_batches(items, max_files=batch_max_files, max_bytes=batch_max_bytes),
+                max_workers=max_workers,
+                on_completed=on_completed
+            )
+        finally:
+            if journal is not None:
+                journal.close()
+
+        return instances_ids
+
+    def _iter_folder_files_to_upload(self, folder_path: str, skip_extensions: List[str] = None, ignore_dots: bool = True,
+                                     journal: Optional[UploadJournal] = None, skip_existing: bool = False
+                                     ) -> typing.Iterator[typing.Tuple[str, Optional[List[dict]]]]:
+        """Yields (path, known_answers) for each file of the folder.  known_answers is None if the file must be uploaded,
+        otherwise, it contains the upload answers (at least their 'ID') found in the journal or in Orthanc."""
+        items = ((path, journal.get(path) if journal is not None else None)
+                 for path in self._iter_folder_files(folder_path, skip_extensions=skip_extensions, ignore_dots=ignore_dots))
+        if skip_existing:
+            items = self._iter_with_existing_instances(items)
+        return items
+
+    def _group_in_batches(self, items: typing.Iterable[typing.Tuple[str, Optional[List[dict]]]], max_files: int, max_bytes: int
+                          ) -> typing.Iterator[List[typing.Tuple[str, Optional[List[dict]]]]]:
+        """Groups the files that must be uploaded in batches of at most max_files files and max_bytes bytes.
+        The files whose answers are already known and the large files are always alone in their batch."""
+        batch = []
+        batch_size = 0
+
+        for path, known_answers in items:
+            if max_files <= 1 or known_answers is not None:
+                yield [(path, known_answers)]
+                continue
+
+            size = os.path.getsize(path)
+            if size > max_bytes:
+                yield [(path, None)]
+                continue
+
+            if len(batch) > 0 and (len(batch) >= max_files or batch_size + size > max_bytes):
+                yield batch
+                batch = []
+                batch_size = 0
+            batch.append((path, None))
+            batch_size += size
+
+        if len(batch) > 0:
+            yield batch
+
+    def _upload_files_batch(self, paths: List[str], ignore_errors: bool = False) -> List[typing.Tuple[str, List[dict], bool, Optional[Exception]]]:
+        """Uploads a list of files in a single zip file and returns (path, answers, True, error) for each file.
+
+        The instances ids returned by Orthanc are mapped back to the files by computing the Orthanc id of each file
+        from its header.  The files whose header can not be read (e.g. zip files) and the files that are
+        not found in the Orthanc answer are uploaded one by one."""
+        results = []
+        paths_to_upload_alone = []
+
+        if len(paths) == 1:
+            paths_to_upload_alone = paths
+        else:
+            paths_by_orthanc_id = {}
+            zip_buffer = io.BytesIO()
+            with zipfile.ZipFile(zip_buffer, 'w', compression=zipfile.ZIP_STORED) as z:
+                for index, path in enumerate(paths):
+                    orthanc_id = compute_orthanc_id_from_file(path)
+                    if orthanc_id is None or orthanc_id in paths_by_orthanc_id:
+                        paths_to_upload_alone.append(path)
+                    else:
+                        z.write(path, arcname=f"{index}.dcm")
+                        paths_by_orthanc_id[orthanc_id] = path
+
+            if len(paths_by_orthanc_id) > 0:
+                logger.info(f"uploading a batch of {len(paths_by_orthanc_id)} files")
+                zip_buffer.seek(0)
+                try:
+                    answers_by_id = {a['ID']: a for a in self._upload(zip_buffer, ignore_errors=False)}
+                except (BadFileFormat, HttpError) as e:
+                    logger.warning(f"could not upload a batch of files, uploading them one by one: {e}")
+                    answers_by_id = {}
+
+                for orthanc_id, path in paths_by_orthanc_id.items():
+                    if orthanc_id in answers_by_id:
+                        results.append((path, [answers_by_id[orthanc_id]], True, None))
+                    else:
+                        paths_to_upload_alone.append(path)
+
+        for path in paths_to_upload_alone:
+            try:
+                results.append((path, self._upload_file_return_answers(path, ignore_errors=ignore_errors), True, None))
+            except Exception as e:
+                results.append((path, [], True, e))
+
+        return results
+
+    def _iter_with_existing_instances(self, items: typing.Iterable[typing.Tuple[str, Optional[List[dict]]]], batch_size: int = 100
+                                      ) -> typing.Iterator[typing.Tuple[str, Optional[List[dict]]]]:
+        """For the items whose answers are not known yet, looks for the instance of the file in Orthanc: the instances
+        with the same SOPInstanceUID are searched and the file is considered as stored if one of them has the Orthanc id
+        computed from the file header (i.e. the same patient, study and series).  The answers remain None if it is not
+        stored yet or if the file header can not be read.  Orthanc is queried once per batch of files."""
+        batch = []
+
+        def check_batch():
+            uids = list(set(uid for _, _, uid, _ in batch if uid is not None))
+            existing = self.instances.find_ids_by_sop_instance_uids(uids)
+            return [(path, [{'ID': orthanc_id}] if uid is not None and orthanc_id in existing.get(uid, []) else known_answers)
+                    for path, known_answers, uid, orthanc_id in batch]
+
+        for path, known_answers in items:
+            sop_instance_uid = None
+            orthanc_id = None
+            if known_answers is None:
+                header = read_dicom_header(path, ['PatientID', 'StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID'])
+                if header is not None and all(header.get(tag) for tag in ['StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID']):
+                    sop_instance_uid = str(header.SOPInstanceUID)
+                    orthanc_id = compute_orthanc_id(str(header.get('PatientID', '')), str(header.StudyInstanceUID),
+                                                    str(header.SeriesInstanceUID), sop_instance_uid)
+            batch.append((path, known_answers, sop_instance_uid, orthanc_id))
+
+            if len(batch) >= batch_size:
+                yield from check_batch()
+                batch = []
+
+        if len(batch) > 0:
+            yield from check_batch()
+
+    def _iter_folder_files(self, folder_path: str, skip_extensions: List[str] = None, ignore_dots: bool = True) -> typing.Iterator[str]:
+        """Lazily lists the files from a folder and its sub-folders"""
         for path in os.listdir(folder_path):
             if ignore_dots and path.startswith('.'):
                 continue
@@ -268,13 +599,16 @@ class OrthancApiClient(HttpClient):
             full_path = os.path.join(folder_path, path)
             if os.path.isfile(full_path):
                 if not skip_extensions or not any([full_path.endswith(ext) for ext in skip_extensions]):
-                    instances_ids.extend(self.upload_file(full_path, ignore_errors=ignore_errors))
+                    yield full_path
             elif os.path.isdir(full_path):
-                instances_ids.extend(self.upload_folder(full_path, ignore_errors=ignore_errors, skip_extensions=skip_extensions))
-        
-        return instances_ids
+                yield from self._iter_folder_files(full_path, skip_extensions=skip_extensions, ignore_dots=ignore_dots)
+
+    def _warn_if_pool_too_small(self, max_workers: int):
+        if max_workers > self._pool_maxsize:
+            logger.warning(f"{max_workers} workers are sharing a pool of {self._pool_maxsize} HTTP connections, consider increasing pool_maxsize")
     
-    def upload_folder_return_details(self, folder_path: str, unzip_before_upload: bool = False) -> (typing.Set, typing.Set, typing.List):
+    def upload_folder_return_details(self, folder_path: str, unzip_before_upload: bool = False, max_workers: int = 1,
+                                     journal_path: Optional[str] = None) -> (typing.Set, typing.Set, typing.List):
         '''
         Uploads all the files contained in the folder, including the ones in the sub-folders.
         Returns some details
@@ -283,6 +617,9 @@ class OrthancApiClient(HttpClient):
         folder_path: the folder to upload
         unzip_before_upload: if True, a zip file will be unzipped and all resulting files will be uploaded
                              (if False, the zip file will be uploaded as it is)
+        max_workers: the number of files uploaded in parallel (1 = one file at a time)
+        journal_path: the path of an UploadJournal file (see upload_folder).  The files already recorded in it
+                      are not uploaded again but their studies are still part of the returned values.
 
         Returns
         -------
@@ -290,63 +627,168 @@ class OrthancApiClient(HttpClient):
         - A Set with all the Study orthanc Ids uploaded
         - A List with all the files names which were not correctly uploaded + corresponding error
         '''
-        dicom_ids_set = set()
         orthanc_ids_set = set()
         rejected_files_list = []
+        paths_by_study_id = {}
+        journal = UploadJournal(journal_path) if journal_path else None
+
+        def upload_one(item) -> typing.Tuple[List[dict], List, bool]:
+            path, known_answers = item
+            if known_answers is not None:
+                logger.info(f"skipping {path}: already uploaded")
+                return known_answers, [], False
+            if unzip_before_upload and zipfile.is_zipfile(path):
+                return self._upload_zip_content(path) + (True,)
+            return self._upload_file_return_answers(path), [], True
+
+        def on_completed(item, result, error):
+            path = item[0]
+            if error is not None:
+                rejected_files_list.append([str(path), str(error)])
+            else:
+                answers, rejected, uploaded = result
+                # the upload answers already contain the parent study, no need to ask Orthanc for each instance
+                for a in answers:
+                    orthanc_ids_set.add(a['ParentStudy'])
+                    paths_by_study_id.setdefault(a['ParentStudy'], set()).add(str(path))
+                rejected_files_list.extend(rejected)
+                if uploaded and journal is not None and len(answers) > 0 and len(rejected) == 0:
+                    journal.record(path, answers)
 
-        for path in os.listdir(folder_path):
-            full_path = os.path.join(folder_path, path)
-            if os.path.isfile(full_path):
+        try:
+            self._warn_if_pool_too_small(max_workers)
+            run_in_parallel(
+                func=upload_one,
+                items=self._iter_folder_files_to_upload(folder_path, ignore_dots=False, journal=journal),
+                max_workers=max_workers,
+                on_completed=on_completed
+            )
+        finally:
+            if journal is not None:
+                journal.close()
+
+        # a single request per distinct study to get its StudyInstanceUID
+        dicom_ids_set = set()
 
-                if unzip_before_upload and zipfile.is_zipfile(full_path):
-                    with tempfile.TemporaryDirectory() as tempDir:
-                        with zipfile.ZipFile(full_path, 'r') as z:
-                            z.extractall(tempDir)
-                        zip_dicom_ids_set, zip_orthanc_ids_set, zip_rejected_files_list = self.upload_folder_return_details(folder_path=tempDir)
-                        dicom_ids_set.update(zip_dicom_ids_set)
-                        orthanc_ids_set.update(zip_orthanc_ids_set)
-                        rejected_files_list.extend(zip_rejected_files_list)
-                else:
-                    try:
-                        instance_orthanc_ids = self.upload_file(full_path, ignore_errors=False)
-                        for id in instance_orthanc_ids:
-                            dicom_ids_set.add(self.instances.get_tags(id)["StudyInstanceUID"])
-                            orthanc_ids_set.add(self.instances.get_parent_study_id(id))
-                    except Exception as e:
-                        rejected_files_list.append([str(full_path), str(e)])
-            elif os.path.isdir(full_path):
-                sub_dicom_ids_set, sub_orthanc_ids_set, sub_rejected_files_list = self.upload_folder_return_details(full_path)
-                dicom_ids_set.update(sub_dicom_ids_set)
-                orthanc_ids_set.update(sub_orthanc_ids_set)
-                rejected_files_list.extend(sub_rejected_files_list)
+        def on_study_completed(study_id, dicom_id, error):
+            if error is not None:
+                # the files have been uploaded but their StudyInstanceUID is unknown: report them with the error
+                rejected_files_list.extend([[path, f"could not get the StudyInstanceUID of study {study_id}: {error}"]
+                                            for path in sorted(paths_by_study_id[study_id])])
+            else:
+                dicom_ids_set.add(dicom_id)
+
+        run_in_parallel(
+            func=lambda study_id: self.studies.get_json(study_id)['MainDicomTags']['StudyInstanceUID'],
+            items=orthanc_ids_set,
+            max_workers=max_workers,
+            on_completed=on_study_completed
+        )
 
         return dicom_ids_set, orthanc_ids_set, rejected_files_list
+
+    def _upload_file_return_answers(self, path, ignore_errors: bool = False) -> List[dict]:
+        logger.info(f"uploading {path}")
+        with open(path, 'rb') as f:
+            return self._upload(f, ignore_errors=ignore_errors)
+
+    def _upload_zip_content(self, zip_path) -> typing.Tuple[List[dict], List]:
+        """Uploads the files contained in a zip file one by one (without extracting them on disk)"""
+        answers = []
+        rejected_files_list = []
+        with zipfile.ZipFile(zip_path, 'r') as z:
+            for name in z.namelist():
+                if name.endswith('/'):
+                    continue
+                try:
+                    answers.extend(self._upload(z.read(name), ignore_errors=False))
+                except Exception as e:
+                    rejected_files_list.append([os.path.join(str(zip_path), name), str(e)])
+        return answers, rejected_files_list
     
-    def upload_files_dicom_web(self, paths: List[str], ignore_errors: bool = False, endpoint: str = "dicom-web/studies") -> any:
+    def upload_files_dicom_web(self, paths: List[str], ignore_errors: bool = False, endpoint: str = "dicom-web/studies",
+                               batch_max_bytes: int = 100 * 1024 * 1024, max_workers: int = 1) -> any:
         """Uploads files to Orthanc through its DicomWeb API (only DICOM files, no zip files)
 
+        The files are streamed from disk (they are never loaded in memory) and are split in batches of at most
+        batch_max_bytes bytes; each batch is sent in a single STOW-RS request (a larger file is sent alone).
+
         Parameters
         ----------
-        ignore_errors: if True: does not raise exceptions
+        ignore_errors: if True: does not raise exceptions; the batches that can not be uploaded are skipped
+        batch_max_bytes: the maximum size of the files sent in a single request
+        max_workers: the number of batches uploaded in parallel
+
+        Returns
+        -------
+        the STOW-RS answer (DICOM JSON).  When multiple batches are sent, the ReferencedSOPSequence and
+        FailedSOPSequence of all the answers are merged.
         """
         logger.info(f"uploading {len(paths)} files through DicomWeb STOW-RS")
 
-        files = {}
-        counter = 1
+        def upload_batch(batch):
+            body = MultipartRelatedStream(batch)
+            try:
+                r = self.post(endpoint=endpoint,
+                              data=body,
+                              headers = {
+                                  'Accept':'application/json',
+                                  'Content-Type': body.content_type
+                              })
+                return self.decode_json(r)
+            finally:
+                body.close()
+
+        answers = {}
+
+        def on_completed(item, answer, error):
+            index, batch = item
+            if error is not None:
+                if not ignore_errors:
+                    raise error
+                logger.warning(f"could not upload a batch of {len(batch)} files through STOW-RS: {error}")
+            else:
+                answers[index] = answer
+
+        self._warn_if_pool_too_small(max_workers)
+        run_in_parallel(
+            func=lambda item: upload_batch(item[1]),
+            items=enumerate(self._split_in_batches_by_size(paths, batch_max_bytes)),
+            max_workers=max_workers,
+            on_completed=on_completed
+        )
+
+        return self._merge_stow_rs_answers([answers[i] for i in sorted(answers)])
+
+    @staticmethod
+    def _split_in_batches_by_size(paths: List[str], max_bytes: int) -> typing.Iterator[List[str]]:
+        batch = []
+        batch_size = 0
         for path in paths:
-            with open(path, 'rb') as f:
-                raw_file = f.read()
-                files[f'file{counter}'] = (str(path), raw_file, 'application/dicom')
-                counter += 1
-
-        body, content_type = encode_multipart_related(fields=files)
-        r = self.post(endpoint=endpoint,
-                      data=body,
-                      headers = {
-                          'Accept':'application/json',
-                          'Content-Type': content_type
-                      })
-        return r.json()
+            size = os.path.getsize(path)
+            if len(batch) > 0 and batch_size + size > max_bytes:
+                yield batch
+                batch = []
+                batch_size = 0
+            batch.append(path)
+            batch_size += size
+
+        if len(batch) > 0:
+            yield batch
+
+    @staticmethod
+    def _merge_stow_rs_answers(answers: List[dict]) -> any:
+        if len(answers) == 0:
+            return {}
+        if len(answers) == 1:
+            return answers[0]
+
+        merged = dict(answers[0])
+        for tag in ['00081199', '00081198']:  # ReferencedSOPSequence, FailedSOPSequence
+            values = [v for a in answers for v in a.get(tag, {}).get('Value', [])]
+            if len(values) > 0:
+                merged[tag] = {'vr': 'SQ', 'Value': values}
+        return merged
 
     def lookup(self, needle: str, filter: str = None) -> List[str]:
         """searches the Orthanc DB for the 'needle'
@@ -366,7 +808,7 @@ class OrthancApiClient(HttpClient):
         )
 
         resources = []
-        json_response = response.json()
+        json_response = self.decode_json(response)
         
         for r in json_response:
             if r['Type'] == 'Study' and (filter is None or filter == 'Study'):
@@ -473,7 +915,7 @@ class OrthancApiClient(HttpClient):
             endpoint = 'tools/create-dicom',
             json = request_data
         )
-        return response.json()['ID']
+        return self.decode_json(response)['ID']
 
 
     def create_instance_from_png(self, image_path: str, dicom_tags: object, parent_id: str = None):
@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+from typing import Optional, Dict, Any
+
+from strenum import StrEnum
+
+from . import exceptions as api_exceptions
+
+logger = logging.getLogger(__name__)
+
+# the routes that contact a remote are below 'modalities/{alias}', 'peers/{alias}' or 'dicom-web/servers/{alias}'
+REMOTES_SEGMENTS = ['modalities', 'peers', 'servers']
+
+# the routes below a remote that do not contact it
+LOCAL_ROUTES = ['configuration']
+
+
+def get_endpoint_family(endpoint: str) -> Optional[str]:
+    """
+    Returns the remote targeted by an endpoint: 'modalities/orthanc-b/store' -> 'modalities/orthanc-b'
+    or None if the endpoint does not contact a remote modality, peer or DICOMweb server
+    (e.g. 'studies/...' or 'modalities/orthanc-b/configuration').
+    """
+    segments = endpoint.split('?')[0].strip('/').split('/')
+    for i, segment in enumerate(segments[:-2]):
+        if segment in REMOTES_SEGMENTS:
+            if segments[i + 2] in LOCAL_ROUTES:
+                return None
+            return '/'.join(segments[:i + 2])
+    return None
+
+
+class CircuitState(StrEnum):
+
+    CLOSED = 'Closed'        # the requests are sent
+    OPEN = 'Open'            # the requests fail immediately
+    HALF_OPEN = 'HalfOpen'   # a single trial request is sent to check if the remote is back
+
+
+class Circuit:
+    """
+    The state of the requests to one remote (e.g. 'modalities/orthanc-b').
+    """
+
+    def __init__(self, family: str):
+        self.family = family
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.opened_count = 0
+        self.rejected_count = 0
+        self._trial_in_progress = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'State': str(self.state),
+            'ConsecutiveFailures': self.consecutive_failures,
+            'OpenedCount': self.opened_count,
+            'RejectedCount': self.rejected_count
+        }
+
+
+class CircuitBreaker:
+    """
+    Fails fast the requests to a remote modality, peer or DICOMweb server that is down instead of waiting
+    for the timeout of each request:
+
+    - after `failure_threshold` consecutive failures (timeouts or 5xx answers from Orthanc) of the requests to a remote
+      (e.g. 'modalities/orthanc-b/store'), the circuit of this remote opens and its requests immediately
+      raise a CircuitOpen exception.
+    - after `reset_timeout` seconds, the circuit is half-open: a single trial request is sent.  If it succeeds,
+      the circuit closes, otherwise it opens again for `reset_timeout` seconds.
+
+    The requests to the other remotes and to Orthanc itself (e.g. 'studies/...') are not affected.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._circuits: Dict[str, Circuit] = {}
+        self._lock = threading.Lock()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the state of the circuit of each remote that has been accessed"""
+        with self._lock:
+            return {family: circuit.get_stats() for family, circuit in self._circuits.items()}
+
+    def get_state(self, family: str) -> CircuitState:
+        with self._lock:
+            circuit = self._circuits.get(family)
+            return circuit.state if circuit is not None else CircuitState.CLOSED
+
+    def reset(self):
+        with self._lock:
+            self._circuits = {}
+
+    def before_request(self, endpoint: str, url: Optional[str] = None) -> Optional[Circuit]:
+        """
+        Returns the circuit of the endpoint (None if the endpoint is not guarded) or raises CircuitOpen
+        """
+        family = get_endpoint_family(endpoint)
+        if family is None:
+            return None
+
+        with self._lock:
+            circuit = self._circuits.get(family)
+            if circuit is None:
+                circuit = self._circuits[family] = Circuit(family)
+
+            if circuit.state == CircuitState.OPEN and time.monotonic() - circuit.opened_at >= self.reset_timeout:
+                circuit.state = CircuitState.HALF_OPEN
+
+            if circuit.state == CircuitState.OPEN or (circuit.state == CircuitState.HALF_OPEN and circuit._trial_in_progress):
+                circuit.rejected_count += 1
+                retry_after = max(0.0, self.reset_timeout - (time.monotonic() - circuit.opened_at))
+                raise api_exceptions.CircuitOpen(family=family, retry_after=retry_after, url=url)
+
+            if circuit.state == CircuitState.HALF_OPEN:
+                circuit._trial_in_progress = True
+            return circuit
+
+    def after_request(self, circuit: Circuit, error: Optional[Exception] = None, aborted: bool = False):
+        """
+        Updates the circuit from the outcome of a request.  An aborted request (e.g. interrupted by a KeyboardInterrupt)
+        only frees the half-open trial.
+        """
+        with self._lock:
+            circuit._trial_in_progress = False
+            if aborted:
+                return
+
+            if error is None or self._is_client_error(error):
+                # the remote has answered (a 4xx is an error in the request, not an unavailable remote)
+                if circuit.state != CircuitState.CLOSED:
+                    logger.info(f"Circuit of '{circuit.family}' closed")
+                circuit.state = CircuitState.CLOSED
+                circuit.consecutive_failures = 0
+            elif self._is_remote_failure(error):
+                circuit.consecutive_failures += 1
+                if circuit.state == CircuitState.HALF_OPEN or circuit.consecutive_failures >= self.failure_threshold:
+                    if circuit.state != CircuitState.OPEN:
+                        logger.warning(f"Circuit of '{circuit.family}' opened after {circuit.consecutive_failures} consecutive failures")
+                        circuit.opened_count += 1
+                    circuit.state = CircuitState.OPEN
+                    circuit.opened_at = time.monotonic()
+            # the other errors (e.g. Orthanc can not be reached) do not tell anything about the remote
+
+    @staticmethod
+    def _is_client_error(error: Exception) -> bool:
+        return isinstance(error, api_exceptions.HttpError) and error.http_status_code is not None and error.http_status_code < 500
+
+    @staticmethod
+    def _is_remote_failure(error: Exception) -> bool:
+        return isinstance(error, api_exceptions.TimeoutError) or \
+               (isinstance(error, api_exceptions.HttpError) and error.http_status_code is not None and error.http_status_code >= 500)
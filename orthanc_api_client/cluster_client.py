@@ -0,0 +1,342 @@
+import logging
+import threading
+import time
+from typing import List, Optional, Dict, Any, Tuple
+
+import requests
+
+from .api_client import OrthancApiClient
+from .http_client import join_url
+from .helpers_internal import get_body_position, rewind_body
+from .instrumentation import RequestRecord
+from . import exceptions as api_exceptions
+
+logger = logging.getLogger(__name__)
+
+# POST routes that only read the (shared) index and can be sent to any node
+READ_ONLY_POST_ENDPOINTS = ['tools/find', 'tools/lookup', 'tools/count-resources']
+
+# routes whose resources only exist in the memory of the node that has created them: they must always reach the primary
+PRIMARY_ONLY_ENDPOINTS = ['jobs', 'queries']
+
+IDEMPOTENT_METHODS = ['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE']
+
+
+def _is_primary_only(endpoint: str) -> bool:
+    path = endpoint.split('?')[0].strip('/')
+    return any([path == p or path.startswith(p + '/') for p in PRIMARY_ONLY_ENDPOINTS])
+
+
+def is_read_only_request(method: str, endpoint: str) -> bool:
+    if _is_primary_only(endpoint):
+        return False
+    if method in ['GET', 'HEAD']:
+        return True
+    return method == 'POST' and endpoint.split('?')[0].strip('/') in READ_ONLY_POST_ENDPOINTS
+
+
+def is_idempotent_request(method: str, endpoint: str) -> bool:
+    return method in IDEMPOTENT_METHODS or is_read_only_request(method, endpoint)
+
+
+class ClusterNode:
+    """
+    An Orthanc node of a ClusterOrthancApiClient with its own connection pool and its statistics.
+    """
+
+    def __init__(self, root_url: str, session: requests.Session, is_primary: bool):
+        self.root_url = root_url
+        self.session = session
+        self.is_primary = is_primary
+
+        # (is_healthy, unhealthy_since, healthy_since, last_failure_at): replaced at once so that the request threads and
+        # the HealthProber always read a consistent state
+        self._health: Tuple[bool, Optional[float], float, Optional[float]] = (True, None, time.monotonic(), None)
+        self._health_lock = threading.Lock()
+
+        self.outstanding_requests = 0
+        self.requests_count = 0
+        self.errors_count = 0
+        self.total_duration = 0.0
+
+    def __repr__(self):
+        return f"ClusterNode({self.root_url}, primary={self.is_primary}, healthy={self.is_healthy})"
+
+    @property
+    def is_healthy(self) -> bool:
+        return self._health[0]
+
+    @property
+    def unhealthy_since(self) -> Optional[float]:
+        return self._health[1]
+
+    @property
+    def healthy_since(self) -> float:
+        return self._health[2]
+
+    @property
+    def last_failure_at(self) -> Optional[float]:
+        return self._health[3]
+
+    def get_health(self) -> Tuple[bool, Optional[float], float, Optional[float]]:
+        """Returns (is_healthy, unhealthy_since, healthy_since, last_failure_at)"""
+        return self._health
+
+    @property
+    def mean_duration(self) -> float:
+        return self.total_duration / self.requests_count if self.requests_count > 0 else 0.0
+
+    def get_abs_url(self, endpoint: str) -> str:
+        return join_url(self.root_url, endpoint)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'RootUrl': self.root_url,
+            'IsPrimary': self.is_primary,
+            'IsHealthy': self.is_healthy,
+            'OutstandingRequests': self.outstanding_requests,
+            'RequestsCount': self.requests_count,
+            'ErrorsCount': self.errors_count,
+            'MeanDuration': self.mean_duration
+        }
+
+    def is_alive(self, timeout: float = 1) -> bool:
+        """Checks if the node can be reached (same check as OrthancApiClient.is_alive)"""
+        try:
+            # not through the node session: its retries would delay the detection of a node that is down
+            response = requests.get(self.get_abs_url('system'), timeout=timeout, auth=self.session.auth, headers=self.session.headers)
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    def mark_healthy(self):
+        with self._health_lock:
+            is_healthy, _, healthy_since, _ = self._health
+            if not is_healthy:
+                healthy_since = time.monotonic()
+                logger.info(f"Orthanc node {self.root_url} is up")
+            self._health = (True, None, healthy_since, None)
+
+    def mark_unhealthy(self):
+        with self._health_lock:
+            now = time.monotonic()
+            is_healthy, unhealthy_since, healthy_since, _ = self._health
+            if is_healthy:
+                unhealthy_since = now
+                logger.warning(f"Orthanc node {self.root_url} is down")
+            self._health = (False, unhealthy_since, healthy_since, now)
+
+    def start_trial(self):
+        """
+        Called when a request is sent to an unhealthy node to check if it is back: the node is considered as failing
+        from now on so that no other request is sent to it during the next retry window.
+        """
+        with self._health_lock:
+            is_healthy, unhealthy_since, healthy_since, _ = self._health
+            if not is_healthy:
+                self._health = (False, unhealthy_since, healthy_since, time.monotonic())
+
+
+class HealthProber(threading.Thread):
+    """
+    A background thread that checks every `interval` seconds if the nodes are alive and marks them up or down.
+    Each failed check postpones the next trial request to a node that is down by `unhealthy_retry_delay`: with an
+    `interval` shorter than this delay, no read is sent to the node until it is probed up.
+    """
+
+    def __init__(self, nodes: List[ClusterNode], interval: float, timeout: float):
+        super().__init__(name="orthanc-health-prober", daemon=True)
+        self._nodes = nodes  # the prober does not keep a reference to the client so that the client can be garbage collected
+        self.interval = interval
+        self.timeout = timeout
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.probe()
+            self._stop_event.wait(self.interval)
+
+    def probe(self):
+        for node in self._nodes:
+            if node.is_alive(timeout=self.timeout):
+                node.mark_healthy()
+            else:
+                node.mark_unhealthy()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class ClusterOrthancApiClient(OrthancApiClient):
+    """
+    An OrthancApiClient for several Orthanc nodes sharing the same index (e.g. a PostgreSQL database).
+
+    - the read-only requests (GET, tools/find, ...) are sent to the healthy node with the least outstanding requests.
+    - the other requests (uploads, modifications, jobs, queries, ...) are sent to the primary node.
+    - a node that can not be reached is considered unhealthy and no read is sent to it
+      during `unhealthy_retry_delay` seconds after its last failure.  Then, a single trial request is sent to it
+      per `unhealthy_retry_delay` window until it answers (or until the health prober marks it up).
+    - each node has its own connection pool of `pool_maxsize` connections.
+
+    Failover:
+    - if `health_check_interval` is set, a background thread checks every `health_check_interval` seconds if the nodes
+      are alive (GET /system with a `health_check_timeout`) and marks them up or down.
+    - with `failover=True`, the idempotent requests that fail with a ConnectionError are retried on another healthy node
+      and, while the primary is down, the other requests are sent to the first healthy standby node.
+    - with `fail_back=True`, the requests go back to the primary once it has been up for `fail_back_delay` seconds.
+      Otherwise, they stay on the standby until it goes down.
+      Note: the jobs and queries created on a node can only be accessed on this node.
+
+    The other arguments are the same as the OrthancApiClient ones.
+    """
+
+    def __init__(self,
+                 orthanc_root_urls: List[str],
+                 primary_url: Optional[str] = None,
+                 unhealthy_retry_delay: float = 10,
+                 health_check_interval: Optional[float] = None,
+                 health_check_timeout: float = 1,
+                 failover: bool = True,
+                 fail_back: bool = True,
+                 fail_back_delay: float = 30,
+                 **kwargs) -> None:
+        if len(orthanc_root_urls) == 0:
+            raise ValueError("At least one Orthanc url is required")
+        primary_url = primary_url or orthanc_root_urls[0]
+        if primary_url not in orthanc_root_urls:
+            raise ValueError(f"The primary url '{primary_url}' is not one of the cluster urls")
+
+        self._nodes_lock = threading.Lock()
+        self.unhealthy_retry_delay = unhealthy_retry_delay
+        self.failover = failover
+        self.fail_back = fail_back
+        self.fail_back_delay = fail_back_delay
+        self._health_prober = None
+
+        super().__init__(orthanc_root_url=primary_url, **kwargs)
+
+        self.nodes: List[ClusterNode] = []
+        for url in orthanc_root_urls:
+            is_primary = url == primary_url
+            session = self._http_session if is_primary else self._create_session(url)
+            self.nodes.append(ClusterNode(root_url=url, session=session, is_primary=is_primary))
+        self._write_node = self.primary_node
+
+        if health_check_interval is not None:
+            self._health_prober = HealthProber(nodes=self.nodes, interval=health_check_interval, timeout=health_check_timeout)
+            self._health_prober.start()
+
+    @property
+    def primary_node(self) -> ClusterNode:
+        return [n for n in self.nodes if n.is_primary][0]
+
+    @property
+    def write_node(self) -> ClusterNode:
+        """The node that currently receives the requests that are not read-only (the primary or a standby)"""
+        with self._nodes_lock:
+            return self._get_write_node()
+
+    def get_nodes_stats(self) -> List[Dict[str, Any]]:
+        return [n.get_stats() for n in self.nodes]
+
+    def _is_available(self, node: ClusterNode, now: float) -> bool:
+        is_healthy, _, _, last_failure_at = node.get_health()
+        return is_healthy or now - last_failure_at > self.unhealthy_retry_delay
+
+    @staticmethod
+    def _reserve_trial(node: ClusterNode) -> ClusterNode:
+        if not node.is_healthy:
+            node.start_trial()
+        return node
+
+    def _get_write_node(self) -> ClusterNode:
+        primary = self.primary_node
+        if not self.failover:
+            return primary
+
+        current = self._write_node
+        primary_is_healthy, _, primary_healthy_since, _ = primary.get_health()
+        if current is not primary and self.fail_back and primary_is_healthy and time.monotonic() - primary_healthy_since >= self.fail_back_delay:
+            logger.info(f"Failing back to the primary Orthanc node {primary.root_url}")
+            current = self._write_node = primary
+
+        if not current.is_healthy:
+            standby = next(iter([n for n in self.nodes if n.is_healthy and n is not current]), None)
+            if standby is not None:
+                logger.warning(f"Failing over from Orthanc node {current.root_url} to {standby.root_url}")
+                current = self._write_node = standby
+
+        return current
+
+    def _select_node(self, method: str, endpoint: str, excluded_nodes: List[ClusterNode]) -> Optional[ClusterNode]:
+        now = time.monotonic()
+        if not is_read_only_request(method, endpoint):
+            write_node = self._get_write_node()
+            if write_node not in excluded_nodes:
+                return write_node
+            # the write node has just failed: fall back on another node
+            candidates = [n for n in self.nodes if n not in excluded_nodes and self._is_available(n, now)]
+            return self._reserve_trial(candidates[0]) if len(candidates) > 0 else None
+
+        candidates = [n for n in self.nodes if n not in excluded_nodes and self._is_available(n, now)]
+        if len(candidates) == 0:
+            return self._get_write_node() if len(excluded_nodes) == 0 else None
+        return self._reserve_trial(min(candidates, key=lambda n: (n.outstanding_requests, n.requests_count)))
+
+    def _send_request(self, method: str, endpoint: str, record: Optional[RequestRecord], **kwargs) -> requests.Response:
+        can_retry = self.failover and is_idempotent_request(method, endpoint)
+        body_position = get_body_position(kwargs.get('data'))
+        attempted_nodes = []
+        connection_error = None
+
+        while True:
+            with self._nodes_lock:  # select and reserve the node at once so that concurrent requests are spread
+                node = self._select_node(method, endpoint, excluded_nodes=attempted_nodes)
+                if node is not None:
+                    node.outstanding_requests += 1
+            if node is None:
+                raise connection_error  # all the nodes have been tried
+
+            try:
+                return self._send_request_to_node(node, method, endpoint, record, **kwargs)
+            except api_exceptions.ConnectionError as e:
+                attempted_nodes.append(node)
+                if not can_retry or not rewind_body(kwargs.get('data'), body_position):
+                    raise
+                connection_error = e
+                logger.warning(f"Could not reach Orthanc node {node.root_url} for {method} {endpoint}, trying another node")
+
+    def _send_request_to_node(self, node: ClusterNode, method: str, endpoint: str, record: Optional[RequestRecord], **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        failed = False
+        try:
+            response = self._send_request_with_session(node.session, node.get_abs_url(endpoint), method, record, **kwargs)
+            node.mark_healthy()
+            return response
+        except (api_exceptions.ConnectionError, api_exceptions.TimeoutError):
+            failed = True
+            node.mark_unhealthy()
+            raise
+        except api_exceptions.HttpError as e:
+            failed = e.http_status_code is None or e.http_status_code >= 500
+            raise
+        finally:
+            with self._nodes_lock:
+                node.outstanding_requests -= 1
+                node.requests_count += 1
+                node.total_duration += time.perf_counter() - start
+                if failed:
+                    node.errors_count += 1
+
+    def _update_headers(self, headers: dict):
+        for node in self.nodes:
+            session_headers = node.session.headers.copy()
+            session_headers.update(headers)
+            node.session.headers = session_headers
+
+    def close(self):
+        if getattr(self, '_health_prober', None) is not None:
+            self._health_prober.stop()
+        for node in getattr(self, 'nodes', []):
+            node.session.close()
+        super().close()
@@ -0,0 +1,161 @@
+import threading
+import time
+import weakref
+from typing import Optional, Dict, Any
+
+from . import exceptions as api_exceptions
+from .instrumentation import get_endpoint_template
+
+# the HTTP status that tell that Orthanc (or the proxy in front of it) is overloaded
+OVERLOAD_STATUS_CODES = [429, 503]
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits the number of requests in flight and adapts this limit to the load of Orthanc (AIMD):
+
+    - each successful request that is not slow increases the limit by `increase_step / limit`,
+      i.e. the limit grows by `increase_step` once a full window of requests has succeeded.
+    - a request that is slow, times out or is answered with a 429/503 (even if it succeeded after a retry)
+      multiplies the limit by `decrease_factor`.  The limit is decreased at most once per window: only the requests
+      that have been sent after the last decrease can decrease it again.
+    - a request is slow if its latency (time to receive the response headers) is larger than `latency_tolerance` times
+      the usual latency of its endpoint (e.g. `GET studies/{id}`) and larger than `min_slow_latency` seconds.
+
+    A streamed response (downloads, archives, ...) keeps its slot until its body has been read or it is closed.
+    The threads issuing requests while the limit is reached wait for a slot.  A single limiter can be shared by
+    several clients (and by all their parallel features: uploads, downloads, ...) to limit their total load.
+    """
+
+    def __init__(self,
+                 initial_limit: int = 10,
+                 min_limit: int = 1,
+                 max_limit: int = 100,
+                 decrease_factor: float = 0.7,
+                 increase_step: float = 1,
+                 latency_tolerance: float = 3.0,
+                 min_slow_latency: float = 0.1):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.latency_tolerance = latency_tolerance
+        self.min_slow_latency = min_slow_latency
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._last_decrease_time = 0.0
+        self._usual_latencies: Dict[str, float] = {}
+        self._condition = threading.Condition()
+
+        self.decreases_count = 0
+        self.waits_count = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'Limit': self.limit,
+            'InFlight': self._in_flight,
+            'DecreasesCount': self.decreases_count,
+            'WaitsCount': self.waits_count
+        }
+
+    def acquire(self) -> float:
+        """
+        Waits for a free slot and returns the time at which the request is sent (to be given back to `release`)
+        """
+        with self._condition:
+            if self._in_flight >= self.limit:
+                self.waits_count += 1
+                while self._in_flight >= self.limit:
+                    self._condition.wait()
+            self._in_flight += 1
+            return time.monotonic()
+
+    def release(self, start_time: float, endpoint: str, response=None, error: Optional[Exception] = None):
+        """
+        Frees the slot of a request and adapts the limit from its outcome (a `requests` response or an exception).
+        If neither is given (the request has been interrupted), the limit is not changed.
+        """
+        overloaded, latency = self._get_outcome(response, error)
+        self._release(start_time, endpoint, overloaded, latency, succeeded=response is not None)
+
+    def release_when_consumed(self, start_time: float, endpoint: str, response):
+        """
+        For a streamed response: frees the slot once the body has been read or the response closed (or garbage
+        collected) so that long downloads are counted as in flight.
+        """
+        overloaded, latency = self._get_outcome(response, None)
+        lock = threading.Lock()
+        released = []
+
+        def release_once():  # must not reference the response to let it be garbage collected
+            with lock:
+                if len(released) > 0:
+                    return
+                released.append(True)
+            self._release(start_time, endpoint, overloaded, latency, succeeded=True)
+
+        raw = response.raw
+        release_conn = raw.release_conn
+
+        def release_conn_and_slot():
+            # called by urllib3 once the body has been read and by Response.close()
+            try:
+                release_conn()
+            finally:
+                release_once()
+
+        raw.release_conn = release_conn_and_slot
+        weakref.finalize(response, release_once)
+
+    def _get_outcome(self, response, error: Optional[Exception]):
+        overloaded = False
+        latency = None
+        if error is not None:
+            overloaded = isinstance(error, api_exceptions.TimeoutError) or \
+                         (isinstance(error, api_exceptions.HttpError) and error.http_status_code in OVERLOAD_STATUS_CODES)
+        elif response is not None:
+            # the 503 answers that have been retried by urllib3 before a success
+            retries = getattr(response.raw, 'retries', None)
+            history = getattr(retries, 'history', None) or ()
+            overloaded = any([h.status in OVERLOAD_STATUS_CODES for h in history])
+            latency = response.elapsed.total_seconds()
+        return overloaded, latency
+
+    def _release(self, start_time: float, endpoint: str, overloaded: bool, latency: Optional[float], succeeded: bool):
+        with self._condition:
+            self._in_flight -= 1
+
+            if latency is not None and not overloaded:
+                overloaded = self._is_slow(get_endpoint_template(endpoint), latency)
+
+            if overloaded:
+                if start_time > self._last_decrease_time:
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                    self._last_decrease_time = time.monotonic()
+                    self.decreases_count += 1
+            elif succeeded:
+                self._limit = min(float(self.max_limit), self._limit + self.increase_step / self._limit)
+
+            self._condition.notify_all()
+
+    def _is_slow(self, endpoint_template: str, latency: float) -> bool:
+        usual_latency = self._usual_latencies.get(endpoint_template)
+        if usual_latency is None:
+            self._usual_latencies[endpoint_template] = latency
+            return False
+
+        is_slow = latency > self.min_slow_latency and latency > self.latency_tolerance * usual_latency
+        if not is_slow:
+            # follows the faster requests quickly and the slower ones slowly
+            weight = 0.5 if latency < usual_latency else 0.05
+            self._usual_latencies[endpoint_template] = usual_latency + weight * (latency - usual_latency)
+        return is_slow
@@ -0,0 +1,156 @@
+import contextlib
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class ContentCache:
+    """
+    A local on-disk cache for the contents downloaded from Orthanc (instances files, previews, attachments).
+
+    - the entries are keyed by the url of the content (e.g. 'http://orthanc:8042/instances/{id}/file'), including
+      the Orthanc root url so that a cache can be shared by clients of different Orthancs.  Since an Orthanc id
+      always refers to the same content on an Orthanc, the entries never need to be invalidated (the attachments,
+      that can be modified, are revalidated with their ETag).
+    - the cache is bounded by `max_size` bytes: the least recently used entries are evicted first.
+    - the cache folder can be shared by several threads and processes: the entries are written atomically
+      (a reader sees a complete entry or no entry) and the eviction is protected by a lock file.
+    - `hits` and `misses` count the lookups of this instance.
+    """
+
+    def __init__(self, folder: str, max_size: int = 1024 * 1024 * 1024):
+        self.folder = folder
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._written_since_eviction = 0
+        os.makedirs(self.folder, exist_ok=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the cached content or None if it is not in the cache
+        """
+        entry = self.get_with_tag(key)
+        return entry[0] if entry is not None else None
+
+    def get_with_tag(self, key: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """
+        Returns the cached (content, tag) or None if it is not in the cache
+        """
+        path = self._get_entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # the modification time is the last access time used by the LRU eviction
+        except FileNotFoundError:  # not cached yet or evicted in the meantime
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        tag, content = data.split(b'\n', 1)
+        return content, tag.decode('utf-8') or None
+
+    def put(self, key: str, content: bytes, tag: Optional[str] = None):
+        """
+        Stores a content in the cache with an optional tag (e.g. the ETag of an attachment)
+        """
+        if len(content) > self.max_size:
+            return
+
+        path = self._get_entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write((tag or '').encode('utf-8') + b'\n')
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._written_since_eviction += len(content)
+            # the other processes also write in the folder: check its actual size regularly
+            must_evict = self._written_since_eviction > self.max_size / 10
+            if must_evict:
+                self._written_since_eviction = 0
+
+        if must_evict:
+            self.evict()
+
+    def evict(self, target_size: Optional[int] = None):
+        """
+        Deletes the least recently used entries until the size of the cache is below `target_size`.
+        By default, nothing is deleted until the cache exceeds max_size and it is then reduced to 90% of max_size.
+        """
+        only_if_full = target_size is None
+        if target_size is None:
+            target_size = int(self.max_size * 0.9)
+
+        with self._folder_lock():
+            entries = []
+            total_size = 0
+            for path in self._iter_entries_paths():
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+            if only_if_full and total_size <= self.max_size:
+                return
+
+            for mtime, size, path in sorted(entries):
+                if total_size <= target_size:
+                    break
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                total_size -= size
+
+    def clear(self):
+        """
+        Deletes all the entries from the cache
+        """
+        self.evict(target_size=0)
+
+    def get_size(self) -> int:
+        """
+        Returns the current size of the cache (in bytes)
+        """
+        return sum([os.path.getsize(p) for p in self._iter_entries_paths() if os.path.exists(p)])
+
+    def _get_entry_path(self, key: str) -> str:
+        key_hash = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, key_hash[:2], key_hash)
+
+    def _iter_entries_paths(self):
+        for sub_folder in os.listdir(self.folder):
+            sub_folder_path = os.path.join(self.folder, sub_folder)
+            if os.path.isdir(sub_folder_path):
+                for name in os.listdir(sub_folder_path):
+                    path = os.path.join(sub_folder_path, name)
+                    if name.endswith('.tmp') and os.path.exists(path) and os.path.getmtime(path) > time.time() - 3600:
+                        continue  # being written by another thread/process
+                    yield path
+
+    @contextlib.contextmanager
+    def _folder_lock(self):
+        with open(os.path.join(self.folder, '.lock'), 'a+b') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
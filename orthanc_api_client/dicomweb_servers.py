@@ -28,7 +28,7 @@ class DicomWebServers:
                 "Synchronous": False
             })
 
-        return Job(api_client=self._api_client, orthanc_id=r.json()['ID'])
+        return Job(api_client=self._api_client, orthanc_id=self._api_client.decode_json(r)['ID'])
 
     def send(self, target_server: str, resources_ids: Union[List[str], str]):
         """sends a list of resources to a remote DicomWeb server
@@ -83,4 +83,4 @@ class DicomWebServers:
                 "Synchronous": True
             })
         
-        return int(r.json()['ReceivedInstancesCount'])
\ No newline at end of file
+        return int(self._api_client.decode_json(r)['ReceivedInstancesCount'])
\ No newline at end of file
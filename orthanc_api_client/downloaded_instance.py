@@ -3,11 +3,13 @@ class DownloadedInstance:
     A structure to store the info about a downloaded file:
     - its instance id
     - the path where it has been downloaded
+    - the error if it could not be downloaded (None if it has been downloaded)
     """
 
-    def __init__(self, instance_id, path):
+    def __init__(self, instance_id, path, error=None):
         self.instance_id = instance_id
         self.path = path
+        self.error = error
 
     def __str__(self):
         return self.instance_id
\ No newline at end of file
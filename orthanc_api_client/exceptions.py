@@ -59,3 +59,30 @@ class BadFileFormat(HttpError):
 class Conflict(HttpError):
     def __init__(self, msg = "Conflict", url = None):
         super().__init__(http_status_code = 409, msg = msg, url = url)
+
+
+class InvalidZipStream(OrthancApiException):
+    def __init__(self, msg = "Invalid zip stream", url = None):
+        super().__init__(msg = msg, url = url)
+
+
+class RequestBudgetExceeded(OrthancApiException):
+    def __init__(self, requests_count, max_requests, report = None, msg = "Too many HTTP requests", url = None):
+        super().__init__(msg = msg, url = url)
+        self.requests_count = requests_count
+        self.max_requests = max_requests
+        self.report = report
+
+    def __str__(self):
+        return f"{self.msg}: {self.requests_count} requests issued while at most {self.max_requests} were expected\n{self.report or ''}"
+
+
+class CircuitOpen(OrthancApiException):
+    """ The request has not been sent because the remote modality/peer/server has failed too many times recently"""
+    def __init__(self, family, retry_after = None, msg = "Circuit open.  The remote has failed too many times recently.", url = None):
+        super().__init__(msg = msg, url = url)
+        self.family = family
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return f"{self.msg} Not accessing '{self.family}' for {self.retry_after or 0:.1f} more seconds ('{self.url}')"
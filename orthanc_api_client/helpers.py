@@ -1,10 +1,11 @@
 import time
+import hashlib
 import re
 import pydicom
 import datetime
 import random
 from strenum import StrEnum
-from typing import Union, Optional
+from typing import Union, Optional, List
 from .helpers_internal import write_dataset_to_bytes
 import pydicom.uid
 from urllib3.filepost import encode_multipart_formdata, choose_boundary
@@ -180,6 +181,51 @@ def generate_test_dicom_file(
     return write_dataset_to_bytes(ds)
 
 
+def read_dicom_header(path: str, tags: List[str]) -> Optional[pydicom.Dataset]:
+    """
+    Reads only the requested tags from the header of a DICOM file; the pixel data is never read.
+    Like Orthanc, files without the 128 bytes preamble are accepted.
+
+    Returns None if the file can not be parsed as a DICOM file.  Note that the requested tags may be missing
+    from the returned dataset (e.g. when the file is not a DICOM file but a zip file).
+    """
+    try:
+        return pydicom.dcmread(path, stop_before_pixels=True, specific_tags=tags, force=True)
+    except Exception:
+        return None
+
+
+def compute_orthanc_id(patient_id: str, study_instance_uid: Optional[str] = None, series_instance_uid: Optional[str] = None, sop_instance_uid: Optional[str] = None) -> str:
+    """
+    Computes the Orthanc id of a resource from its DICOM ids, the same way Orthanc does, without any request to Orthanc.
+
+    - for a patient: compute_orthanc_id(patient_id)
+    - for a study: compute_orthanc_id(patient_id, study_instance_uid)
+    - for a series: compute_orthanc_id(patient_id, study_instance_uid, series_instance_uid)
+    - for an instance: compute_orthanc_id(patient_id, study_instance_uid, series_instance_uid, sop_instance_uid)
+    """
+    dicom_ids = [patient_id or '']
+    for uid in [study_instance_uid, series_instance_uid, sop_instance_uid]:
+        if uid is None:
+            break
+        dicom_ids.append(uid)
+
+    sha1 = hashlib.sha1('|'.join([i.strip() for i in dicom_ids]).encode('utf-8')).hexdigest()
+    return '-'.join(sha1[i:i + 8] for i in range(0, 40, 8))
+
+
+def compute_orthanc_id_from_file(path: str) -> Optional[str]:
+    """
+    Computes the Orthanc id of the instance stored in a DICOM file (only its header is read).
+
+    Returns None if the file is not a DICOM file or if it does not contain the required DICOM ids.
+    """
+    header = read_dicom_header(path, ['PatientID', 'StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID'])
+    if header is None or not all(header.get(tag) for tag in ['StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID']):
+        return None
+    return compute_orthanc_id(str(header.get('PatientID', '')), str(header.StudyInstanceUID), str(header.SeriesInstanceUID), str(header.SOPInstanceUID))
+
+
 def encode_multipart_related(fields, boundary=None):
     if boundary is None:
         boundary = choose_boundary()
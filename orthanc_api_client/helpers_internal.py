@@ -1,4 +1,14 @@
+import copy
+import json
+import os
+import uuid
+import email.message
 from io import BytesIO
+from typing import Optional, List, Iterable, Iterator, Dict, Tuple
+from urllib3.filepost import choose_boundary
+import requests
+
+from . import exceptions as api_exceptions
 
 
 def write_dataset_to_bytes(dataset) -> bytes:
@@ -6,3 +16,282 @@ def write_dataset_to_bytes(dataset) -> bytes:
     with BytesIO() as buffer:
         dataset.save_as(buffer)
         return buffer.getvalue()
+
+
+def raise_on_http_error(response, url):
+    '''
+    Fires the ad hoc exception based on the HTTP error code of the response.
+    Works with both `requests` and `httpx` responses.
+    '''
+    if response.status_code == 401 or response.status_code == 403:
+        raise api_exceptions.NotAuthorized(response.status_code, url=url)
+    elif response.status_code == 404:
+        raise api_exceptions.ResourceNotFound(
+            response.status_code, url=url)
+    elif response.status_code == 409:
+        raise api_exceptions.Conflict(
+            msg=response.json()['Message'] if response.json() and 'Message' in response.json() else None,
+            url=url
+        )
+    else:
+        error_messages = []
+        error_message = None
+        # try to get details from the payload
+        payload = {}
+        if len(response.content) > 0:
+            try:
+                payload = json.loads(response.content)
+                if 'Message' in payload:
+                    error_messages.append(payload['Message'])
+                if 'Details' in payload and len(payload['Details']) > 0:
+                    error_messages.append(payload['Details'])
+            except:
+                pass
+
+        if len(error_messages) > 0:
+            error_message = " - ".join(error_messages)
+        raise api_exceptions.HttpError(
+            http_status_code=response.status_code,
+            msg=error_message,
+            url=url,
+            request_response=response,
+            error_payload=payload.get("ErrorPayload"))
+
+
+def write_response_to(response, target, chunk_size: int) -> int:
+    '''
+    Writes the body of a `stream=True` response chunk by chunk to `target` that can be a path or a writable binary file object.
+    When `target` is a path, the body is written to a temporary file in the same folder that is renamed once complete:
+    `target` never contains a partial file, even if the download is interrupted.
+    The response is closed once written.
+    Returns the number of bytes written.
+    '''
+    written = 0
+    with response:
+        if hasattr(target, 'write'):
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                target.write(chunk)
+                written += len(chunk)
+        else:
+            target = os.fspath(target)
+            tmp_path = f"{target}.{uuid.uuid4().hex}.part"
+            try:
+                with open(tmp_path, 'xb') as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        written += len(chunk)
+                os.replace(tmp_path, target)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+    return written
+
+
+def get_body_position(body) -> Optional[int]:
+    '''
+    Returns the current position of a seekable request body (file object, mmap, ...) or None for
+    in-memory bodies and non-seekable streams.
+    '''
+    if body is not None and hasattr(body, 'seek') and hasattr(body, 'tell'):
+        try:
+            return body.tell()
+        except (OSError, ValueError):
+            return None
+    return None
+
+
+def rewind_body(body, position: Optional[int]) -> bool:
+    '''
+    Prepares a request body to be sent a second time.
+    Returns False if the body is a stream that can not be replayed (e.g. a generator).
+    '''
+    if body is None or isinstance(body, (bytes, str, dict, list, tuple)):
+        return True
+    if position is not None:
+        body.seek(position)
+        return True
+    return False
+
+
+def get_request_key(url: str, params=None, headers=None) -> Optional[str]:
+    '''
+    Returns a key identifying a GET request (url, query and headers) to cache or share its response.
+    Returns None if the request must not be cached or shared because the caller handles the ETag itself.
+    '''
+    headers = headers or {}
+    if any([h.lower() in ['if-none-match', 'if-match', 'range'] for h in headers.keys()]):
+        return None
+
+    if params:
+        url = requests.Request('GET', url, params=params).prepare().url
+    return url + '|' + '|'.join(sorted([f"{k.lower()}={v}" for k, v in headers.items()]))
+
+
+def copy_response(response):
+    '''
+    Returns a copy of a `requests` response whose content has been read such that a response shared between threads
+    can be handed to each of them.
+    '''
+    response_copy = copy.copy(response)
+    response_copy.headers = copy.copy(response.headers)
+    return response_copy
+
+
+class MultipartRelatedStream:
+    '''
+    A read-only binary file object that generates a multipart/related body from a list of files
+    without loading them in memory.  Its length is known in advance so that it is sent with a Content-Length header.
+    It can be rewound with `seek(0)` (e.g. to send it again after a token renewal).
+    '''
+
+    def __init__(self, paths: List[str], part_content_type: str = 'application/dicom', boundary: Optional[str] = None):
+        boundary = boundary or choose_boundary()
+        self.content_type = f'multipart/related; type={part_content_type}; boundary={boundary}'
+
+        part_header = f'--{boundary}\r\nContent-Type: {part_content_type}\r\n\r\n'.encode('ascii')
+        self._segments = []  # bytes or (path, size)
+        for path in paths:
+            self._segments.append(part_header)
+            self._segments.append((path, os.path.getsize(path)))
+            self._segments.append(b'\r\n')
+        self._segments.append(f'--{boundary}--\r\n'.encode('ascii'))
+
+        self._length = sum([len(s) if isinstance(s, bytes) else s[1] for s in self._segments])
+        self._file = None
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if offset != 0 or whence != 0:
+            raise ValueError("MultipartRelatedStream can only be rewound to its start")
+        self._close_file()
+        self._position = 0
+        self._segment_index = 0
+        self._segment_offset = 0
+        return 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length - self._position
+
+        chunks = []
+        while size > 0 and self._segment_index < len(self._segments):
+            segment = self._segments[self._segment_index]
+            if isinstance(segment, bytes):
+                segment_length = len(segment)
+                chunk = segment[self._segment_offset:self._segment_offset + size]
+            else:
+                path, segment_length = segment
+                chunk = b''
+                if self._segment_offset < segment_length:
+                    if self._file is None:
+                        self._file = open(path, 'rb')
+                    chunk = self._file.read(min(size, segment_length - self._segment_offset))
+                    if len(chunk) == 0:
+                        raise IOError(f"{path} has been truncated while being uploaded")
+
+            chunks.append(chunk)
+            size -= len(chunk)
+            self._position += len(chunk)
+            self._segment_offset += len(chunk)
+            if self._segment_offset >= segment_length:
+                self._close_file()
+                self._segment_index += 1
+                self._segment_offset = 0
+
+        return b''.join(chunks)
+
+    def close(self):
+        self._close_file()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def get_multipart_boundary(content_type: str) -> Optional[str]:
+    '''
+    Extracts the boundary from a 'multipart/...; boundary=...' Content-Type header (the boundary may be quoted).
+    '''
+    message = email.message.Message()
+    message['content-type'] = content_type
+    return message.get_param('boundary')
+
+
+def iter_multipart_parts(chunks: Iterable[bytes], boundary: str) -> Iterator[Tuple[Dict[str, str], Iterator[bytes]]]:
+    '''
+    Incrementally parses a multipart body received as a sequence of chunks (e.g. `response.iter_content()`).
+    Yields (headers, content) for each part where `content` is an iterator of bytes chunks that must be consumed
+    before moving to the next part (the remaining content is skipped otherwise).
+    The memory usage is bounded by the size of the chunks, whatever the size of the parts.
+    '''
+    chunks = iter(chunks)
+    buffer = bytearray()
+    dash_boundary = b'--' + boundary.encode('ascii')
+    delimiter = b'\r\n' + dash_boundary
+
+    def fill() -> bool:
+        for chunk in chunks:
+            if chunk:
+                buffer.extend(chunk)
+                return True
+        return False
+
+    def read_content() -> Iterator[bytes]:
+        while True:
+            end = buffer.find(delimiter)
+            if end >= 0:
+                if end > 0:
+                    yield bytes(buffer[:end])
+                del buffer[:end + len(delimiter)]
+                return
+
+            # keep the end of the buffer that might be the beginning of the delimiter
+            available = len(buffer) - (len(delimiter) - 1)
+            if available > 0:
+                content = bytes(buffer[:available])
+                del buffer[:available]
+                yield content
+            if not fill():
+                raise ValueError("Truncated multipart body")
+
+    # skip the preamble
+    while True:
+        start = buffer.find(dash_boundary)
+        if start >= 0:
+            del buffer[:start + len(dash_boundary)]
+            break
+        if not fill():
+            return
+
+    while True:
+        # we are right after a boundary: either '--' (end of the body) or the end of the boundary line
+        while len(buffer) < 2 or (buffer[:2] != b'--' and buffer.find(b'\r\n') < 0):
+            if not fill():
+                return
+        if buffer[:2] == b'--':
+            return
+        del buffer[:buffer.find(b'\r\n')]  # keep the CRLF such that a part without headers starts with '\r\n\r\n'
+
+        while buffer.find(b'\r\n\r\n') < 0:
+            if not fill():
+                raise ValueError("Truncated multipart body")
+        headers_end = buffer.find(b'\r\n\r\n')
+        headers = {}
+        for line in bytes(buffer[2:headers_end]).decode('latin-1').split('\r\n'):
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        del buffer[:headers_end + 4]
+
+        content = read_content()
+        yield headers, content
+        for _ in content:  # skip what has not been consumed
+            pass
@@ -1,25 +1,81 @@
-from typing import Any
+from typing import Any, Union, BinaryIO, Optional, Callable
+import os
+import gzip
+import threading
 import requests
 import urllib.parse
-import json
 from requests.adapters import HTTPAdapter, Retry
 
 from orthanc_api_client import exceptions as api_exceptions
+from .helpers_internal import raise_on_http_error, write_response_to, get_body_position, rewind_body, get_request_key, copy_response
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
+from .instrumentation import RequestRecord
+from .json_codec import JsonCodec, get_json_codec
+from .concurrency_limiter import AdaptiveConcurrencyLimiter
+from .circuit_breaker import CircuitBreaker
+
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024   # chunk size used when streaming files to disk
+
+
+def join_url(root_url: str, endpoint: str) -> str:
+    # remove the leading '/' because root_url might be something like 'http://my.domain/orthanc/' and urljoin would then remove the '/orthanc'
+    normalised_endpoint = endpoint[1:] if endpoint.startswith("/") else endpoint
+
+    return urllib.parse.urljoin(root_url, normalised_endpoint)
 
 
 class HttpClient:
 
-    def __init__(self, root_url: str, user: str = None, pwd: str = None, headers: any = None, on_403_error = None, pool_maxsize: int = 10, pool_block: bool = False) -> None:
+    def __init__(self, root_url: str, user: str = None, pwd: str = None, headers: any = None, on_403_error = None, pool_maxsize: int = 10, pool_block: bool = False,
+                 response_cache: Optional[ResponseCache] = None, coalesce_requests: bool = False,
+                 json_codec: Optional[Union[str, JsonCodec]] = None, compress_requests_min_size: Optional[int] = None,
+                 concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None, circuit_breaker: Optional[CircuitBreaker] = None) -> None:
         self._root_url = root_url
-        self._http_session = requests.Session()
-
-        if user and pwd:
-            self._http_session.auth = requests.auth.HTTPBasicAuth(user, pwd)
-        if headers:
-            self._http_session.headers.update(headers)
 
         self._user = user
         self._pwd = pwd
+        self._headers = headers
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+
+        self._http_session = self._create_session(root_url)
+
+        self._on_403_error = on_403_error
+        self._token_lock = threading.Lock()
+
+        self.response_cache = response_cache
+        # concurrent identical GET requests share a single HTTP request
+        self._single_flight = SingleFlight() if coalesce_requests else None
+
+        self._request_hooks = []
+
+        if isinstance(json_codec, str):
+            json_codec = get_json_codec(json_codec)
+        self.json_codec = json_codec or JsonCodec()
+
+        # the responses are always negotiated with 'Accept-Encoding: gzip, deflate' (requests default headers) and
+        # decoded transparently.  The request bodies larger than this size are gzipped (disabled if None).
+        self._compress_requests_min_size = compress_requests_min_size
+
+        # limits the number of requests in flight (may be shared with other clients)
+        self.concurrency_limiter = concurrency_limiter
+
+        # fails fast the requests to the remote modalities/peers/servers that are down
+        self.circuit_breaker = circuit_breaker
+
+
+    def get_abs_url(self, endpoint: str) -> str:
+        return join_url(self._root_url, endpoint)
+
+    def _create_session(self, root_url: str) -> requests.Session:
+        session = requests.Session()
+
+        if self._user and self._pwd:
+            session.auth = requests.auth.HTTPBasicAuth(self._user, self._pwd)
+        if self._headers:
+            session.headers.update(self._headers)
 
         # only retries on ConnectionError and on Transient errors when we are sure that the request has not reached to Orthanc
         retries = Retry(  # doc: https://urllib3.readthedocs.io/en/stable/reference/urllib3.util.html#urllib3.util.Retry
@@ -31,75 +87,202 @@ class HttpClient:
             backoff_factor=0.2
         )
         url_schema = urllib.parse.urlparse(root_url).scheme + "://"
-        self._http_session.mount(url_schema, HTTPAdapter(max_retries=retries,
-                                                         pool_maxsize=pool_maxsize,
-                                                         pool_block=pool_block))
+        session.mount(url_schema, HTTPAdapter(max_retries=retries,
+                                              pool_maxsize=self._pool_maxsize,
+                                              pool_block=self._pool_block))
+        return session
 
-        self._on_403_error = on_403_error
-        self._token_updated = False
 
+    def add_request_hook(self, hook: Callable[[RequestRecord], None]):
+        '''
+        Registers a function that is called with a RequestRecord each time a request has completed or failed
+        (e.g. an HttpMetricsCollector).  The hook is called from the thread that issued the request.
+        '''
+        self._request_hooks = self._request_hooks + [hook]
 
-    def get_abs_url(self, endpoint: str) -> str:
-        # remove the leading '/' because _root_url might be something like 'http://my.domain/orthanc/' and urljoin would then remove the '/orthanc'
-        normalised_endpoint = endpoint[1:] if endpoint.startswith("/") else endpoint
+    def remove_request_hook(self, hook: Callable[[RequestRecord], None]):
+        self._request_hooks = [h for h in self._request_hooks if h is not hook]
 
-        return urllib.parse.urljoin(self._root_url, normalised_endpoint)
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        if kwargs.get('stream') or (self.response_cache is None and self._single_flight is None):
+            return self._request('GET', endpoint, **kwargs)
 
+        request_key = get_request_key(self.get_abs_url(endpoint), params=kwargs.get('params'), headers=kwargs.get('headers'))
+        if request_key is None:
+            return self._request('GET', endpoint, **kwargs)
 
-    def get(self, endpoint: str, **kwargs) -> requests.Response:
-        try:
-            url = self.get_abs_url(endpoint)
-            response = self._http_session.get(url, **kwargs)
+        if self._single_flight is None:
+            return self._get_with_response_cache(endpoint, request_key, **kwargs)
 
-            if self._raise_or_retry_on_errors(response, url=url):
-                response = self._http_session.get(url, **kwargs)
-                self._raise_or_retry_on_errors(response, url=url)
-            return response
-        except requests.RequestException as request_exception:
-            self._translate_exception(request_exception, url=url)
+        response, shared = self._single_flight.do(request_key, lambda: self._get_with_response_cache(endpoint, request_key, **kwargs))
+        return copy_response(response) if shared else response
 
     def get_json(self, endpoint: str, **kwargs) -> Any:
-        return self.get(endpoint, **kwargs).json()
+        return self.decode_json(self.get(endpoint, **kwargs))
+
+    def decode_json(self, response: requests.Response) -> Any:
+        '''
+        Decodes the JSON body of a response with the client json_codec (straight from the raw bytes)
+        '''
+        return self.json_codec.loads(response.content)
 
     def get_binary(self, endpoint: str, **kwargs) -> Any:
         return self.get(endpoint, **kwargs).content
 
-    def post(self, endpoint: str, **kwargs) -> requests.Response:
-        try:
-            url = self.get_abs_url(endpoint)
-            response = self._http_session.post(url, **kwargs)
+    def download(self, endpoint: str, target: Union[str, os.PathLike, BinaryIO], chunk_size: int = DEFAULT_CHUNK_SIZE, method: str = 'GET', **kwargs) -> int:
+        '''
+        Streams the response body to `target` (a path or a writable binary file object) without loading it in memory.
+        The peak memory usage is bounded by `chunk_size` whatever the size of the downloaded content.
+        Returns the number of bytes written.
+        '''
+        response = self._request(method, endpoint, stream=True, **kwargs)
+        return write_response_to(response, target, chunk_size=chunk_size)
 
-            if self._raise_or_retry_on_errors(response, url=url):
-                response = self._http_session.post(url, **kwargs)
-                self._raise_or_retry_on_errors(response, url=url)
-            return response
-        except requests.RequestException as request_exception:
-            self._translate_exception(request_exception, url=url)
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self._request('POST', endpoint, **kwargs)
 
     def put(self, endpoint: str, **kwargs) -> requests.Response:
+        return self._request('PUT', endpoint, **kwargs)
+
+    def delete(self, endpoint: str, **kwargs) -> requests.Response:
+        return self._request('DELETE', endpoint, **kwargs)
+
+    def _request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        if kwargs.get('json') is not None:
+            self._encode_json_body(kwargs)
+
+        uncompressed_size = None
+        if self._compress_requests_min_size is not None:
+            uncompressed_size = self._compress_body(kwargs)
+
+        request_hooks = self._request_hooks
+        if len(request_hooks) == 0:
+            return self._send_guarded_request(method, endpoint, None, **kwargs)
+
+        record = RequestRecord(method=method, endpoint=endpoint)
+        record.request_uncompressed_bytes = uncompressed_size
         try:
-            url = self.get_abs_url(endpoint)
-            response = self._http_session.put(url, **kwargs)
+            response = self._send_guarded_request(method, endpoint, record, **kwargs)
+            record.complete()
+            return response
+        except Exception as e:
+            record.complete(error=e)
+            raise
+        finally:
+            for hook in request_hooks:
+                hook(record)
 
-            if self._raise_or_retry_on_errors(response, url=url):
-                response = self._http_session.put(url, **kwargs)
-                self._raise_or_retry_on_errors(response, url=url)
+    def _encode_json_body(self, kwargs: dict):
+        kwargs['data'] = self.json_codec.dumps(kwargs.pop('json'))
+        headers = dict(kwargs.get('headers') or {})
+        if not any([h.lower() == 'content-type' for h in headers.keys()]):
+            headers['Content-Type'] = 'application/json'
+        kwargs['headers'] = headers
+
+    def _compress_body(self, kwargs: dict) -> Optional[int]:
+        '''
+        Gzips the request body if it is large enough.  Only the bodies that are already in memory are compressed
+        (not the streamed files, that are mostly DICOM files whose pixel data are often already compressed).
+        Returns the size of the uncompressed body if it has been compressed.
+        '''
+        data = kwargs.get('data')
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not isinstance(data, bytes) or len(data) < self._compress_requests_min_size:
+            return None
+
+        headers = dict(kwargs.get('headers') or {})
+        if any([h.lower() == 'content-encoding' for h in headers.keys()]):
+            return None
+
+        compressed_data = gzip.compress(data, compresslevel=6)
+        if len(compressed_data) >= len(data):
+            return None
+
+        headers['Content-Encoding'] = 'gzip'
+        kwargs['headers'] = headers
+        kwargs['data'] = compressed_data
+        return len(data)
+
+    def _send_guarded_request(self, method: str, endpoint: str, record: Optional[RequestRecord], **kwargs) -> requests.Response:
+        limiter = self.concurrency_limiter
+        circuit = None
+        if self.circuit_breaker is not None:
+            circuit = self.circuit_breaker.before_request(endpoint, url=self.get_abs_url(endpoint))  # may raise CircuitOpen
+        if limiter is None and circuit is None:
+            return self._send_request(method, endpoint, record, **kwargs)
+
+        start_time = None
+        response, error = None, None
+        try:
+            if limiter is not None:
+                start_time = limiter.acquire()
+            response = self._send_request(method, endpoint, record, **kwargs)
             return response
-        except requests.RequestException as request_exception:
-            self._translate_exception(request_exception, url=url)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # also run when interrupted by a BaseException (KeyboardInterrupt, gevent Timeout, ...): neither a response
+            # nor an error is then known, the slot and the half-open trial are released without changing their state
+            if start_time is not None:
+                if response is not None and kwargs.get('stream', False):
+                    limiter.release_when_consumed(start_time, endpoint, response)  # the body has not been read yet
+                else:
+                    limiter.release(start_time, endpoint, response=response, error=error)
+            if circuit is not None:
+                self.circuit_breaker.after_request(circuit, error=error, aborted=response is None and error is None)
 
-    def delete(self, endpoint: str, **kwargs) -> requests.Response:
+    def _send_request(self, method: str, endpoint: str, record: Optional[RequestRecord], **kwargs) -> requests.Response:
+        return self._send_request_with_session(self._http_session, self.get_abs_url(endpoint), method, record, **kwargs)
+
+    def _send_request_with_session(self, session: requests.Session, url: str, method: str, record: Optional[RequestRecord], **kwargs) -> requests.Response:
         try:
-            url = self.get_abs_url(endpoint)
-            response = self._http_session.delete(url, **kwargs)
+            # 'data' may be a file object or an iterator that is consumed while being sent
+            body_position = get_body_position(kwargs.get('data'))
+            response = session.request(method, url, **kwargs)
+            if record is not None:
+                record.add_response(response, stream=kwargs.get('stream', False))
 
             if self._raise_or_retry_on_errors(response, url=url):
-                response = self._http_session.delete(url, **kwargs)
-                self._raise_or_retry_on_errors(response, url=url)
+                if not rewind_body(kwargs.get('data'), body_position):
+                    # the token has been renewed but we can not send the same body a second time
+                    raise api_exceptions.NotAuthorized(response.status_code, url=url)
+                response = session.request(method, url, **kwargs)
+                if record is not None:
+                    record.add_response(response, stream=kwargs.get('stream', False))
+                self._raise_or_retry_on_errors(response, url=url, can_renew_token=False)
             return response
         except requests.RequestException as request_exception:
             self._translate_exception(request_exception, url=url)
 
+    def _get_with_response_cache(self, endpoint: str, cache_key: str, **kwargs) -> requests.Response:
+        if self.response_cache is None:
+            return self._request('GET', endpoint, **kwargs)
+
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response is not None:
+            kwargs['headers'] = dict(kwargs.get('headers') or {})
+            kwargs['headers']['If-None-Match'] = cached_response.headers['etag']
+
+        response = self._request('GET', endpoint, **kwargs)
+
+        if response.status_code == 304 and cached_response is not None:
+            self.response_cache.record_hit()
+            self.response_cache.put(cache_key, cached_response)  # still valid: restart its ttl
+            return copy_response(cached_response)
+
+        self.response_cache.record_miss()
+        if response.status_code == 200 and response.headers.get('etag') is not None:
+            self.response_cache.put(cache_key, copy_response(response))
+        return response
+
+    def _update_headers(self, headers: dict):
+        # replace the headers at once: the other threads are using the current ones
+        session_headers = self._http_session.headers.copy()
+        session_headers.update(headers)
+        self._http_session.headers = session_headers
+
     def close(self):
         self._http_session.close()
 
@@ -109,58 +292,27 @@ class HttpClient:
     def __del__(self):
         self.close()
 
-    def _raise_or_retry_on_errors(self, response, url) -> bool:
+    def _raise_or_retry_on_errors(self, response, url, can_renew_token: bool = True) -> bool:
         '''
         Will fire the ad hoc exception based on the error code;
         Will return True if a retry has to be performed;
         Will return False if everything was ok (HTTP 200 code).
         '''
-        if response.status_code >= 200 and response.status_code < 300:
-            self._token_updated = False
+        if (response.status_code >= 200 and response.status_code < 300) or response.status_code == 304:
+            # 304 only happens when the caller has sent an 'If-None-Match' header and handles it
             return False
 
-        if response.status_code == 401:
-            raise api_exceptions.NotAuthorized(response.status_code, url=url)
         if response.status_code == 403:
             # with the education plugin, the token may have expired, so let's try to renew it before raising an exception
-            if self._on_403_error is not None and self._token_updated == False:
-                self._token_updated = True
-                headers = self._on_403_error()
-                self._http_session.headers.update(headers)
+            if self._on_403_error is not None and can_renew_token:
+                with self._token_lock:
+                    # if another thread has renewed the token since this request has been sent, just retry with the new one
+                    if response.request.headers.get('Authorization') == self._http_session.headers.get('Authorization'):
+                        self._update_headers(self._on_403_error())
                 return True
-            self._token_updated = False
             raise api_exceptions.NotAuthorized(response.status_code, url=url)
-        elif response.status_code == 404:
-            raise api_exceptions.ResourceNotFound(
-                response.status_code, url=url)
-        elif response.status_code == 409:
-            raise api_exceptions.Conflict(
-                msg=response.json()['Message'] if response.json() and 'Message' in response.json() else None,
-                url=url
-            )
-        else:
-            error_messages = []
-            error_message = None
-            # try to get details from the payload
-            payload = {}
-            if len(response.content) > 0:
-                try:
-                    payload = json.loads(response.content)
-                    if 'Message' in payload:
-                        error_messages.append(payload['Message'])
-                    if 'Details' in payload and len(payload['Details']) > 0:
-                        error_messages.append(payload['Details'])
-                except:
-                    pass
-
-            if len(error_messages) > 0:
-                error_message = " - ".join(error_messages)
-            raise api_exceptions.HttpError(
-                http_status_code=response.status_code,
-                msg=error_message,
-                url=url,
-                request_response=response,
-                error_payload=payload.get("ErrorPayload"))
+
+        raise_on_http_error(response, url=url)
 
     def _translate_exception(self, request_exception, url):
         if isinstance(request_exception, requests.ConnectionError):
@@ -169,3 +321,6 @@ class HttpClient:
             raise api_exceptions.TimeoutError(url=url)
         elif isinstance(request_exception, requests.exceptions.SSLError):
             raise api_exceptions.SSLError(url=url)
+        elif isinstance(request_exception, requests.exceptions.RetryError):
+            # urllib3 has given up retrying the '502 Bad Gateway' and '503 Service Unavailable' answers
+            raise api_exceptions.HttpError(http_status_code=503, msg="Service unavailable.  Orthanc is overloaded or unreachable.", url=url)
@@ -1,8 +1,11 @@
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Union, BinaryIO, Iterator, Tuple
+import os
 from .study import Study
 from .series import Series
 from .instance import Instance
 from .job import Job
+from .http_client import DEFAULT_CHUNK_SIZE
+from .streaming_zip import iter_zip_entries, extract_zip_entries, ZipEntryStream
 import hashlib
 import base64
 
@@ -123,7 +126,7 @@ class InstancesSet:
             json=query)
 
         if r.status_code == 200:
-            rjson = r.json()
+            rjson = self.api_client.decode_json(r)
 
             # create the modified set from the response
             modified_set = InstancesSet(api_client=self.api_client)
@@ -195,24 +198,80 @@ class InstancesSet:
         for instance_id in self._all_instances_ids:
             processor(self.api_client, instance_id)
 
-    def download_archive(self, path: str):
-        response = self.api_client.post(
+    # creates the zip archive in an asynchronous job whose output can be retrieved with api_client.jobs.download_archive
+    def create_archive_async(self) -> Job:
+        return self._create_archive_job("tools/create-archive")
+
+    # creates the DICOMDIR media in an asynchronous job whose output can be retrieved with api_client.jobs.download_archive
+    def create_media_async(self) -> Job:
+        return self._create_archive_job("tools/create-media")
+
+    def _create_archive_job(self, endpoint: str) -> Job:
+        r = self.api_client.post(
+            endpoint=endpoint,
+            json={
+                "Asynchronous": True,
+                "Resources": self.instances_ids
+            }
+        )
+        return Job(api_client=self.api_client, orthanc_id=self.api_client.decode_json(r)['ID'])
+
+    # streams the zip archive to 'path' (a file path or a writable binary file object)
+    # with asynchronous=True, the archive is created in a job and retrieved once the job has completed:
+    # no HTTP request is kept open while Orthanc builds the archive (timeout: the max time to wait for the job)
+    def download_archive(self, path: Union[str, os.PathLike, BinaryIO], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         asynchronous: bool = False, timeout: Optional[float] = None):
+        if asynchronous:
+            job = self.create_archive_async()
+            self.api_client.jobs.download_archive(job.orthanc_id, path, chunk_size=chunk_size, timeout=timeout)
+            return
+
+        self.api_client.download(
             endpoint="tools/create-archive",
+            target=path,
+            chunk_size=chunk_size,
+            method='POST',
             json={
                 "Synchronous": True,
                 "Resources": self.instances_ids
             }
         )
-        with open(path, 'wb') as f:
-            f.write(response.content)
 
-    def download_media(self, path: str):
-        response = self.api_client.post(
+    # streams the DICOMDIR media to 'path' (a file path or a writable binary file object)
+    # with asynchronous=True, the media is created in a job (see download_archive)
+    def download_media(self, path: Union[str, os.PathLike, BinaryIO], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       asynchronous: bool = False, timeout: Optional[float] = None):
+        if asynchronous:
+            job = self.create_media_async()
+            self.api_client.jobs.download_archive(job.orthanc_id, path, chunk_size=chunk_size, timeout=timeout)
+            return
+
+        self.api_client.download(
             endpoint="tools/create-media",
+            target=path,
+            chunk_size=chunk_size,
+            method='POST',
             json={
                 "Synchronous": True,
                 "Resources": self.instances_ids
             }
         )
-        with open(path, 'wb') as f:
-            f.write(response.content)
+
+    # streams the zip archive and yields (path, stream) for each of its files while it is received
+    # (each stream must be consumed before moving to the next file)
+    def iter_archive(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[str, ZipEntryStream]]:
+        response = self.api_client.post(
+            endpoint="tools/create-archive",
+            stream=True,
+            json={
+                "Synchronous": True,
+                "Resources": self.instances_ids
+            }
+        )
+        with response:
+            yield from iter_zip_entries(response.iter_content(chunk_size=chunk_size), chunk_size=chunk_size)
+
+    # streams the zip archive and extracts its files to 'target_folder' without storing the zip file
+    # returns the paths of the extracted files
+    def extract_archive(self, target_folder: Union[str, os.PathLike], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[str]:
+        return extract_zip_entries(self.iter_archive(chunk_size=chunk_size), target_folder)
@@ -0,0 +1,216 @@
+import bisect
+import re
+import threading
+import time
+from typing import Optional, Dict, Tuple
+
+from .exceptions import CircuitOpen
+
+
+_ORTHANC_ID_PATTERN = re.compile(r'^[0-9a-f]{8}(-[0-9a-f]{8}){4}$')
+_UUID_PATTERN = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+_DICOM_UID_PATTERN = re.compile(r'^[0-9]+(\.[0-9]+)+$')
+
+# the segment that follows these ones is the name of a remote node (e.g. 'modalities/{alias}/store')
+_ALIAS_PARENT_SEGMENTS = ['modalities', 'peers', 'servers']
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def get_endpoint_template(endpoint: str) -> str:
+    """
+    Replaces the variable parts of an endpoint by placeholders such that the requests to the same route are grouped:
+    'studies/6816cb19-844d5aee-85245eba-28e841e6-2414fae2/series' -> 'studies/{id}/series'
+    'dicom-web/studies/1.2.3.4/series' -> 'dicom-web/studies/{uid}/series'
+    'modalities/orthanc-b/store' -> 'modalities/{alias}/store'
+    """
+    segments = endpoint.split('?')[0].strip('/').split('/')
+    template = []
+    for i, segment in enumerate(segments):
+        if _ORTHANC_ID_PATTERN.match(segment) or _UUID_PATTERN.match(segment):
+            template.append('{id}')
+        elif _DICOM_UID_PATTERN.match(segment):
+            template.append('{uid}')
+        elif i > 0 and segments[i - 1] in _ALIAS_PARENT_SEGMENTS:
+            template.append('{alias}')
+        else:
+            template.append(segment)
+    return '/'.join(template)
+
+
+def get_compression_ratio(uncompressed_size: int, compressed_size: int) -> float:
+    return uncompressed_size / compressed_size if compressed_size > 0 else 1.0
+
+
+class RequestRecord:
+    """
+    Describes an HTTP request issued by an HttpClient.  It is passed to the request hooks once the request is complete
+    (or has failed).
+    """
+
+    def __init__(self, method: str, endpoint: str):
+        self.method = method
+        self.endpoint = endpoint
+        self.status_code: Optional[int] = None
+        self.duration: Optional[float] = None  # in seconds, including the retries
+        self.request_bytes = 0  # as sent on the wire
+        self.request_uncompressed_bytes: Optional[int] = None  # set by the HttpClient if it has compressed the body
+        self.response_bytes: Optional[int] = None  # decoded size, None if the response is streamed without a Content-Length
+        self.response_wire_bytes: Optional[int] = None  # as received on the wire (compressed size)
+        self.retries = 0
+        self.error: Optional[Exception] = None
+
+        self._start = time.perf_counter()
+
+    @property
+    def endpoint_template(self) -> str:
+        return get_endpoint_template(self.endpoint)
+
+    def add_response(self, response, stream: bool = False):
+        if self.status_code is not None:
+            self.retries += 1  # the request has been sent again by the HttpClient (e.g. after a token renewal)
+        self.status_code = response.status_code
+
+        # the retries performed by urllib3 (connection errors, 502, 503)
+        retries = getattr(response.raw, 'retries', None)
+        self.retries += len(getattr(retries, 'history', None) or ())
+
+        self.request_bytes = int(response.request.headers.get('Content-Length', 0))
+        if self.request_uncompressed_bytes is None:
+            self.request_uncompressed_bytes = self.request_bytes
+
+        content_length = response.headers.get('Content-Length')
+        is_encoded = response.headers.get('Content-Encoding', 'identity') != 'identity'
+        if stream:
+            self.response_wire_bytes = int(content_length) if content_length is not None else None
+            self.response_bytes = self.response_wire_bytes if not is_encoded else None
+        else:
+            self.response_bytes = len(response.content)
+            self.response_wire_bytes = self.response_bytes
+            if is_encoded and hasattr(response.raw, 'tell'):
+                self.response_wire_bytes = response.raw.tell()  # the number of bytes read from the socket
+
+    def complete(self, error: Optional[Exception] = None):
+        self.error = error
+        self.duration = time.perf_counter() - self._start
+
+
+class EndpointStats:
+    """
+    The statistics of all the requests with the same method and endpoint template.
+    """
+
+    def __init__(self, latency_buckets: Tuple[float, ...]):
+        self.count = 0
+        self.errors_count = 0
+        self.rejected_count = 0  # the requests that have not been sent because the circuit of their remote was open
+        self.retries_count = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.request_bytes = 0
+        self.request_uncompressed_bytes = 0
+        self.response_bytes = 0
+        self.response_wire_bytes = 0
+        self.status_codes: Dict[int, int] = {}
+        self.latency_buckets = latency_buckets
+        self.latency_histogram = [0] * (len(latency_buckets) + 1)  # the last bucket counts the slower requests
+
+    @property
+    def mean_duration(self) -> float:
+        return self.total_duration / self.count if self.count > 0 else 0.0
+
+    @property
+    def compression_ratio(self) -> float:
+        """
+        The ratio between the decoded and the transferred sizes of the requests and responses bodies (1.0 if uncompressed)
+        """
+        return get_compression_ratio(self.request_uncompressed_bytes + self.response_bytes, self.request_bytes + self.response_wire_bytes)
+
+    def get_duration_percentile(self, percentile: float) -> float:
+        """
+        Returns an upper bound of the given percentile (0-100) of the latency, from the histogram buckets.
+        """
+        threshold = self.count * percentile / 100
+        cumulated_count = 0
+        for i, bucket_count in enumerate(self.latency_histogram):
+            cumulated_count += bucket_count
+            if cumulated_count >= threshold and cumulated_count > 0:
+                return self.latency_buckets[i] if i < len(self.latency_buckets) else self.max_duration
+        return 0.0
+
+    def add(self, record: RequestRecord):
+        self.count += 1
+        self.retries_count += record.retries
+        if record.error is not None:
+            self.errors_count += 1
+            if isinstance(record.error, CircuitOpen):
+                self.rejected_count += 1
+        if record.status_code is not None:
+            self.status_codes[record.status_code] = self.status_codes.get(record.status_code, 0) + 1
+        self.total_duration += record.duration
+        self.max_duration = max(self.max_duration, record.duration)
+        self.latency_histogram[bisect.bisect_left(self.latency_buckets, record.duration)] += 1
+        self.request_bytes += record.request_bytes
+        self.request_uncompressed_bytes += record.request_uncompressed_bytes or record.request_bytes
+        # the sizes of streamed responses are not always known: only count the ones for which both are known
+        if record.response_bytes is not None and record.response_wire_bytes is not None:
+            self.response_bytes += record.response_bytes
+            self.response_wire_bytes += record.response_wire_bytes
+
+
+class HttpMetricsCollector:
+    """
+    A request hook that aggregates the requests per method and endpoint template (e.g. 'GET studies/{id}'):
+    latency histogram, request/response bytes, status codes, errors and retries.
+
+    Usage:
+        metrics = HttpMetricsCollector()
+        orthanc.add_request_hook(metrics)
+        ...
+        print(metrics.report())
+    """
+
+    def __init__(self, latency_buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.latency_buckets = tuple(sorted(latency_buckets))
+        self._lock = threading.Lock()
+        self._stats: Dict[str, EndpointStats] = {}
+
+    def __call__(self, record: RequestRecord):
+        key = f"{record.method} {record.endpoint_template}"
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = EndpointStats(self.latency_buckets)
+            stats.add(record)
+
+    def get_stats(self) -> Dict[str, EndpointStats]:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def get_compression_ratio(self) -> float:
+        """
+        The ratio between the decoded and the transferred sizes of all the requests and responses bodies
+        """
+        stats = self.get_stats().values()
+        return get_compression_ratio(sum([s.request_uncompressed_bytes + s.response_bytes for s in stats]),
+                                     sum([s.request_bytes + s.response_wire_bytes for s in stats]))
+
+    def report(self, sort_by: str = 'total_duration', limit: Optional[int] = None) -> str:
+        """
+        Returns a text table with one line per endpoint, sorted by `sort_by` (an EndpointStats attribute, descending)
+        """
+        stats = sorted(self.get_stats().items(), key=lambda s: getattr(s[1], sort_by), reverse=True)
+        if limit is not None:
+            stats = stats[:limit]
+
+        lines = [f"{'endpoint':<50} {'count':>7} {'errors':>6} {'rejected':>8} {'retries':>7} {'total(s)':>9} {'mean(ms)':>9} {'p95(ms)':>8} {'max(ms)':>8} {'sent':>10} {'received':>10} {'ratio':>6}  status codes"]
+        for key, s in stats:
+            status_codes = ', '.join([f"{code}: {count}" for code, count in sorted(s.status_codes.items())])
+            lines.append(f"{key:<50} {s.count:>7} {s.errors_count:>6} {s.rejected_count:>8} {s.retries_count:>7} {s.total_duration:>9.3f} "
+                         f"{s.mean_duration * 1000:>9.1f} {s.get_duration_percentile(95) * 1000:>8.1f} {s.max_duration * 1000:>8.1f} "
+                         f"{s.request_bytes:>10} {s.response_wire_bytes:>10} {s.compression_ratio:>6.2f}  {status_codes}")
+        return '\n'.join(lines)
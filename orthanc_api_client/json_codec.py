@@ -0,0 +1,73 @@
+import json
+from typing import Any, Union
+
+
+class JsonCodec:
+    """
+    Encodes the JSON request bodies and decodes the JSON responses.  This default codec uses the standard library.
+    The faster OrjsonCodec and MsgspecCodec require the optional 'orjson' or 'msgspec' dependency
+    (pip install orthanc-api-client[fast-json]).
+    """
+
+    name = 'json'
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+
+class OrjsonCodec(JsonCodec):
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._orjson.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj, option=self._orjson.OPT_NON_STR_KEYS)
+
+
+class MsgspecCodec(JsonCodec):
+
+    name = 'msgspec'
+
+    def __init__(self):
+        import msgspec
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._decoder.decode(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj)
+
+
+_CODECS = {
+    'json': JsonCodec,
+    'orjson': OrjsonCodec,
+    'msgspec': MsgspecCodec
+}
+
+
+def get_json_codec(name: str = 'auto') -> JsonCodec:
+    """
+    Returns a codec by name: 'json', 'orjson', 'msgspec' or 'auto' to use the fastest one that is installed.
+    """
+    if name == 'auto':
+        for codec_class in [OrjsonCodec, MsgspecCodec]:
+            try:
+                return codec_class()
+            except ImportError:
+                continue
+        return JsonCodec()
+
+    if name not in _CODECS:
+        raise ValueError(f"Unknown JSON codec '{name}', expected one of {list(_CODECS.keys())} or 'auto'")
+    return _CODECS[name]()
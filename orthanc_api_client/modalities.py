@@ -69,7 +69,7 @@ class DicomModalities:
         )
 
         if r.status_code == 200:
-            return r.json()
+            return self._api_client.decode_json(r)
 
     def store(self, target_modality: str, resources_ids: Union[List[str], str], timeout: Optional[float] = None):
         """alias for send"""
@@ -98,7 +98,7 @@ class DicomModalities:
             json=payload
         )
 
-        return Job(api_client=self._api_client, orthanc_id=r.json()['ID'])
+        return Job(api_client=self._api_client, orthanc_id=self._api_client.decode_json(r)['ID'])
 
     def send(self, target_modality: str, resources_ids: Union[List[str], str], timeout: Optional[float] = None, local_aet: str = None):
         """sends a list of resources to a remote DICOM modality
@@ -332,9 +332,10 @@ class DicomModalities:
         if to_modality_aet:
             payload['TargetAet'] = to_modality_aet
 
-        return self._api_client.post(
+        r = self._api_client.post(
             endpoint=f"{self._url_segment}/{from_modality}/move",
-            json=payload).json()
+            json=payload)
+        return self._api_client.decode_json(r)
 
 
     def _get(self, level: str, resource: object, from_modality: str, asynchronous: bool = False):
@@ -352,9 +353,10 @@ class DicomModalities:
             'Asynchronous': asynchronous
         }
 
-        return self._api_client.post(
+        r = self._api_client.post(
             endpoint=f"{self._url_segment}/{from_modality}/get",
-            json=payload).json()
+            json=payload)
+        return self._api_client.decode_json(r)
 
 
     def query_studies(self, from_modality: str, query: object) -> typing.List[RemoteModalityStudy]:
@@ -441,15 +443,15 @@ class DicomModalities:
             endpoint=f"{self._url_segment}/{from_modality}/query",
             json=payload)
 
-        query_id = query.json()['ID']
+        query_id = self._api_client.decode_json(query)['ID']
 
         results = []
 
         answers = self._api_client.get(endpoint = f"queries/{query_id}/answers")
 
-        for answer_id in answers.json():
+        for answer_id in self._api_client.decode_json(answers):
             result = QueryResult()
-            result.tags = SimplifiedTags(self._api_client.get(f"queries/{query_id}/answers/{answer_id}/content?simplify").json())
+            result.tags = SimplifiedTags(self._api_client.get_json(f"queries/{query_id}/answers/{answer_id}/content?simplify"))
             result.retrieve_url = f"queries/{query_id}/answers/{answer_id}/retrieve"
             results.append(result)
 
@@ -0,0 +1,54 @@
+import concurrent.futures
+from typing import Callable, Iterable, Optional, Any
+
+
+def run_in_parallel(func: Callable[[Any], Any],
+                    items: Iterable[Any],
+                    max_workers: int,
+                    on_completed: Callable[[Any, Any, Optional[Exception]], None],
+                    max_pending: Optional[int] = None):
+    """
+    Calls `func(item)` for each item with at most `max_workers` threads.
+
+    - `items` is consumed lazily and at most `max_pending` items are submitted at a time (back-pressure):
+      a generator walking 200k files never creates 200k futures.
+    - `on_completed(item, result, exception)` is called from the calling thread each time an item is done.
+      If it raises, no new item is submitted, the in-flight ones are awaited and the exception is re-raised.
+    - with `max_workers <= 1`, everything runs in the calling thread.
+    """
+    if max_workers <= 1:
+        for item in items:
+            result, exception = None, None
+            try:
+                result = func(item)
+            except Exception as e:
+                exception = e
+            on_completed(item, result, exception)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * max_workers
+
+    def handle(done_futures):
+        for future in done_futures:
+            item = pending.pop(future)
+            exception = future.exception()
+            on_completed(item, None if exception else future.result(), exception)
+
+    pending = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for item in items:
+                if len(pending) >= max_pending:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    handle(done)
+                pending[executor.submit(func, item)] = item
+
+            while len(pending) > 0:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                handle(done)
+        except BaseException:
+            # stop as soon as possible: drop the queued items and let the running ones complete
+            for future in pending:
+                future.cancel()
+            raise
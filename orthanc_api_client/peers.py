@@ -27,7 +27,7 @@ class Peers:
                 "Synchronous": False
             })
 
-        return Job(api_client=self._api_client, orthanc_id=r.json()['ID'])
+        return Job(api_client=self._api_client, orthanc_id=self._api_client.decode_json(r)['ID'])
 
 
     # sends a resource synchronously
@@ -0,0 +1,103 @@
+import os
+import sys
+import threading
+from typing import Optional, List, Dict
+
+from .exceptions import RequestBudgetExceeded
+from .instrumentation import RequestRecord
+
+_PACKAGE_FOLDER = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+def get_operation_name(frame) -> Optional[str]:
+    """
+    Returns the name of the outermost function of this library in the call stack, i.e. the function that has been
+    called by the user code (e.g. 'Study.info' or 'Studies.get_json') or None if the stack contains no such function.
+    """
+    operation_frame = None
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(_PACKAGE_FOLDER):
+            operation_frame = frame
+        frame = frame.f_back
+
+    if operation_frame is None:
+        return None
+
+    code = operation_frame.f_code
+    self_object = operation_frame.f_locals.get('self')
+    if self_object is not None:
+        return f"{type(self_object).__name__}.{code.co_name}"
+    return getattr(code, 'co_qualname', code.co_name)
+
+
+class RequestProfiler:
+    """
+    A context manager that records all the HTTP requests issued by a client inside a block and groups them by
+    high-level operation (the library function called by the user code, e.g. 'Study.info').
+    It helps finding N+1 patterns like walking `study.series` -> `series.instances` -> `instance.tags`.
+
+    If `max_requests` is set, a RequestBudgetExceeded exception is raised when leaving the block if more requests
+    have been issued.
+
+    Usage:
+        with RequestProfiler(orthanc, max_requests=10) as profiler:
+            ...
+        print(profiler.report())
+
+    Note: the requests issued by all the threads that use the same client are recorded.
+    """
+
+    def __init__(self, api_client: 'HttpClient', max_requests: Optional[int] = None):
+        self._api_client = api_client
+        self.max_requests = max_requests
+        self.records: List[RequestRecord] = []
+        self.operations: List[str] = []  # the operation of each record
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._api_client.add_request_hook(self._on_request)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._api_client.remove_request_hook(self._on_request)
+        if exc_type is None and self.max_requests is not None:
+            self.assert_max_requests(self.max_requests)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _on_request(self, record: RequestRecord):
+        operation = get_operation_name(sys._getframe(1)) or record.endpoint_template
+        with self._lock:
+            self.records.append(record)
+            self.operations.append(operation)
+
+    def get_requests_by_operation(self) -> Dict[str, List[RequestRecord]]:
+        """
+        Returns the recorded requests grouped by operation, the operations that issued the most requests first
+        """
+        with self._lock:
+            grouped = {}
+            for operation, record in zip(self.operations, self.records):
+                grouped.setdefault(operation, []).append(record)
+        return dict(sorted(grouped.items(), key=lambda g: len(g[1]), reverse=True))
+
+    def assert_max_requests(self, max_requests: int):
+        if len(self.records) > max_requests:
+            raise RequestBudgetExceeded(requests_count=len(self.records), max_requests=max_requests, report=self.report())
+
+    def report(self) -> str:
+        """
+        Returns a text summary: for each operation, the number of requests per method and endpoint template
+        """
+        lines = [f"{len(self.records)} requests"]
+        for operation, records in self.get_requests_by_operation().items():
+            duration = sum([r.duration or 0 for r in records])
+            lines.append(f"  {operation}: {len(records)} requests ({duration * 1000:.1f} ms)")
+            endpoints = {}
+            for r in records:
+                key = f"{r.method} {r.endpoint_template}"
+                endpoints[key] = endpoints.get(key, 0) + 1
+            for endpoint, count in sorted(endpoints.items(), key=lambda e: e[1], reverse=True):
+                lines.append(f"    {count:>5} x {endpoint}")
+        return '\n'.join(lines)
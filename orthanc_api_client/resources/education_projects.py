@@ -24,7 +24,7 @@ class Projects(Resources):
         )
         r.raise_for_status()
 
-        return r.json()['id']
+        return self._api_client.decode_json(r)['id']
 
     def delete(self, project_id: str):
         self._api_client.delete(f"{self._url_segment}/{project_id}")
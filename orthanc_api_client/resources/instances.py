@@ -2,9 +2,11 @@ import os
 
 from .resources import Resources
 from ..tags import Tags
-from typing import Union, List, Optional, Any
+from typing import Union, List, Optional, Any, BinaryIO, Dict
 from ..downloaded_instance import DownloadedInstance
 from ..instance import InstanceInfo, Instance
+from ..http_client import DEFAULT_CHUNK_SIZE
+from ..parallel import run_in_parallel
 
 
 class Instances(Resources):
@@ -16,7 +18,27 @@ class Instances(Resources):
         return Instance(api_client=self._api_client, orthanc_id=orthanc_id)
 
     def get_file(self, orthanc_id: str) -> bytes:
-        return self._api_client.get_binary(f"{self._url_segment}/{orthanc_id}/file")
+        url = f"{self._url_segment}/{orthanc_id}/file"
+        content_cache = self._api_client.content_cache
+        cache_key = self._api_client.get_abs_url(url)  # the same id may refer to other contents on other Orthancs
+        if content_cache is not None:
+            content = content_cache.get(cache_key)  # an instance never changes once stored in Orthanc
+            if content is not None:
+                return content
+
+        content = self._api_client.get_binary(url)
+        if content_cache is not None:
+            content_cache.put(cache_key, content)
+        return content
+
+    def download_file(self, orthanc_id: str, path: Union[str, os.PathLike, BinaryIO], chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+        """
+        streams the instance DICOM file to `path` (a file path or a writable binary file object) without loading it in memory
+
+        Returns:
+            the number of bytes written
+        """
+        return self._api_client.download(f"{self._url_segment}/{orthanc_id}/file", target=path, chunk_size=chunk_size)
 
     def get_parent_series_id(self, orthanc_id: str) -> str:
         return self._api_client.get_json(f"{self._url_segment}/{orthanc_id}/series")['ID']
@@ -68,6 +90,33 @@ class Instances(Resources):
         """
         return self._lookup(filter='Instance', dicom_id=dicom_id)
 
+    def find_ids_by_sop_instance_uids(self, sop_instance_uids: List[str]) -> Dict[str, List[str]]:
+        """
+        finds, in a single request, the instances that are stored in Orthanc among a list of SOPInstanceUIDs
+
+        Returns
+        -------
+        a dict {SOPInstanceUID: [instances ids]} that only contains the instances found in Orthanc.  Several instances
+        may share the same SOPInstanceUID (e.g. a modified or anonymized copy stored in another patient/study).
+        """
+        if len(sop_instance_uids) == 0:
+            return {}
+
+        r = self._api_client.post(
+            endpoint="tools/find",
+            json={
+                "Level": "Instance",
+                "Query": {
+                    "SOPInstanceUID": "\\".join(sop_instance_uids)
+                },
+                "Expand": True
+            })
+
+        instances_ids = {}
+        for i in self._api_client.decode_json(r):
+            instances_ids.setdefault(i['MainDicomTags']['SOPInstanceUID'], []).append(i['ID'])
+        return instances_ids
+
     def is_pdf(self, instance_id: str):
         """
         checks if the instance contains a pdf
@@ -91,42 +140,62 @@ class Instances(Resources):
             the path where the PDF has been saved (same as input argument)
         """
 
-        response = self._api_client.get(
-            endpoint = f"instances/{instance_id}/pdf")
-        with open(path, 'wb') as f:
-            f.write(response.content)
+        self._api_client.download(
+            endpoint = f"instances/{instance_id}/pdf",
+            target = path)
 
         return path
 
-    def download_instance(self, instance_id: str, path: str) -> DownloadedInstance:
+    def download_instance(self, instance_id: str, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> DownloadedInstance:
         """
-        downloads the instance DICOM file to disk
+        downloads the instance DICOM file to disk (the file is streamed, it is never fully loaded in memory)
         Args:
             instance_id: the instance id to download
             path: the file path where to store the downloaded file
+            chunk_size: the size of the chunks written to disk
 
         Returns:
             a DownloadedInstance object with the instanceId and the path
         """
-        file_content = self.get_file(instance_id)
-        with open(path, 'wb') as f:
-            f.write(file_content)
+        self.download_file(instance_id, path, chunk_size=chunk_size)
 
         return DownloadedInstance(instance_id, path)
 
-    def download_instances(self, instances_ids: List[str], path: str) -> List[DownloadedInstance]:
+    def download_instances(self, instances_ids: List[str], path: str, max_workers: int = 1, ignore_errors: bool = False,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[DownloadedInstance]:
         """
-        downloads the instances DICOM files to disk
+        downloads the instances DICOM files to disk.  Each file is streamed to a temporary file that is renamed
+        once complete: an interrupted download never leaves a partial file.
         Args:
             instances_ids: the instances ids to download
             path: the folder path where to store the downloaded files
+            max_workers: the number of files downloaded in parallel (1 = one file at a time).  The workers share the
+                         HTTP connections pool of the client: max_workers should not exceed its pool_maxsize.
+            ignore_errors: if True: does not raise exceptions; the instances that could not be downloaded are
+                           returned with their `error` attribute set.
+                           if False: the first error is raised once the downloads in progress are complete.
+            chunk_size: the size of the chunks written to disk
 
         Returns:
-            a list of DownloadedInstance objects with the instanceId and the path
+            a list of DownloadedInstance objects with the instanceId and the path (in the same order as instances_ids)
         """
-        downloaded_instances = []
-        for instance_id in instances_ids:
-            downloaded_instances.append(self.download_instance(instance_id = instance_id,
-                                                               path = os.path.join(path, instance_id + ".dcm")))
-
-        return downloaded_instances
+        downloaded_instances = {}
+
+        def on_completed(instance_id, downloaded_instance, error):
+            if error is not None:
+                if not ignore_errors:
+                    raise error
+                downloaded_instance = DownloadedInstance(instance_id, os.path.join(path, instance_id + ".dcm"), error=error)
+            downloaded_instances[instance_id] = downloaded_instance
+
+        self._api_client._warn_if_pool_too_small(max_workers)
+        run_in_parallel(
+            func=lambda instance_id: self.download_instance(instance_id=instance_id,
+                                                            path=os.path.join(path, instance_id + ".dcm"),
+                                                            chunk_size=chunk_size),
+            items=instances_ids,
+            max_workers=max_workers,
+            on_completed=on_completed
+        )
+
+        return [downloaded_instances[instance_id] for instance_id in instances_ids]
@@ -1,8 +1,10 @@
 from .resources import Resources
 from ..tags import Tags
-from typing import List, Any
+from typing import List, Any, Union, BinaryIO, Optional
+import os
 from ..exceptions import *
-from ..job import Job
+from ..job import Job, JobStatus
+from ..http_client import DEFAULT_CHUNK_SIZE
 
 
 class Jobs(Resources):
@@ -32,3 +34,19 @@ class Jobs(Resources):
 
     def resume(self, orthanc_id: str):
         self._post_job_action(orthanc_id=orthanc_id, action='resume')
+
+    def download_archive(self, orthanc_id: str, path: Union[str, os.PathLike, BinaryIO], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         timeout: Optional[float] = None, polling_interval: float = 1):
+        """
+        waits for an asynchronous archive or media job to complete and streams its output (the zip file)
+        to `path` (a file path or a writable binary file object).
+
+        Note that Orthanc only keeps the output of the most recent archive jobs (see the 'MediaArchiveSize' configuration).
+        """
+        job = self.get(orthanc_id)
+        if not job.wait_completed(timeout=timeout, polling_interval=polling_interval):
+            raise TimeoutError(msg=f"The job {orthanc_id} has not completed in time.")
+        if job.info.status != JobStatus.SUCCESS:
+            raise OrthancApiException(msg=f"The job {orthanc_id} has failed: {job.content}")
+
+        self._api_client.download(f"{self._url_segment}/{orthanc_id}/archive", target=path, chunk_size=chunk_size)
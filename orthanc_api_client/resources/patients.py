@@ -82,7 +82,7 @@ class Patients(Resources):
             json=payload)
 
         patients = []
-        for json_patient in r.json():
+        for json_patient in self._api_client.decode_json(r):
             patients.append(Patient.from_json(self._api_client, json_patient))
 
         return patients
@@ -112,14 +112,17 @@ class Patients(Resources):
         """
         return self._api_client.instances.get_tags(self.get_first_instance_id(orthanc_id=orthanc_id))
 
-    def download_instances(self, patient_id: str, path: str) -> List['DownloadedInstance']:
+    def download_instances(self, patient_id: str, path: str, max_workers: int = 1, ignore_errors: bool = False) -> List['DownloadedInstance']:
         """
         downloads all instances from the patient to disk
         Args:
             patient_id: the patientid to download
             path: the directory path where to store the downloaded files
+            max_workers: the number of files downloaded in parallel
+            ignore_errors: if True: does not raise exceptions (see instances.download_instances)
 
         Returns:
             an array of DownloadedInstance
         """
-        return self._api_client.instances.download_instances(self.get_instances_ids(patient_id), path)
+        return self._api_client.instances.download_instances(self.get_instances_ids(patient_id), path,
+                                                             max_workers=max_workers, ignore_errors=ignore_errors)
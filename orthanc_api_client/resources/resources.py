@@ -2,10 +2,16 @@ import datetime
 
 import json
 import logging
-from typing import List, Tuple, Optional, Any
+import os
+import uuid
+from typing import List, Tuple, Optional, Any, Union, BinaryIO, Iterator
 from ..exceptions import *
-from ..helpers import to_dicom_date
+from ..helpers import to_dicom_date, compute_orthanc_id_from_file
+from ..helpers_internal import get_multipart_boundary, iter_multipart_parts
+from ..downloaded_instance import DownloadedInstance
+from ..streaming_zip import iter_zip_entries, extract_zip_entries, ZipEntryStream
 from ..job import Job, JobStatus
+from ..http_client import DEFAULT_CHUNK_SIZE
 import orthanc_api_client.exceptions as api_exceptions
 
 
@@ -93,18 +99,34 @@ class Resources:
 
         headers = {}
 
+        # an attachment can be modified: the cached content is revalidated with its revision (ETag)
+        content_cache = self._api_client.content_cache
+        cache_key = self._api_client.get_abs_url(f"{self._url_segment}/{orthanc_id}/attachments/{attachment_name}")
+        cached = content_cache.get_with_tag(cache_key) if content_cache is not None else None
+        if cached is not None and cached[1] is not None:
+            headers['If-None-Match'] = cached[1]
+
         response = self._api_client.get(
             endpoint=f"{self._url_segment}/{orthanc_id}/attachments/{attachment_name}/data",
             headers=headers
         )
 
-        return response.content, response.headers.get('etag')
+        if response.status_code == 304:
+            return cached[0], cached[1]
 
-    def download_attachment(self, orthanc_id: str, attachment_name: str, path: str):
-        content = self.get_attachment(orthanc_id, attachment_name)
+        if content_cache is not None and response.headers.get('etag') is not None:
+            content_cache.put(cache_key, response.content, tag=response.headers.get('etag'))
+        return response.content, response.headers.get('etag')
 
-        with open(path, 'wb') as f:
-            f.write(content)
+    def download_attachment(self, orthanc_id: str, attachment_name: str, path: Union[str, os.PathLike, BinaryIO], chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        streams the attachment to `path` (a file path or a writable binary file object)
+        """
+        self._api_client.download(
+            endpoint=f"{self._url_segment}/{orthanc_id}/attachments/{attachment_name}/data",
+            target=path,
+            chunk_size=chunk_size
+        )
 
     def set_binary_metadata(self, orthanc_id: str, metadata_name: str, content: Optional[bytes] = None, path: Optional[str] = None, match_revision: Optional[str] = None):
         # sets the metadata only if the current revision matches `match_revision`
@@ -213,7 +235,7 @@ class Resources:
             json=query)
 
         if r.status_code == 200:
-            anonymized_id = r.json()['ID']
+            anonymized_id = self._api_client.decode_json(r)['ID']
             if delete_original and anonymized_id != orthanc_id:
                 self.delete(orthanc_id)
 
@@ -251,7 +273,7 @@ class Resources:
             json=query)
 
         if r.status_code == 200:
-            modified_id = r.json()['ID']
+            modified_id = self._api_client.decode_json(r)['ID']
             if delete_original and modified_id != orthanc_id:
                 self.delete(orthanc_id)
 
@@ -377,8 +399,9 @@ class Resources:
             endpoint=f"/tools/bulk-{operation}",
             json=query)
 
-        if r.status_code == 200 and "ID" in r.json():
-            return Job(api_client=self._api_client, orthanc_id=r.json()['ID'])
+        answer = self._api_client.decode_json(r) if r.status_code == 200 else {}
+        if "ID" in answer:
+            return Job(api_client=self._api_client, orthanc_id=answer['ID'])
         else:
             raise HttpError(http_status_code=r.status_code, msg=f"Error in bulk-{operation}", url=r.url, request_response=r)
 
@@ -447,7 +470,7 @@ class Resources:
                 endpoint=f"tools/find",
                 json=payload)
 
-            print(f"{current_date} - " + str(len(r.json())))
+            print(f"{current_date} - " + str(len(self._api_client.decode_json(r))))
             current_date += datetime.timedelta(days=1)
 
     def _lookup(self, filter: str, dicom_id: str) -> Optional[str]:
@@ -528,12 +551,101 @@ class Resources:
         except ResourceNotFound:
             return False
 
-    def download_archive(self, orthanc_id: str, path: str):
-        file_content = self._api_client.get_binary(f"{self._url_segment}/{orthanc_id}/archive")
-        with open(path, 'wb') as f:
-            f.write(file_content)
+    def create_archive_async(self, orthanc_id: str) -> Job:
+        """
+        creates the zip archive of the resource in an asynchronous job.
+        Its output can be retrieved with api_client.jobs.download_archive once the job has completed.
+        """
+        r = self._api_client.post(f"{self._url_segment}/{orthanc_id}/archive", json={"Asynchronous": True})
+        return Job(api_client=self._api_client, orthanc_id=self._api_client.decode_json(r)['ID'])
+
+    def create_media_async(self, orthanc_id: str) -> Job:
+        """
+        creates the DICOMDIR media of the resource in an asynchronous job (see create_archive_async)
+        """
+        r = self._api_client.post(f"{self._url_segment}/{orthanc_id}/media", json={"Asynchronous": True})
+        return Job(api_client=self._api_client, orthanc_id=self._api_client.decode_json(r)['ID'])
+
+    def download_archive(self, orthanc_id: str, path: Union[str, os.PathLike, BinaryIO], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         asynchronous: bool = False, timeout: Optional[float] = None):
+        """
+        streams the zip archive of the resource to `path` (a file path or a writable binary file object)
 
-    def download_media(self, orthanc_id: str, path: str):
-        file_content = self._api_client.get_binary(f"{self._url_segment}/{orthanc_id}/media")
-        with open(path, 'wb') as f:
-            f.write(file_content)
+        with asynchronous=True, the archive is created in a job and retrieved once the job has completed: no HTTP request
+        is kept open while Orthanc builds the archive.  `timeout` is the maximum time to wait for the job.
+        """
+        if asynchronous:
+            job = self.create_archive_async(orthanc_id)
+            self._api_client.jobs.download_archive(job.orthanc_id, path, chunk_size=chunk_size, timeout=timeout)
+        else:
+            self._api_client.download(f"{self._url_segment}/{orthanc_id}/archive", target=path, chunk_size=chunk_size)
+
+    def download_media(self, orthanc_id: str, path: Union[str, os.PathLike, BinaryIO], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       asynchronous: bool = False, timeout: Optional[float] = None):
+        """
+        streams the DICOMDIR media of the resource to `path` (a file path or a writable binary file object)
+
+        with asynchronous=True, the media is created in a job (see download_archive)
+        """
+        if asynchronous:
+            job = self.create_media_async(orthanc_id)
+            self._api_client.jobs.download_archive(job.orthanc_id, path, chunk_size=chunk_size, timeout=timeout)
+        else:
+            self._api_client.download(f"{self._url_segment}/{orthanc_id}/media", target=path, chunk_size=chunk_size)
+
+    def iter_archive(self, orthanc_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[str, ZipEntryStream]]:
+        """
+        streams the zip archive of the resource and yields (path, stream) for each file of the archive while it is
+        received (the zip file is never stored).  Each stream must be consumed (e.g. with stream.read()) before
+        moving to the next file.
+        """
+        response = self._api_client.get(f"{self._url_segment}/{orthanc_id}/archive", stream=True)
+        with response:
+            yield from iter_zip_entries(response.iter_content(chunk_size=chunk_size), chunk_size=chunk_size)
+
+    def extract_archive(self, orthanc_id: str, target_folder: Union[str, os.PathLike], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[str]:
+        """
+        streams the zip archive of the resource and extracts its files to `target_folder` while it is received
+        (the zip file itself is never written to disk)
+
+        Returns:
+            the paths of the extracted files
+        """
+        return extract_zip_entries(self.iter_archive(orthanc_id, chunk_size=chunk_size), target_folder)
+
+    def _download_instances_dicom_web(self, endpoint: str, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[DownloadedInstance]:
+        """
+        downloads all the instances returned by a WADO-RS request (e.g. 'dicom-web/studies/{uid}') in a single multipart
+        response.  Each part is written to disk as it arrives and is named after the Orthanc id computed from its header.
+        """
+        response = self._api_client.get(endpoint, stream=True,
+                                        headers={'Accept': 'multipart/related; type="application/dicom"; transfer-syntax=*'})
+
+        downloaded_instances = []
+        with response:
+            boundary = get_multipart_boundary(response.headers.get('Content-Type', ''))
+            if boundary is None:
+                raise OrthancApiException(msg="The WADO-RS response is not a multipart response", url=endpoint)
+
+            try:
+                for headers, content in iter_multipart_parts(response.iter_content(chunk_size=chunk_size), boundary):
+                    tmp_path = os.path.join(path, f"{uuid.uuid4().hex}.part")
+                    try:
+                        with open(tmp_path, 'wb') as f:
+                            for chunk in content:
+                                f.write(chunk)
+
+                        instance_id = compute_orthanc_id_from_file(tmp_path)
+                        if instance_id is None:
+                            raise OrthancApiException(msg="A part of the WADO-RS response is not a DICOM instance", url=endpoint)
+                        instance_path = os.path.join(path, instance_id + ".dcm")
+                        os.replace(tmp_path, instance_path)
+                    except BaseException:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+                        raise
+                    downloaded_instances.append(DownloadedInstance(instance_id, instance_path))
+            except ValueError as e:
+                raise OrthancApiException(msg=f"Invalid WADO-RS response: {e}", url=endpoint)
+
+        return downloaded_instances
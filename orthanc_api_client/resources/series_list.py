@@ -5,6 +5,7 @@ from ..tags import Tags
 from typing import List, Any
 from ..downloaded_instance import DownloadedInstance
 from ..series import SeriesInfo, Series
+from ..http_client import DEFAULT_CHUNK_SIZE
 
 
 class SeriesList(Resources):
@@ -60,7 +61,18 @@ class SeriesList(Resources):
             parameters = {"returnUnsupportedImage": "true"}
         else:
             parameters = {}
-        return self._api_client.get_binary(endpoint=url, headers=headers, params=parameters, allow_redirects=True)
+
+        content_cache = self._api_client.content_cache
+        cache_key = f"{self._api_client.get_abs_url(url)}?accept={headers['Accept']}&unsupported={return_unsupported_image}"
+        if content_cache is not None:
+            content = content_cache.get(cache_key)
+            if content is not None:
+                return content
+
+        content = self._api_client.get_binary(endpoint=url, headers=headers, params=parameters, allow_redirects=True)
+        if content_cache is not None:
+            content_cache.put(cache_key, content)
+        return content
 
     def anonymize(self, orthanc_id: str, replace_tags={}, keep_tags=[], delete_original=True, force=False) -> str:
         return self._anonymize(
@@ -97,14 +109,34 @@ class SeriesList(Resources):
         """
         return self._lookup(filter='Series', dicom_id=dicom_id)
 
-    def download_instances(self, series_id, path) -> List[DownloadedInstance]:
+    def download_instances(self, series_id, path, max_workers: int = 1, ignore_errors: bool = False) -> List[DownloadedInstance]:
         """
         downloads all instances from the series to disk
         Args:
             series_id: the series id to download
             path: the directory path where to store the downloaded files
+            max_workers: the number of files downloaded in parallel
+            ignore_errors: if True: does not raise exceptions (see instances.download_instances)
+
+        Returns:
+            an array of DownloadedInstance
+        """
+        return self._api_client.instances.download_instances(self.get_instances_ids(series_id), path,
+                                                             max_workers=max_workers, ignore_errors=ignore_errors)
+
+    def download_instances_dicom_web(self, series_id: str, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[DownloadedInstance]:
+        """
+        downloads all instances from the series to disk through a single DICOMweb WADO-RS request (see
+        studies.download_instances_dicom_web)
+        Args:
+            series_id: the series id to download
+            path: the directory path where to store the downloaded files (named after their instance id)
+            chunk_size: the size of the chunks read from the response
 
         Returns:
             an array of DownloadedInstance
         """
-        return self._api_client.instances.download_instances(self.get_instances_ids(series_id), path)
+        series_json = self.get_json(series_id)
+        series_instance_uid = series_json['MainDicomTags']['SeriesInstanceUID']
+        study_instance_uid = self._api_client.studies.get_json(series_json['ParentStudy'])['MainDicomTags']['StudyInstanceUID']
+        return self._download_instances_dicom_web(f"dicom-web/studies/{study_instance_uid}/series/{series_instance_uid}", path, chunk_size=chunk_size)
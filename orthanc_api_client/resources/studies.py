@@ -9,6 +9,7 @@ from ..instance import Instance
 from ..helpers import to_dicom_date, to_dicom_time
 from ..downloaded_instance import DownloadedInstance
 from ..labels_constraint import LabelsConstraint
+from ..http_client import DEFAULT_CHUNK_SIZE
 
 class Studies(Resources):
 
@@ -29,14 +30,15 @@ class Studies(Resources):
     def get_instances(self, orthanc_id: str) -> List[Instance]:
         instances = []
 
-        instances_info = self._api_client.post(
+        r = self._api_client.post(
             f"tools/find",
             json={
                 "Level": "Instance",
                 "Query": {},
                 "ResponseContent": ["MainDicomTags", "Metadata", "Parent", "Labels"],
                 "ParentStudy": orthanc_id
-            }).json()
+            })
+        instances_info = self._api_client.decode_json(r)
         
         for instance_info in instances_info:
             instances.append(Instance.from_json(self._api_client, instance_info))
@@ -117,7 +119,7 @@ class Studies(Resources):
             json=payload)
 
         studies = []
-        for json_study in r.json():
+        for json_study in self._api_client.decode_json(r):
             studies.append(Study.from_json(self._api_client, json_study))
 
         return studies
@@ -197,14 +199,33 @@ class Studies(Resources):
 
         return pdf_ids
 
-    def download_instances(self, study_id: str, path: str) -> List['DownloadedInstance']:
+    def download_instances(self, study_id: str, path: str, max_workers: int = 1, ignore_errors: bool = False) -> List['DownloadedInstance']:
         """
         downloads all instances from the study to disk
         Args:
             study_id: the studyid to download
             path: the directory path where to store the downloaded files
+            max_workers: the number of files downloaded in parallel
+            ignore_errors: if True: does not raise exceptions (see instances.download_instances)
+
+        Returns:
+            an array of DownloadedInstance
+        """
+        return self._api_client.instances.download_instances(self.get_instances_ids(study_id), path,
+                                                             max_workers=max_workers, ignore_errors=ignore_errors)
+
+    def download_instances_dicom_web(self, study_id: str, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List['DownloadedInstance']:
+        """
+        downloads all instances from the study to disk through a single DICOMweb WADO-RS request (requires the
+        DICOMweb plugin).  The multipart response is parsed while it is received and each instance is written to disk
+        as soon as it arrives: the memory usage does not depend on the size of the study.
+        Args:
+            study_id: the studyid to download
+            path: the directory path where to store the downloaded files (named after their instance id)
+            chunk_size: the size of the chunks read from the response
 
         Returns:
             an array of DownloadedInstance
         """
-        return self._api_client.instances.download_instances(self.get_instances_ids(study_id), path)
+        study_instance_uid = self.get_json(study_id)['MainDicomTags']['StudyInstanceUID']
+        return self._download_instances_dicom_web(f"dicom-web/studies/{study_instance_uid}", path, chunk_size=chunk_size)
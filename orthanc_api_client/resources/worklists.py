@@ -19,7 +19,7 @@ class Worklists(Resources):
             endpoint=f"{self._url_segment}/create",
             json=payload
         )
-        return r.json()['ID']
+        return self._api_client.decode_json(r)['ID']
 
     def get(self, orthanc_id: str) -> Dict:
         r = self._api_client.get(f"{self._url_segment}/{orthanc_id}")
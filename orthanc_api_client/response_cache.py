@@ -0,0 +1,63 @@
+import collections
+import threading
+import time
+from typing import Optional
+
+import requests
+
+
+class ResponseCache:
+    """
+    An in-memory cache of the GET responses that Orthanc returns with an ETag.
+
+    - when a cached response exists for a GET request, the request is sent with an 'If-None-Match' header and,
+      if Orthanc answers '304 Not Modified', the cached response is returned: only the headers are transferred.
+    - the cache keeps at most `max_entries` responses (the least recently used ones are dropped first) and
+      each response is dropped `ttl` seconds after it has last been received or revalidated.
+    - `hits` counts the 304 answers served from the cache and `misses` the full responses received.
+
+    A cache must not be shared between clients that use different credentials.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> (expiration time, response)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[requests.Response]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expiration, response = entry
+            if expiration < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def put(self, key: str, response: requests.Response):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
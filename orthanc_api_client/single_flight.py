@@ -0,0 +1,55 @@
+import threading
+from typing import Callable, Any, Tuple, Dict
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight:
+    """
+    Shares the execution of identical concurrent calls: while a call with a given key is in flight, the other threads
+    that make a call with the same key wait for its result instead of executing it again.
+    Once the call has completed, the next call with the same key is executed again (nothing is cached).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.coalesced_count = 0
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Calls `func()` unless an identical call is already in flight.
+        Returns (result, shared) where `shared` is True if the result comes from a call made by another thread.
+        If the call raises, all the waiting threads raise the same exception.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced_count += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
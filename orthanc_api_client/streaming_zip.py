@@ -0,0 +1,262 @@
+import os
+import struct
+import uuid
+import zlib
+from typing import Iterable, Iterator, Tuple, List, Optional, Union
+
+from .exceptions import InvalidZipStream
+
+# Reads a zip file sequentially, as it is received, without the central directory located at the end of the file.
+# Orthanc streams its archives and writes the sizes and CRC of each entry in a "data descriptor" after its content
+# so the end of an entry is found by decompressing it (deflate) or by looking for its data descriptor (stored).
+
+_LOCAL_FILE_HEADER_SIGNATURE = b'PK\x03\x04'
+_DATA_DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+_CENTRAL_DIRECTORY_SIGNATURES = [b'PK\x01\x02', b'PK\x05\x06', b'PK\x06\x06', b'PK\x06\x07']
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_METHOD_STORED = 0
+_METHOD_DEFLATED = 8
+
+
+class _ChunksReader:
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self.buffer = bytearray()
+
+    def fill(self) -> bool:
+        for chunk in self._chunks:
+            if chunk:
+                self.buffer.extend(chunk)
+                return True
+        return False
+
+    def ensure(self, size: int) -> bool:
+        while len(self.buffer) < size:
+            if not self.fill():
+                return False
+        return True
+
+    def take(self, size: int) -> bytes:
+        if not self.ensure(size):
+            raise InvalidZipStream("Truncated zip stream")
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+class ZipEntryStream:
+    """
+    A read-only binary stream on the content of a zip entry.  It must be consumed before moving to the next entry.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._pending = b''
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._pending:
+            pending, self._pending = self._pending, b''
+            yield pending
+        yield from self._chunks
+
+    def read(self, size: int = -1) -> bytes:
+        parts = [self._pending]
+        length = len(self._pending)
+        while size is None or size < 0 or length < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            length += len(chunk)
+
+        data = b''.join(parts)
+        if size is None or size < 0:
+            self._pending = b''
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+
+def iter_zip_entries(chunks: Iterable[bytes], chunk_size: int = 1024 * 1024) -> Iterator[Tuple[str, ZipEntryStream]]:
+    """
+    Reads a zip file received as a sequence of chunks (e.g. `response.iter_content()`) and yields (name, stream)
+    for each file entry (the folder entries are skipped).  The CRC of each entry is checked once it has been read.
+    The memory usage is bounded by a few chunks, whatever the size of the zip file.
+    """
+    reader = _ChunksReader(chunks)
+
+    while True:
+        if not reader.ensure(4):
+            return  # no central directory but nothing is missing either
+        signature = bytes(reader.buffer[:4])
+        if signature in _CENTRAL_DIRECTORY_SIGNATURES:
+            return
+        if signature != _LOCAL_FILE_HEADER_SIGNATURE:
+            raise InvalidZipStream(f"Unexpected zip signature: {signature}")
+
+        (_, _, flags, method, _, _, crc, compressed_size, uncompressed_size,
+         name_length, extra_length) = struct.unpack('<4sHHHHHIIIHH', reader.take(30))
+        raw_name = reader.take(name_length)
+        extra = reader.take(extra_length)
+        name = raw_name.decode('utf-8' if flags & _FLAG_UTF8 else 'cp437')
+
+        zip64_sizes = _get_zip64_sizes(extra, uncompressed_size, compressed_size)
+        if zip64_sizes is not None:
+            uncompressed_size, compressed_size = zip64_sizes
+
+        if method not in [_METHOD_STORED, _METHOD_DEFLATED]:
+            raise InvalidZipStream(f"Unsupported compression method {method} for '{name}'")
+
+        has_data_descriptor = flags & _FLAG_DATA_DESCRIPTOR
+        content = _iter_entry_content(reader, name, method, crc, compressed_size, has_data_descriptor,
+                                      zip64_sizes is not None, chunk_size)
+
+        if name.endswith('/'):
+            for _ in content:
+                pass
+            continue
+
+        yield name, ZipEntryStream(content)
+        for _ in content:  # skip what has not been consumed
+            pass
+
+
+def get_safe_extraction_path(target_folder: str, name: str) -> str:
+    """
+    Returns the path where an entry of a zip file must be extracted.  Raises if the entry name would be
+    extracted outside of target_folder (absolute path, '..', drive letter, ...).
+    """
+    parts = [p for p in name.replace('\\', '/').split('/') if p not in ['', '.']]
+    if len(parts) == 0 or name.startswith(('/', '\\')) or any([p == '..' or ':' in p for p in parts]):
+        raise InvalidZipStream(f"Unsafe path in zip stream: '{name}'")
+    return os.path.join(target_folder, *parts)
+
+
+def extract_zip_entries(entries: Iterable[Tuple[str, ZipEntryStream]], target_folder: Union[str, os.PathLike]) -> List[str]:
+    """
+    Writes the entries yielded by iter_zip_entries to target_folder.  Each file is written to a temporary file that
+    is renamed once complete.  Returns the paths of the extracted files.
+    """
+    target_folder = os.fspath(target_folder)
+    extracted_paths = []
+
+    for name, stream in entries:
+        path = get_safe_extraction_path(target_folder, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp_path, 'xb') as f:
+                for chunk in stream:
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        extracted_paths.append(path)
+
+    return extracted_paths
+
+
+def _get_zip64_sizes(extra: bytes, uncompressed_size: int, compressed_size: int) -> Optional[Tuple[int, int]]:
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, data_size = struct.unpack('<HH', extra[offset:offset + 4])
+        if header_id == 0x0001:
+            data = extra[offset + 4:offset + 4 + data_size]
+            values = list(struct.unpack(f'<{len(data) // 8}Q', data[:len(data) // 8 * 8]))
+            if uncompressed_size == 0xFFFFFFFF and len(values) > 0:
+                uncompressed_size = values.pop(0)
+            if compressed_size == 0xFFFFFFFF and len(values) > 0:
+                compressed_size = values.pop(0)
+            return uncompressed_size, compressed_size
+        offset += 4 + data_size
+    return None
+
+
+def _iter_entry_content(reader: _ChunksReader, name: str, method: int, crc: int, compressed_size: int,
+                        has_data_descriptor: bool, is_zip64: bool, chunk_size: int) -> Iterator[bytes]:
+    computed_crc = 0
+
+    if method == _METHOD_DEFLATED:
+        # the deflate stream knows where it ends, whether its size is known or not
+        decompressor = zlib.decompressobj(-15)
+        while not decompressor.eof:
+            if decompressor.unconsumed_tail:
+                data = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+            elif len(reader.buffer) > 0:
+                data = decompressor.decompress(bytes(reader.buffer), chunk_size)
+                reader.buffer.clear()
+            else:
+                data = decompressor.decompress(b'', chunk_size)  # output that did not fit in the previous call
+                if not data and not decompressor.eof and not reader.fill():
+                    raise InvalidZipStream(f"Truncated zip stream in '{name}'")
+            if data:
+                computed_crc = zlib.crc32(data, computed_crc)
+                yield data
+        reader.buffer[0:0] = decompressor.unused_data
+
+    elif not has_data_descriptor:
+        remaining = compressed_size
+        while remaining > 0:
+            if len(reader.buffer) == 0 and not reader.fill():
+                raise InvalidZipStream(f"Truncated zip stream in '{name}'")
+            data = reader.take(min(remaining, len(reader.buffer), chunk_size))
+            remaining -= len(data)
+            computed_crc = zlib.crc32(data, computed_crc)
+            yield data
+
+    else:
+        # stored entry of unknown size: it ends with the first data descriptor whose CRC and size match the content
+        size = 0
+        search_from = 0
+        while True:
+            position = reader.buffer.find(_DATA_DESCRIPTOR_SIGNATURE, search_from)
+            if position >= 0:
+                if not reader.ensure(position + 12):
+                    raise InvalidZipStream(f"Truncated zip stream in '{name}'")
+                descriptor_crc, descriptor_size = struct.unpack('<II', reader.buffer[position + 4:position + 12])
+                candidate_crc = zlib.crc32(reader.buffer[:position], computed_crc)
+                if candidate_crc == descriptor_crc and (size + position) & 0xFFFFFFFF == descriptor_size:
+                    if position > 0:
+                        data = reader.take(position)
+                        computed_crc = candidate_crc
+                        yield data
+                    break
+                search_from = position + 1
+                continue
+
+            # keep the last bytes that might be the beginning of the signature
+            available = len(reader.buffer) - (len(_DATA_DESCRIPTOR_SIGNATURE) - 1)
+            if available > 0:
+                data = reader.take(available)
+                size += len(data)
+                computed_crc = zlib.crc32(data, computed_crc)
+                search_from = 0
+                yield data
+            if not reader.fill():
+                raise InvalidZipStream(f"Truncated zip stream in '{name}'")
+
+    if has_data_descriptor:
+        crc = _read_data_descriptor(reader, is_zip64)
+
+    if crc != computed_crc:
+        raise InvalidZipStream(f"CRC mismatch in '{name}'")
+
+
+def _read_data_descriptor(reader: _ChunksReader, is_zip64: bool) -> int:
+    reader.ensure(4)
+    if bytes(reader.buffer[:4]) == _DATA_DESCRIPTOR_SIGNATURE:
+        reader.take(4)
+    crc, = struct.unpack('<I', reader.take(4))
+
+    # the sizes are stored on 4 or 8 bytes; when not announced by a zip64 extra field, look for the next signature
+    sizes_length = 16 if is_zip64 else 8
+    if not is_zip64 and reader.ensure(18) and bytes(reader.buffer[8:10]) != b'PK' and bytes(reader.buffer[16:18]) == b'PK':
+        sizes_length = 16
+    reader.take(sizes_length)
+    return crc
@@ -36,10 +36,11 @@ class Transfers:
                 "Compression": "gzip" if compress else "none",
                 "Peer": target_peer
             })
-        if r.status_code == 200 and "RemoteJob" in r.json():
-            return RemoteJob(remote_job_id=r.json()["RemoteJob"], remote_url=r.json()["URL"])
-        elif r.status_code == 200 and "ID" in r.json():
-            return Job(api_client=self._api_client, orthanc_id=r.json()['ID'])
+        answer = self._api_client.decode_json(r) if r.status_code == 200 else {}
+        if "RemoteJob" in answer:
+            return RemoteJob(remote_job_id=answer["RemoteJob"], remote_url=answer["URL"])
+        elif "ID" in answer:
+            return Job(api_client=self._api_client, orthanc_id=answer['ID'])
         else:
             raise HttpError(http_status_code=r.status_code, msg="Error while sending through transfers plugin", url=r.url, request_response=r)
 
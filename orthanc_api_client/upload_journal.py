@@ -0,0 +1,96 @@
+import os
+import threading
+from typing import List, Optional, Dict, Tuple
+
+
+class UploadJournal:
+    """
+    An append-only file that records the files that have been uploaded to Orthanc such that a long folder import
+    can be resumed after a crash without uploading the same files again.
+
+    - a file is identified by its absolute path, its size and its modification time: a file that has been modified
+      since it was uploaded is uploaded again.
+    - each entry is a single line: `size<TAB>mtime_ns<TAB>instance_id/study_id,...<TAB>path`.
+    - each entry is flushed to disk (fsync) as soon as it is recorded.  If the process crashes while writing an entry,
+      this incomplete last line is ignored (and removed) when the journal is reopened.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[int, int, List[dict]]] = {}
+
+        self._load()
+        self._file = open(self._path, 'ab')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        self._file.close()
+
+    def get(self, file_path: str) -> Optional[List[dict]]:
+        """
+        Returns the upload answers ([{'ID': ..., 'ParentStudy': ...}]) recorded for this file
+        or None if the file has not been uploaded yet (or if it has been modified since it was uploaded).
+        """
+        entry = self._entries.get(os.path.abspath(file_path))
+        if entry is None:
+            return None
+
+        stat = os.stat(file_path)
+        size, mtime_ns, answers = entry
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            return None
+        return answers
+
+    def record(self, file_path: str, answers: List[dict]):
+        """
+        Records that a file has been uploaded.  `answers` are the Orthanc answers to the upload
+        (only their 'ID' and 'ParentStudy' fields are kept).
+        """
+        abs_path = os.path.abspath(file_path)
+        if '\n' in abs_path:
+            return  # can not be stored in a line-based journal, the file will simply be uploaded again
+
+        stat = os.stat(file_path)
+        answers = [{'ID': a['ID'], 'ParentStudy': a.get('ParentStudy')} for a in answers]
+        ids = ','.join(f"{a['ID']}/{a['ParentStudy'] or ''}" for a in answers)
+        line = f"{stat.st_size}\t{stat.st_mtime_ns}\t{ids}\t".encode('utf-8') + os.fsencode(abs_path) + b'\n'
+
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._entries[abs_path] = (stat.st_size, stat.st_mtime_ns, answers)
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return
+
+        with open(self._path, 'rb') as f:
+            content = f.read()
+
+        complete_length = content.rfind(b'\n') + 1
+        if complete_length < len(content):
+            # the last entry has been interrupted by a crash: drop it
+            with open(self._path, 'r+b') as f:
+                f.truncate(complete_length)
+
+        for line in content[:complete_length].splitlines():
+            try:
+                size, mtime_ns, ids, path = line.split(b'\t', 3)
+                answers = []
+                for id_pair in ids.decode('ascii').split(','):
+                    if id_pair:
+                        instance_id, study_id = id_pair.split('/')
+                        answers.append({'ID': instance_id, 'ParentStudy': study_id or None})
+                self._entries[os.fsdecode(path)] = (int(size), int(mtime_ns), answers)
+            except ValueError:
+                continue  # a corrupted entry: the file will be uploaded again
@@ -114,7 +114,7 @@ setup(
     #
     #   py_modules=["my_module"],
     #
-    packages=["orthanc_api_client", "orthanc_api_client.resources"],  # Required
+    packages=["orthanc_api_client", "orthanc_api_client.resources", "orthanc_api_client.aio"],  # Required
     # packages=find_namespace_packages(
     #     where='orthanc_api_client'
     # ),
@@ -148,7 +148,9 @@ setup(
     # projects.
     extras_require={  # Optional
         'dev': ['check-manifest', 'pytest'],
-        'test': ['coverage', 'pytest'],
+        'test': ['coverage', 'pytest', 'httpx'],
+        'async': ['httpx>=0.23.0'],
+        'fast-json': ['orjson>=3.6.0'],
     },
 
 
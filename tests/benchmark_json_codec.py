@@ -0,0 +1,88 @@
+import gc
+import json
+import sys
+import time
+import pathlib
+
+import requests
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from orthanc_api_client.json_codec import JsonCodec, OrjsonCodec, MsgspecCodec
+
+# Compares the JSON codecs on a 'tools/find' response with 'Expand': true, as returned by Orthanc for 100k studies.
+# Usage: python tests/benchmark_json_codec.py [studies_count]
+
+
+def generate_find_response(studies_count: int) -> bytes:
+    studies = []
+    for i in range(studies_count):
+        studies.append({
+            "ID": f"{i:08x}-844d5aee-85245eba-28e841e6-2414fae2",
+            "IsStable": True,
+            "Labels": ["TO-REVIEW"],
+            "LastUpdate": "20240101T120000",
+            "MainDicomTags": {
+                "AccessionNumber": f"ACC{i}",
+                "InstitutionName": "Orthanc Hospital",
+                "ReferringPhysicianName": "Doe^John",
+                "StudyDate": "20240101",
+                "StudyDescription": "CT Abdomen with contrast",
+                "StudyID": str(i),
+                "StudyInstanceUID": f"1.2.840.113619.2.55.3.604688119.969.1268071029.{i}",
+                "StudyTime": "120000"
+            },
+            "ParentPatient": f"{i:08x}-85245eba-844d5aee-2414fae2-28e841e6",
+            "PatientMainDicomTags": {
+                "PatientBirthDate": "19700101",
+                "PatientID": f"PAT{i}",
+                "PatientName": f"Patient^{i}",
+                "PatientSex": "O"
+            },
+            "Series": [f"{i:08x}-{s:08x}-85245eba-28e841e6-2414fae2" for s in range(3)],
+            "Type": "Study"
+        })
+    return json.dumps(studies).encode('utf-8')
+
+
+def measure(func, repeat: int = 3) -> float:
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()  # like timeit: the garbage collector would dominate the allocation of millions of objects
+        try:
+            start = time.perf_counter()
+            func()
+            duration = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+if __name__ == '__main__':
+    studies_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data = generate_find_response(studies_count)
+    print(f"find response with {studies_count} studies: {len(data) / (1024 * 1024):.1f} MB")
+
+    # the previous implementation: requests.Response.json() decodes the bytes to a str before parsing it
+    response = requests.models.Response()
+    response._content = data
+    print(f"{'requests':>8}: decode {measure(lambda: response.json()) * 1000:8.1f} ms")
+
+    reference = None
+    for codec_class in [JsonCodec, OrjsonCodec, MsgspecCodec]:
+        try:
+            codec = codec_class()
+        except ImportError:
+            print(f"{codec_class.name:>8}: not installed")
+            continue
+
+        decoded = codec.loads(data)
+        if reference is None:
+            reference = decoded
+        assert decoded == reference
+
+        decode_duration = measure(lambda: codec.loads(data))
+        encode_duration = measure(lambda: codec.dumps(reference))
+        print(f"{codec.name:>8}: decode {decode_duration * 1000:8.1f} ms   encode {encode_duration * 1000:8.1f} ms")
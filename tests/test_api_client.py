@@ -5,7 +5,7 @@ import logging
 import datetime
 import uuid
 
-from orthanc_api_client import OrthancApiClient, generate_test_dicom_file, ChangeType, ResourceType, Study, Job, JobStatus, JobType, InstancesSet, LabelsConstraint, LogLevel, RemoteJob, RetrieveMethod, EducationPluginHeaderProvider
+from orthanc_api_client import OrthancApiClient, generate_test_dicom_file, ChangeType, ResourceType, Study, Job, JobStatus, JobType, InstancesSet, LabelsConstraint, LogLevel, RemoteJob, RetrieveMethod, EducationPluginHeaderProvider, ContentCache, ResponseCache, HttpMetricsCollector, RequestProfiler, ClusterOrthancApiClient, AdaptiveConcurrencyLimiter, CircuitBreaker, CircuitState
 from orthanc_api_client.helpers import *
 import orthanc_api_client.exceptions as api_exceptions
 import pathlib
@@ -13,6 +13,9 @@ import asyncio
 import tempfile
 import shutil
 import os
+import io
+import mmap
+import zipfile
 import concurrent.futures
 
 from orthanc_api_client.resources.education_images import Dicomizationtatus
@@ -242,6 +245,25 @@ class TestApiClient(unittest.TestCase):
 
         self.assertEqual('f689ddd2-662f8fe1-8b18180d-ec2a2cee-937917af', instances_ids[0])
 
+    def test_upload_streams(self):
+        self.oa.delete_all_content()
+
+        # file object
+        with open(here / "stimuli/CT_small.dcm", 'rb') as f:
+            instances_ids = self.oa.upload(f)
+        self.assertEqual('f689ddd2-662f8fe1-8b18180d-ec2a2cee-937917af', instances_ids[0])
+
+        # memory-mapped file
+        with open(here / "stimuli/CT_small.zip", 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                instances_ids = self.oa.upload(m)
+        self.assertEqual('f689ddd2-662f8fe1-8b18180d-ec2a2cee-937917af', instances_ids[0])
+
+        # invalid file object
+        with open(here / "__init__.py", 'rb') as f:
+            with self.assertRaises(api_exceptions.BadFileFormat):
+                self.oa.upload(f)
+
     def test_upload_folder(self):
         self.oa.delete_all_content()
         instances_ids = self.oa.upload_folder(here / "stimuli", skip_extensions=['.zip', '.pdf', '.png', '.jpeg'])
@@ -255,6 +277,81 @@ class TestApiClient(unittest.TestCase):
 
         self.assertLessEqual(1, len(instances_ids))
 
+    def test_upload_folder_ignore_errors_unreachable_orthanc(self):
+        o = OrthancApiClient('http://localhost:10999', user='test', pwd='test')
+
+        # ignore_errors only skips the files rejected by Orthanc, not the transport errors
+        with self.assertRaises(api_exceptions.ConnectionError):
+            o.upload_folder(here / "stimuli/MR/Brain/1", ignore_errors=True)
+
+        with self.assertRaises(api_exceptions.ConnectionError):
+            o.upload_folder(here / "stimuli/MR/Brain/1", ignore_errors=True, max_workers=4, batch_max_files=10)
+
+    def test_upload_folder_parallel(self):
+        self.oa.delete_all_content()
+
+        progress = []
+        instances_ids = self.oa.upload_folder(here, skip_extensions=['.zip'], ignore_errors=True, max_workers=4,
+                                              progress_callback=lambda path, ids, error: progress.append((path, ids, error)))
+
+        self.assertEqual(len(instances_ids), len(set(self.oa.instances.get_all_ids())))
+        self.assertEqual(len(instances_ids), sum([len(ids) for path, ids, error in progress]))
+        self.assertTrue(any([str(path).endswith('__init__.py') and len(ids) == 0 for path, ids, error in progress]))
+
+        with self.assertRaises(api_exceptions.BadFileFormat):
+            self.oa.upload_folder(here, skip_extensions=['.zip'], max_workers=4)  # here contains __init__.py which is invalid
+
+    def test_upload_folder_skip_existing(self):
+        self.oa.delete_all_content()
+
+        instances_ids = self.oa.upload_folder(here / "stimuli", skip_extensions=['.zip'], ignore_errors=True)
+        self.assertLessEqual(1, len(instances_ids))
+
+        # delete one instance: it is the only one that must be uploaded again
+        self.oa.instances.delete(orthanc_id=instances_ids[0])
+        self.assertEqual({}, self.oa.instances.find_ids_by_sop_instance_uids(['1.2.3.4.5.6.7']))
+
+        reuploaded_ids = self.oa.upload_folder(here / "stimuli", skip_extensions=['.zip'], ignore_errors=True, skip_existing=True)
+        self.assertEqual(set(instances_ids), set(reuploaded_ids))
+        self.assertEqual(len(set(instances_ids)), len(self.oa.instances.get_all_ids()))
+
+    def test_upload_folder_journal(self):
+        self.oa.delete_all_content()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            journal_path = os.path.join(tmp_dir, 'upload.journal')
+            instances_ids = self.oa.upload_folder(here / "stimuli", skip_extensions=['.zip'], ignore_errors=True, journal_path=journal_path)
+
+            # simulate a crash while writing an entry
+            with open(journal_path, 'ab') as f:
+                f.write(b'1234\t5678\tabc')
+
+            # nothing is uploaded again: the instances deleted in the meantime are not restored
+            self.oa.delete_all_content()
+            resumed_ids = self.oa.upload_folder(here / "stimuli", skip_extensions=['.zip'], ignore_errors=True, journal_path=journal_path)
+            self.assertEqual(set(instances_ids), set(resumed_ids))
+            self.assertEqual(0, len(self.oa.instances.get_all_ids()))
+
+            dicom_ids_set, orthanc_ids_set, rejected_files_list = self.oa.upload_folder_return_details(here / "stimuli", journal_path=journal_path)
+            # the studies of the journaled files are reported although they have not been uploaded again
+            self.assertLessEqual(1, len(orthanc_ids_set))
+
+    def test_upload_folder_zip_batches(self):
+        self.oa.delete_all_content()
+
+        progress = []
+        instances_ids = self.oa.upload_folder(here / "stimuli", skip_extensions=['.zip'], ignore_errors=True, max_workers=2,
+                                              batch_max_files=3, batch_max_bytes=10*1024*1024,
+                                              progress_callback=lambda path, ids, error: progress.append((path, ids, error)))
+
+        self.assertEqual(set(instances_ids), set(self.oa.instances.get_all_ids()))
+
+        # each file is mapped to the instance computed from its own header
+        for path, ids, error in progress:
+            if len(ids) == 1:
+                tags = self.oa.instances.get_tags(ids[0])
+                self.assertEqual(ids[0], compute_orthanc_id(tags.get('PatientID'), tags.get('StudyInstanceUID'), tags.get('SeriesInstanceUID'), tags.get('SOPInstanceUID')))
+
     def test_upload_folder_return_details(self):
         self.oa.delete_all_content()
         dicom_ids_set, orthanc_ids_set, rejected_files_list = self.oa.upload_folder_return_details(here / "stimuli")
@@ -273,6 +370,15 @@ class TestApiClient(unittest.TestCase):
         self.assertEqual(0, len(self.oa.studies.get_all_ids()))
         self.assertEqual(4, len(rejected_files_list))
 
+    def test_upload_folder_return_details_parallel(self):
+        self.oa.delete_all_content()
+        dicom_ids_set, orthanc_ids_set, rejected_files_list = self.oa.upload_folder_return_details(here / "stimuli", unzip_before_upload=True, max_workers=4)
+
+        self.assertLessEqual(4, len(dicom_ids_set))
+        self.assertEqual(set(self.oa.studies.get_all_ids()), orthanc_ids_set)
+        self.assertIn('1.3.6.1.4.1.5962.1.2.1.20040119072730.12322', dicom_ids_set)
+        self.assertEqual(4, len(rejected_files_list))
+
     def test_upload_folder_return_details_error_case(self):
         # Let's make orthanc unresponsive
         with open(here / "docker-setup/inhibit.lua", 'rb') as f:
@@ -296,6 +402,15 @@ class TestApiClient(unittest.TestCase):
         self.assertEqual(1, len(self.oa.studies.get_all_ids()))
 
 
+    def test_upload_files_dicom_web_batches(self):
+        self.oa.delete_all_content()
+
+        paths = [here / "stimuli/MR/Brain/1/IM0", here / "stimuli/MR/Brain/1/IM1", here / "stimuli/CT_small.dcm"]
+        answer = self.oa.upload_files_dicom_web(paths, batch_max_bytes=1, max_workers=2)  # one file per request
+
+        self.assertEqual(3, len(answer['00081199']['Value']))
+        self.assertEqual(3, len(self.oa.instances.get_all_ids()))
+
     def test_upload_file_dicom_web_study_level(self):
         self.oa.delete_all_content()
 
@@ -756,6 +871,254 @@ class TestApiClient(unittest.TestCase):
 
         self.assertEqual(updated_content, content_readback)
 
+    def test_content_cache(self):
+        self.oa.delete_all_content()
+
+        instances_ids = self.oa.upload_file(here / "stimuli/CT_small.dcm")
+        series_id = self.oa.instances.get_parent_series_id(instances_ids[0])
+        self.oa.instances.set_attachment(orthanc_id=instances_ids[0], attachment_name=1025, content=b'123', content_type='application/octet-stream')
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            cache = ContentCache(tempDir, max_size=10*1024*1024)
+            o = OrthancApiClient('http://localhost:10042', user='test', pwd='test', content_cache=cache)
+
+            file_content = o.instances.get_file(instances_ids[0])
+            self.assertEqual(file_content, o.instances.get_file(instances_ids[0]))
+            preview = o.series.get_preview_file(series_id)
+            self.assertEqual(preview, o.series.get_preview_file(series_id))
+            self.assertEqual(2, cache.hits)
+            self.assertEqual(2, cache.misses)
+
+            # a modified attachment is not served from the cache
+            self.assertEqual(b'123', o.instances.get_attachment(instances_ids[0], 1025))
+            self.assertEqual(b'123', o.instances.get_attachment(instances_ids[0], 1025))
+            self.oa.instances.set_attachment(orthanc_id=instances_ids[0], attachment_name=1025, content=b'456', content_type='application/octet-stream')
+            self.assertEqual(b'456', o.instances.get_attachment(instances_ids[0], 1025))
+
+            # a cache shared with a client of another Orthanc does not serve it the contents of the first one
+            self.ob.delete_all_content()
+            ob = OrthancApiClient('http://localhost:10043', user='test', pwd='test', content_cache=cache)
+            with self.assertRaises(api_exceptions.ResourceNotFound):
+                ob.instances.get_file(instances_ids[0])
+
+            cache.clear()
+            self.assertEqual(0, cache.get_size())
+            self.assertEqual(file_content, o.instances.get_file(instances_ids[0]))
+
+    def test_response_cache(self):
+        self.oa.delete_all_content()
+
+        instances_ids = self.oa.upload_file(here / "stimuli/CT_small.dcm")
+        self.oa.instances.set_string_metadata(instances_ids[0], metadata_name='1024', content='first')
+
+        cache = ResponseCache(max_entries=10)
+        o = OrthancApiClient('http://localhost:10042', user='test', pwd='test', response_cache=cache)
+
+        self.assertEqual('first', o.instances.get_string_metadata(instances_ids[0], metadata_name='1024'))
+        self.assertEqual('first', o.instances.get_string_metadata(instances_ids[0], metadata_name='1024'))
+        self.assertEqual(1, cache.hits)
+
+        # a modified metadata is not served from the cache
+        self.oa.instances.set_string_metadata(instances_ids[0], metadata_name='1024', content='second')
+        self.assertEqual('second', o.instances.get_string_metadata(instances_ids[0], metadata_name='1024'))
+        self.assertEqual(1, cache.hits)
+
+    def test_coalesce_requests(self):
+        self.oa.delete_all_content()
+
+        instances_ids = self.oa.upload_file(here / "stimuli/CT_small.dcm")
+        study_id = self.oa.instances.get_parent_study_id(instances_ids[0])
+
+        o = OrthancApiClient('http://localhost:10042', user='test', pwd='test', coalesce_requests=True)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+            studies_json = list(executor.map(lambda i: o.studies.get_json(study_id), range(50)))
+
+        self.assertTrue(all([s == studies_json[0] for s in studies_json]))
+        self.assertEqual(study_id, studies_json[0]['ID'])
+
+        with self.assertRaises(api_exceptions.ResourceNotFound):
+            o.studies.get_json('not-a-study-id')
+
+    def test_metrics_collector(self):
+        self.oa.delete_all_content()
+
+        instances_ids = self.oa.upload_folder(here / 'stimuli/MR/Brain/1')
+
+        o = OrthancApiClient('http://localhost:10042', user='test', pwd='test')
+        metrics = HttpMetricsCollector()
+        o.add_request_hook(metrics)
+
+        for instance_id in instances_ids:
+            o.instances.get_tags(instance_id)
+        with self.assertRaises(api_exceptions.ResourceNotFound):
+            o.studies.get_json('not-a-study-id')
+
+        stats = metrics.get_stats()
+        self.assertEqual(len(instances_ids), stats['GET instances/{id}/tags'].count)
+        self.assertEqual(0, stats['GET instances/{id}/tags'].errors_count)
+        self.assertLess(0, stats['GET instances/{id}/tags'].response_bytes)
+        self.assertEqual({404: 1}, stats['GET studies/not-a-study-id'].status_codes)
+        self.assertIn('GET instances/{id}/tags', metrics.report())
+
+        o.remove_request_hook(metrics)
+        o.instances.get_tags(instances_ids[0])
+        self.assertEqual(len(instances_ids), metrics.get_stats()['GET instances/{id}/tags'].count)
+
+    def test_request_profiler(self):
+        self.oa.delete_all_content()
+
+        # 1 request per file + 1 request per study
+        with RequestProfiler(self.oa, max_requests=3) as profiler:
+            self.oa.upload_folder_return_details(here / 'stimuli/MR/Brain/1')
+        self.assertEqual(['OrthancApiClient.upload_folder_return_details'], list(profiler.get_requests_by_operation().keys()))
+
+        study_id = self.oa.studies.get_all_ids()[0]
+        with self.assertRaises(api_exceptions.RequestBudgetExceeded):
+            with RequestProfiler(self.oa, max_requests=1):
+                for series in Study(api_client=self.oa, orthanc_id=study_id).series:
+                    series.instances
+
+    def test_compression_metrics(self):
+        self.oa.delete_all_content()
+        self.oa.upload_folder(here / 'stimuli/MR/Brain/1')
+
+        o = OrthancApiClient('http://localhost:10042', user='test', pwd='test', compress_requests_min_size=1024*1024)
+        metrics = HttpMetricsCollector()
+        o.add_request_hook(metrics)
+
+        changes, seq, done = o.get_changes()
+        self.assertLess(0, len(changes))
+        o.studies.find(query={'PatientID': '*'})  # below the threshold: not compressed
+
+        stats = metrics.get_stats()
+        self.assertEqual(stats['POST tools/find'].request_bytes, stats['POST tools/find'].request_uncompressed_bytes)
+        self.assertLessEqual(1.0, stats['GET changes'].compression_ratio)
+        self.assertLessEqual(1.0, metrics.get_compression_ratio())
+
+    def test_cluster_client(self):
+        self.oa.delete_all_content()
+
+        # 2 urls of the same Orthanc to simulate 2 nodes sharing the same index
+        cluster = ClusterOrthancApiClient(['http://localhost:10042', 'http://127.0.0.1:10042'], user='test', pwd='test')
+        instances_ids = cluster.upload_folder(here / 'stimuli/MR/Brain/1')
+        self.assertEqual(len(instances_ids), cluster.nodes[0].requests_count)  # the uploads are sent to the primary
+        self.assertEqual(0, cluster.nodes[1].requests_count)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            files = list(executor.map(lambda i: cluster.instances.get_file(instances_ids[i % 2]), range(20)))
+        self.assertEqual(20, len(files))
+        self.assertLess(0, cluster.nodes[1].requests_count)  # the reads are spread
+        self.assertTrue(all([n['IsHealthy'] for n in cluster.get_nodes_stats()]))
+
+    def test_cluster_client_unhealthy_node(self):
+        self.oa.delete_all_content()
+
+        # the second node can not be reached and stays down
+        cluster = ClusterOrthancApiClient(['http://localhost:10042', 'http://localhost:10999'], user='test', pwd='test',
+                                          failover=False, unhealthy_retry_delay=0.5)
+
+        def count_errors():
+            errors_count = 0
+            for i in range(10):
+                try:
+                    cluster.get_system()
+                except api_exceptions.ConnectionError:
+                    errors_count += 1
+            return errors_count
+
+        self.assertEqual(1, count_errors())
+        self.assertFalse(cluster.nodes[1].is_healthy)
+
+        # after the delay, a single trial request is sent to the node per retry window
+        time.sleep(0.6)
+        self.assertEqual(1, count_errors())
+        time.sleep(0.6)
+        self.assertEqual(1, count_errors())
+
+    def test_cluster_client_health_prober(self):
+        self.oa.delete_all_content()
+
+        cluster = ClusterOrthancApiClient(['http://localhost:10042', 'http://localhost:10999'], user='test', pwd='test',
+                                          failover=False, unhealthy_retry_delay=0.5, health_check_interval=0.1)
+        try:
+            # the node marked down by the prober stays excluded from the reads past the retry delay
+            time.sleep(1.2)
+            self.assertFalse(cluster.nodes[1].is_healthy)
+            for i in range(10):
+                cluster.get_system()
+            self.assertEqual(0, cluster.nodes[1].requests_count)
+        finally:
+            cluster.close()
+
+    def test_cluster_client_failover(self):
+        self.oa.delete_all_content()
+
+        # the primary can not be reached
+        cluster = ClusterOrthancApiClient(['http://localhost:10999', 'http://localhost:10042'], user='test', pwd='test',
+                                          health_check_interval=0.2)
+        try:
+            time.sleep(1)
+            self.assertFalse(cluster.primary_node.is_healthy)
+            self.assertEqual('http://localhost:10042', cluster.write_node.root_url)
+
+            instances_ids = cluster.upload_file(here / "stimuli/CT_small.dcm")
+            self.assertEqual(instances_ids, cluster.instances.get_all_ids())
+        finally:
+            cluster.close()
+
+    def test_concurrency_limiter(self):
+        self.oa.delete_all_content()
+
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4)
+        o1 = OrthancApiClient('http://localhost:10042', user='test', pwd='test', concurrency_limiter=limiter)
+        o2 = OrthancApiClient('http://localhost:10042', user='test', pwd='test', concurrency_limiter=limiter)
+
+        instances_ids = o1.upload_folder(here / 'stimuli/MR/Brain', max_workers=8)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            tags = list(executor.map(lambda i: (o1 if i % 2 else o2).instances.get_tags(instances_ids[i]), range(len(instances_ids))))
+
+        self.assertEqual(len(instances_ids), len(tags))
+        self.assertEqual(0, limiter.in_flight)
+        self.assertTrue(1 <= limiter.limit <= 4)
+        self.assertLess(0, limiter.waits_count)  # the threads have been throttled
+
+    def test_circuit_breaker(self):
+        self.oa.delete_all_content()
+        self.ob.delete_all_content()
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=2)
+        o = OrthancApiClient('http://localhost:10042', user='test', pwd='test', circuit_breaker=breaker)
+        metrics = HttpMetricsCollector()
+        o.add_request_hook(metrics)
+
+        o.modalities.configure('unreachable', {'AET': 'UNREACHABLE', 'Host': 'localhost', 'Port': 1})
+        try:
+            instances_ids = o.upload_file(here / "stimuli/CT_small.dcm")
+            study_id = o.instances.get_parent_study_id(instances_ids[0])
+
+            for i in range(2):
+                with self.assertRaises(api_exceptions.HttpError):
+                    o.modalities.send('unreachable', study_id)
+            self.assertEqual(CircuitState.OPEN, breaker.get_state('modalities/unreachable'))
+
+            # fails fast
+            with self.assertRaises(api_exceptions.CircuitOpen):
+                o.modalities.send('unreachable', study_id)
+            self.assertEqual(1, metrics.get_stats()['POST modalities/{alias}/store'].rejected_count)
+            self.assertEqual(1, breaker.get_stats()['modalities/unreachable']['RejectedCount'])
+
+            # the other remotes are not affected
+            o.modalities.send('orthanc-b', study_id)
+            self.assertIsNotNone(self.ob.studies.lookup('1.3.6.1.4.1.5962.1.2.1.20040119072730.12322'))
+
+            # after the cool-down, a trial request is sent
+            time.sleep(2)
+            with self.assertRaises(api_exceptions.HttpError):
+                o.modalities.send('unreachable', study_id)
+            self.assertEqual(CircuitState.OPEN, breaker.get_state('modalities/unreachable'))
+        finally:
+            o.modalities.delete('unreachable')
+
     def test_metadata_with_revision(self):
         self.oa.delete_all_content()
 
@@ -1226,6 +1589,36 @@ class TestApiClient(unittest.TestCase):
 
         print(f"asynchronous upload took: {elapsed:0.3f} seconds")
 
+    def test_async_client(self):
+        from orthanc_api_client.aio import AsyncOrthancApiClient
+
+        self.oa.delete_all_content()
+        dicoms = [generate_test_dicom_file(width=32, height=32, tags={'StudyInstanceUID': '1.2.3'}) for i in range(20)]
+
+        async def run():
+            async with AsyncOrthancApiClient('http://localhost:10042', user='test', pwd='test', max_connections=10) as o:
+                self.assertTrue(await o.wait_started(timeout=5))
+
+                result_list = await asyncio.gather(*[o.upload(buffer=dicom) for dicom in dicoms])
+                instances_ids = [i for r in result_list for i in r]
+
+                study_id = await o.studies.lookup('1.2.3')
+                study_info = await o.studies.get_info(study_id)
+                self.assertEqual('1.2.3', study_info.dicom_id)
+                self.assertEqual(20, len(await o.studies.get_instances_ids(study_id)))
+
+                with tempfile.TemporaryDirectory() as tempDir:
+                    downloaded_instances = await o.studies.download_instances(study_id, tempDir)
+                    self.assertEqual(20, len(downloaded_instances))
+
+                with self.assertRaises(api_exceptions.ResourceNotFound):
+                    await o.studies.get_info('not-a-study-id')
+
+                await o.instances.delete(orthanc_ids=instances_ids)
+                self.assertEqual(0, len(await o.studies.get_all_ids()))
+
+        asyncio.run(run())
+
     def test_query_study(self):
         self.oa.delete_all_content()
         self.ob.delete_all_content()
@@ -1304,6 +1697,17 @@ class TestApiClient(unittest.TestCase):
         self.assertEqual('1.3.6.1.4.1.5962.1.2.1.20040119072730.12322', studies[0].dicom_id)
         self.assertEqual("e+1", studies[0].main_dicom_tags.get('StudyDescription'))
 
+    def test_find_study_json_codecs(self):
+        self.oa.delete_all_content()
+
+        self.oa.upload_file(here / "stimuli/CT_small.dcm")
+
+        for codec in ['json', 'auto']:
+            o = OrthancApiClient('http://localhost:10042', user='test', pwd='test', json_codec=codec)
+            studies = o.studies.find(query={'PatientID': '1C*'})
+            self.assertEqual(1, len(studies))
+            self.assertEqual('1.3.6.1.4.1.5962.1.2.1.20040119072730.12322', studies[0].dicom_id)
+
     def test_find_study_with_requested_tags(self):
         self.oa.delete_all_content()
 
@@ -1495,6 +1899,46 @@ class TestApiClient(unittest.TestCase):
             instance_content_original = open(here / "stimuli/CT_small.dcm", 'rb').read()
             self.assertEqual(instance_content_after_download, instance_content_original)
 
+    def test_streamed_downloads(self):
+        self.oa.delete_all_content()
+        instances_ids = self.oa.upload_file(here / "stimuli/CT_small.dcm")
+        study_id = self.oa.instances.get_parent_study_id(instances_ids[0])
+
+        instance_content_original = open(here / "stimuli/CT_small.dcm", 'rb').read()
+
+        # stream to a caller-supplied writable
+        buffer = io.BytesIO()
+        written = self.oa.instances.download_file(instances_ids[0], buffer, chunk_size=1024)
+        self.assertEqual(len(instance_content_original), written)
+        self.assertEqual(instance_content_original, buffer.getvalue())
+
+        # stream an archive to a writable
+        buffer = io.BytesIO()
+        self.oa.studies.download_archive(study_id, buffer, chunk_size=4096)
+        self.assertTrue(zipfile.is_zipfile(buffer))
+
+        # stream an attachment to a file
+        self.oa.instances.set_attachment(instances_ids[0], attachment_name=1025, content=b"attachment-content", content_type='application/octet-stream')
+        with tempfile.NamedTemporaryFile() as f:
+            self.oa.instances.download_attachment(instances_ids[0], attachment_name=1025, path=f.name, chunk_size=2)
+            self.assertEqual(b"attachment-content", open(f.name, 'rb').read())
+
+    def test_extract_archive(self):
+        self.oa.delete_all_content()
+
+        instances_ids = self.oa.upload_folder(here / 'stimuli/MR/Brain/1')
+        study_id = self.oa.instances.get_parent_study_id(instances_ids[0])
+        instances_contents = [self.oa.instances.get_file(i) for i in instances_ids]
+
+        # iterate over the files of the archive without storing it
+        contents = [stream.read() for path, stream in self.oa.studies.iter_archive(study_id, chunk_size=1024)]
+        self.assertEqual(sorted(instances_contents), sorted(contents))
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            extracted_paths = self.oa.studies.extract_archive(study_id, tempDir)
+            self.assertEqual(2, len(extracted_paths))
+            self.assertEqual(sorted(instances_contents), sorted([open(p, 'rb').read() for p in extracted_paths]))
+
     def test_download_series_studies(self):
         self.oa.delete_all_content()
 
@@ -1513,6 +1957,37 @@ class TestApiClient(unittest.TestCase):
             downloaded_instances = self.oa.studies.download_instances(study_id, tempDir)
         self.assertEqual(len(instances_id), len(downloaded_instances))
 
+        # download in parallel, including an unknown instance
+        with tempfile.TemporaryDirectory() as tempDir:
+            downloaded_instances = self.oa.instances.download_instances(instances_id + ['unknown-id'], tempDir, max_workers=4, ignore_errors=True)
+
+            self.assertEqual(instances_id + ['unknown-id'], [d.instance_id for d in downloaded_instances])
+            self.assertTrue(all([d.error is None and os.path.exists(d.path) for d in downloaded_instances[:-1]]))
+            self.assertIsInstance(downloaded_instances[-1].error, api_exceptions.ResourceNotFound)
+            self.assertEqual(len(instances_id), len(os.listdir(tempDir)))  # no partial file left
+
+            with self.assertRaises(api_exceptions.ResourceNotFound):
+                self.oa.instances.download_instances(['unknown-id'] + instances_id, tempDir, max_workers=4)
+
+    def test_download_instances_dicom_web(self):
+        self.oa.delete_all_content()
+
+        instances_ids = self.oa.upload_folder(here / 'stimuli/MR/Brain/1')
+        series_id = self.oa.instances.get_parent_series_id(instances_ids[0])
+        study_id = self.oa.series.get_parent_study_id(series_id)
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            downloaded_instances = self.oa.studies.download_instances_dicom_web(study_id, tempDir, chunk_size=1024)
+            self.assertEqual(set(instances_ids), set([d.instance_id for d in downloaded_instances]))
+            for d in downloaded_instances:
+                with open(d.path, 'rb') as f:
+                    self.assertEqual(self.oa.instances.get_file(d.instance_id), f.read())
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            downloaded_instances = self.oa.series.download_instances_dicom_web(series_id, tempDir)
+            self.assertEqual(set(instances_ids), set([d.instance_id for d in downloaded_instances]))
+            self.assertEqual(set([i + '.dcm' for i in instances_ids]), set(os.listdir(tempDir)))
+
     def test_get_preview_file(self):
         self.oa.delete_all_content()
 
@@ -1557,6 +2032,20 @@ class TestApiClient(unittest.TestCase):
             self.assertTrue(os.path.exists(file.name))
             self.assertTrue(os.path.getsize(file.name) > 0)
 
+        # the same archive, built in an asynchronous job
+        buffer = io.BytesIO()
+        instances_set.download_archive(buffer, asynchronous=True, timeout=30)
+        self.assertEqual(2, len([n for n in zipfile.ZipFile(buffer).namelist() if not n.endswith('/')]))
+
+        with tempfile.NamedTemporaryFile() as file:
+            instances_set.download_media(file.name, asynchronous=True, timeout=30)
+            self.assertTrue(zipfile.is_zipfile(file.name))
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            extracted_paths = instances_set.extract_archive(tempDir)
+            self.assertEqual(2, len(extracted_paths))
+            self.assertTrue(all([p.startswith(tempDir) and os.path.getsize(p) > 0 for p in extracted_paths]))
+
         # upload the second part of the study
         instances_id = self.oa.upload_folder(here / 'stimuli/MR/Brain/2')
         self.assertEqual(3, len(self.oa.studies.get_instances_ids(orthanc_id=study_id)))
@@ -1915,6 +2404,23 @@ class TestApiClient(unittest.TestCase):
         all = self.od.projects.get_all()
         self.assertEqual(len(all), 0)
 
+    def test_education_token_renewal(self):
+        provider = EducationPluginHeaderProvider('http://localhost:10045', 'test', 'test')
+        o = OrthancApiClient('http://localhost:10045', token_provider=provider)
+        try:
+            # the token is reused while it is valid
+            self.assertEqual(provider.get_headers(), provider.get_headers())
+
+            # an invalid token is renewed by the first thread that gets a 403, the other ones reuse the new token
+            o._update_headers({'Authorization': 'Bearer invalid-token'})
+            with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+                projects = list(executor.map(lambda i: o.projects.get_all(), range(20)))
+
+            self.assertEqual(20, len(projects))
+            self.assertNotEqual('Bearer invalid-token', o._http_session.headers['Authorization'])
+        finally:
+            provider.stop()
+
     def test_education_delete_all_projects(self):
         self.od.delete_all_content()
         self.od.projects.delete_all()